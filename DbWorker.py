@@ -0,0 +1,126 @@
+"""Фоновый поток для работы с базой данных.
+
+Долгие операции (загрузка задач, статистика, экспорт, импорт, бэкапы)
+выполняются в отдельном потоке, чтобы окно не замирало на большой или
+занятой базе. У потока свое соединение (db.get_connection хранит
+соединения по потокам), результат возвращается в GUI-поток сигналом.
+
+Запросы с одинаковым тегом вытесняют друг друга: если пользователь
+быстро листает даты, ждущие загрузки старых дат отменяются, а результат
+уже выполняющейся просто не доставляется.
+"""
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QObject, QCoreApplication, pyqtSignal
+
+import db
+from logger import get_logger
+
+logger = get_logger('db_worker')
+
+# Через сколько мс показывать состояние загрузки, если ответа еще нет
+LOADING_DELAY_MS = 150
+
+
+class DbWorker(QObject):
+    """Очередь запросов к базе, выполняемых по одному в фоновом потоке"""
+
+    # Сигнал из фонового потока; доставляется в поток объекта (GUI)
+    _done = pyqtSignal(int, bool, object)
+    # Есть ли невыполненные запросы
+    busyChanged = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Один поток: запросы выполняются по порядку на одном соединении
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-worker')
+        self._ids = itertools.count(1)
+        self._requests = {}  # id -> (tag, future, on_result, on_error)
+        self._latest = {}  # tag -> id последнего запроса
+        self._done.connect(self._dispatch)
+
+    def submit(self, func, *args, tag=None, on_result=None, on_error=None, **kwargs):
+        """Выполнение func(*args, **kwargs) в фоновом потоке.
+
+        on_result(result) и on_error(exception) вызываются в GUI-потоке.
+        Если tag задан, более ранние запросы с тем же тегом отменяются.
+        Возвращает id запроса.
+        """
+        if tag is not None:
+            self.cancel(tag)
+
+        request_id = next(self._ids)
+        was_idle = not self._requests
+        future = self._executor.submit(self._run, request_id, func, args, kwargs)
+        self._requests[request_id] = (tag, future, on_result, on_error)
+        if tag is not None:
+            self._latest[tag] = request_id
+        if was_idle:
+            self.busyChanged.emit(True)
+        return request_id
+
+    def cancel(self, tag):
+        """Отмена запросов с тегом: ждущие не выполнятся, результат выполняющегося не придет"""
+        request_id = self._latest.pop(tag, None)
+        if request_id is None:
+            return
+        _, future, _, _ = self._requests.pop(request_id)
+        if future.cancel():
+            logger.debug("Запрос %s (%s) отменен до выполнения", request_id, tag)
+        if not self._requests:
+            self.busyChanged.emit(False)
+
+    def is_pending(self, request_id):
+        """Ждет ли запрос результата"""
+        return request_id in self._requests
+
+    def shutdown(self):
+        """Остановка потока: ждущие запросы отменяются, соединение потока закрывается"""
+        for tag in list(self._latest):
+            self.cancel(tag)
+        self._executor.submit(db.close_connection)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self, request_id, func, args, kwargs):
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            logger.exception("Ошибка фонового запроса %s: %s", getattr(func, '__name__', func), e)
+            self._done.emit(request_id, False, e)
+        else:
+            self._done.emit(request_id, True, result)
+
+    def _dispatch(self, request_id, ok, payload):
+        request = self._requests.pop(request_id, None)
+        if request is None:
+            # Запрос отменен или вытеснен более новым
+            return
+        tag, _, on_result, on_error = request
+        if tag is not None and self._latest.get(tag) == request_id:
+            del self._latest[tag]
+        if not self._requests:
+            self.busyChanged.emit(False)
+
+        callback = on_result if ok else on_error
+        if callback is None:
+            return
+        # Исключение в слоте PyQt завершает программу - только логируем
+        try:
+            callback(payload)
+        except Exception as e:
+            logger.exception("Ошибка обработки результата запроса %s: %s", request_id, e)
+
+
+_worker = None
+
+
+def get_worker():
+    """Общий фоновый поток базы данных (создается при первом обращении)"""
+    global _worker
+    if _worker is None:
+        _worker = DbWorker()
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(_worker.shutdown)
+    return _worker
@@ -1,29 +1,83 @@
-from PyQt6.QtWidgets import (QDialog, QMessageBox, QFileDialog, QInputDialog)
-from PyQt6.QtCore import QDate
+from PyQt6.QtWidgets import (QDialog, QMessageBox, QFileDialog, QInputDialog, QPushButton, QHBoxLayout,
+                             QProgressDialog)
+from PyQt6.QtCore import QDate, Qt, pyqtSignal
 from ui.export_dialog import Ui_ExportDialog
 import os 
 from datetime import datetime
 
-from db import (export_tasks_to_json, import_tasks_from_json, save_template, get_available_templates,  get_tasks_by_date)
+from db import (export_tasks_to_json, import_tasks_from_json, save_template, get_available_templates,  get_tasks_by_date,
+                create_backup, get_backups, restore_backup_chain, create_snapshot, restore_snapshot,
+                get_snapshots, BACKUP_DIR)
+from DbWorker import get_worker
 
 class ExportDialog(QDialog):
+    # Процент выполнения снимка: испускается в фоновом потоке
+    snapshotProgress = pyqtSignal(int)
+    
     def __init__(self, parent=None, user_id=1):
         super().__init__(parent)
         self.ui = Ui_ExportDialog()
         self.ui.setupUi(self)
         self.user_id = user_id
+        self.worker = get_worker()
         
         self.selected_file = None
+        # Окно прогресса текущей операции со снимком
+        self.progress_dialog = None
+        self.snapshotProgress.connect(self.on_snapshot_progress, Qt.ConnectionType.QueuedConnection)
+        
+        # Кнопка восстановления рядом с кнопкой бэкапа
+        self.restoreBtn = QPushButton("♻️ Восстановить из бэкапа")
+        self.ui.horizontalLayout.addWidget(self.restoreBtn)
+        
+        # Снимки всей базы - отдельной строкой под кнопками экспорта
+        self.snapshotBtn = QPushButton("📸 Снимок базы")
+        self.restoreSnapshotBtn = QPushButton("⏪ Восстановить снимок")
+        snapshotLayout = QHBoxLayout()
+        snapshotLayout.addWidget(self.snapshotBtn)
+        snapshotLayout.addWidget(self.restoreSnapshotBtn)
+        self.ui.verticalLayout_2.addLayout(snapshotLayout)
         
         # Подключаем кнопки
         self.ui.exportBtn.clicked.connect(self.export_tasks)
         self.ui.backupBtn.clicked.connect(self.create_backup)
+        self.restoreBtn.clicked.connect(self.restore_backup)
+        self.snapshotBtn.clicked.connect(self.create_snapshot)
+        self.restoreSnapshotBtn.clicked.connect(self.restore_snapshot)
         self.ui.importBtn.clicked.connect(self.import_tasks)
         self.ui.selectFileBtn.clicked.connect(self.select_file)
         self.ui.saveTemplateBtn.clicked.connect(self.save_template)
         self.ui.loadTemplateBtn.clicked.connect(self.load_template)
         self.ui.closeExportBtn.clicked.connect(self.close)
     
+    def run_in_background(self, title, func, *args, on_result, **kwargs):
+        """Выполнение долгой операции в фоновом потоке с блокировкой кнопок"""
+        groups = (self.ui.exportGroup, self.ui.importGroup, self.ui.templateGroup)
+        window_title = self.windowTitle()
+        for group in groups:
+            group.setEnabled(False)
+        self.setWindowTitle(f"{window_title} — {title}")
+        self.setCursor(Qt.CursorShape.BusyCursor)
+        
+        def finish():
+            for group in groups:
+                group.setEnabled(True)
+            self.setWindowTitle(window_title)
+            self.unsetCursor()
+            if self.progress_dialog is not None:
+                self.progress_dialog.close()
+                self.progress_dialog = None
+        
+        def done(result):
+            finish()
+            on_result(result)
+        
+        def failed(error):
+            finish()
+            QMessageBox.warning(self, 'Ошибка', f'Операция не выполнена: {error}')
+        
+        self.worker.submit(func, *args, on_result=done, on_error=failed, **kwargs)
+    
     def export_tasks(self):
         """Экспорт задач в JSON"""
         # Открываем диалог выбора места сохранения
@@ -36,28 +90,154 @@ class ExportDialog(QDialog):
         
         if filename:
             # Сохраняем туда, куда указал пользователь
-            if export_tasks_to_json(self.user_id, filename):
-                QMessageBox.information(self, 'Успех', 'Задачи успешно экспортированы')
-            else:
-                QMessageBox.warning(self, 'Ошибка', 'Не удалось экспортировать задачи')
+            self.run_in_background('экспорт...', export_tasks_to_json, self.user_id, filename,
+                                   on_result=self.on_exported)
         else:
             # Если пользователь отменил диалог, просто выходим
             QMessageBox.information(self, 'Отмена', 'Экспорт отменён пользователем')
 
+    def on_exported(self, exported):
+        """Результат экспорта"""
+        if exported:
+            QMessageBox.information(self, 'Успех', 'Задачи успешно экспортированы')
+        else:
+            QMessageBox.warning(self, 'Ошибка', 'Не удалось экспортировать задачи')
+
     def create_backup(self):
-        """Создание автоматического бэкапа"""
-        if export_tasks_to_json(self.user_id):
-            QMessageBox.information(self, 'Успех', 'Автоматический бэкап создан')
+        """Создание бэкапа (инкрементального, если есть предыдущий)"""
+        self.run_in_background('бэкап...', create_backup, self.user_id, on_result=self.on_backup_created)
+    
+    def on_backup_created(self, entry):
+        """Результат создания бэкапа"""
+        if entry:
+            kind = 'Полный' if entry['type'] == 'full' else 'Инкрементальный'
+            QMessageBox.information(self, 'Успех', f"{kind} бэкап создан (задач: {entry['tasks_count']})")
         else:
             QMessageBox.warning(self, 'Ошибка', 'Не удалось создать бэкап')
     
+    def restore_backup(self):
+        """Восстановление задач из цепочки бэкапов"""
+        backups = get_backups(self.user_id)
+        if not backups:
+            QMessageBox.information(self, 'Информация', 'Нет доступных бэкапов')
+            return
+        
+        # Самые свежие - первыми
+        labels = [
+            f"{entry['created_at'][:19].replace('T', ' ')} "
+            f"({'полный' if entry['type'] == 'full' else 'инкрементальный'}, задач: {entry['tasks_count']})"
+            for entry in reversed(backups)
+        ]
+        label, ok = QInputDialog.getItem(
+            self,
+            'Восстановление из бэкапа',
+            'Восстановить состояние на момент:',
+            labels,
+            0,
+            False
+        )
+        if not ok:
+            return
+        entry = list(reversed(backups))[labels.index(label)]
+        
+        reply = QMessageBox.question(
+            self,
+            'Подтверждение восстановления',
+            'Текущие задачи будут заменены задачами из бэкапа. Продолжить?',
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        
+        self.run_in_background('восстановление...', restore_backup_chain, self.user_id, entry['file'],
+                               on_result=self.on_backup_restored)
+    
+    def on_backup_restored(self, result):
+        """Результат восстановления из бэкапа"""
+        if result is not None:
+            QMessageBox.information(self, 'Успех', f"Восстановлено задач: {result['restored']}")
+        else:
+            QMessageBox.warning(self, 'Ошибка', 'Не удалось восстановить задачи из бэкапа')
+    
+    def _snapshot_progress(self, title):
+        """Окно прогресса и функция обратного вызова для backup API.
+
+        Функция вызывается в фоновом потоке и только испускает сигнал -
+        окно обновляется в GUI-потоке, когда до него дойдет очередь.
+        """
+        self.progress_dialog = QProgressDialog(title, '', 0, 100, self)
+        self.progress_dialog.setCancelButton(None)
+        self.progress_dialog.setMinimumDuration(300)
+        
+        def progress(status, remaining, total):
+            if total:
+                self.snapshotProgress.emit(int((total - remaining) * 100 / total))
+        
+        return progress
+    
+    def on_snapshot_progress(self, percent):
+        """Обновление окна прогресса снимка"""
+        if self.progress_dialog is not None:
+            self.progress_dialog.setValue(percent)
+    
+    def create_snapshot(self):
+        """Снимок всей базы данных (в фоновом потоке)"""
+        progress = self._snapshot_progress('Создание снимка базы...')
+        self.run_in_background('снимок базы...', create_snapshot,
+                               on_result=self.on_snapshot_created, progress=progress)
+    
+    def on_snapshot_created(self, path):
+        """Результат создания снимка"""
+        if path:
+            QMessageBox.information(self, 'Успех', f'Снимок базы сохранен:\n{path}')
+        else:
+            QMessageBox.warning(self, 'Ошибка', 'Не удалось создать снимок базы')
+    
+    def restore_snapshot(self):
+        """Восстановление всей базы данных из снимка"""
+        snapshots = get_snapshots()
+        if not snapshots:
+            QMessageBox.information(self, 'Информация', 'Нет сохраненных снимков базы')
+            return
+        
+        name, ok = QInputDialog.getItem(
+            self,
+            'Восстановление снимка',
+            'Выберите снимок:',
+            list(reversed(snapshots)),
+            0,
+            False
+        )
+        if not ok:
+            return
+        
+        reply = QMessageBox.question(
+            self,
+            'Подтверждение восстановления',
+            'Вся база данных (задачи всех пользователей, категории и шаблоны) будет заменена снимком. Продолжить?',
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        
+        progress = self._snapshot_progress('Восстановление базы...')
+        self.run_in_background('восстановление снимка...', restore_snapshot, os.path.join(BACKUP_DIR, name),
+                               on_result=self.on_snapshot_restored, progress=progress)
+    
+    def on_snapshot_restored(self, restored):
+        """Результат восстановления из снимка"""
+        if restored:
+            QMessageBox.information(self, 'Успех', 'База данных восстановлена из снимка')
+        else:
+            QMessageBox.warning(self, 'Ошибка', 'Не удалось восстановить базу из снимка')
+    
     def select_file(self):
         """Выбор файла для импорта"""
         filename, _ = QFileDialog.getOpenFileName(
             self, 
             'Выберите файл для импорта', 
             '', 
-            'JSON Files (*.json)'
+            'JSON Files (*.json *.json.gz *.json.xz)'
         )
         
         if filename:
@@ -79,12 +259,20 @@ class ExportDialog(QDialog):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            if import_tasks_from_json(self.user_id, self.selected_file):
-                QMessageBox.information(self, 'Успех', 'Задачи успешно импортированы')
-                self.selected_file = None
-                self.ui.selectedFileLabel.setText("Файл не выбран")
-            else:
-                QMessageBox.warning(self, 'Ошибка', 'Не удалось импортировать задачи')
+            self.run_in_background('импорт...', import_tasks_from_json, self.user_id, self.selected_file,
+                                   on_result=self.on_imported)
+    
+    def on_imported(self, result):
+        """Результат импорта"""
+        if result is not None:
+            message = f"Импортировано задач: {result['imported']}"
+            if result['skipped']:
+                message += f"\nПропущено некорректных записей: {result['skipped']}"
+            QMessageBox.information(self, 'Успех', message)
+            self.selected_file = None
+            self.ui.selectedFileLabel.setText("Файл не выбран")
+        else:
+            QMessageBox.warning(self, 'Ошибка', 'Не удалось импортировать задачи')
     
     def save_template(self):
         """Сохранение шаблона задач"""
@@ -96,7 +284,7 @@ class ExportDialog(QDialog):
         
         if ok and template_name.strip():
             # Получаем задачи на сегодня для шаблона
-            today_tasks = get_tasks_by_date(self.user_id, QDate.currentDate())
+            today_tasks = get_tasks_by_date(QDate.currentDate(), self.user_id) or []
             template_data = []
             
             for task in today_tasks:
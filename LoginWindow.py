@@ -4,6 +4,9 @@ from PyQt6 import QtGui
 from ui.autorisation import Ui_MainWindow  # Импортируем ваш UI
 from db import authenticate_user, get_users
 from MainWindow import MainWindow  # Импортируем главное окно
+from logger import get_logger
+
+logger = get_logger('login_window')
 
 class LoginWindow(QMainWindow):
     def __init__(self):
@@ -54,9 +57,9 @@ class LoginWindow(QMainWindow):
             users = get_users()
             # Если хотите сделать выпадающий список вместо поля ввода,
             # можно заменить lineEdit_3 на QComboBox
-            print(f"Найдено пользователей: {len(users)}")
+            logger.debug("Найдено пользователей: %s", len(users))
         except Exception as e:
-            print(f"Ошибка загрузки пользователей: {e}")
+            logger.error("Ошибка загрузки пользователей: %s", e)
         
     def toggle_password_visibility(self):
         """Переключение видимости пароля"""
@@ -105,13 +108,13 @@ class LoginWindow(QMainWindow):
     
     def successful_login(self, user_id, username):
         """Обработка успешного входа"""
-        print(f"Успешный вход: {username} (ID: {user_id})")
+        logger.info("Успешный вход: %s (ID: %s)", username, user_id)
         
         # Закрываем окно входа
         self.close()
         
         # Открываем главное окно
-        self.main_window = MainWindow(user_id, username)
+        self.main_window = MainWindow(user_id=user_id)
         self.main_window.show()
         
     def failed_login(self):
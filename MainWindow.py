@@ -1,26 +1,38 @@
 from PyQt6.QtWidgets import QApplication, QMainWindow, QCalendarWidget, QMessageBox
 from PyQt6.QtCore import QDate, QTimer, QEvent
-from PyQt6 import QtCore, QtGui, QtWidgets
+from PyQt6 import QtCore, QtWidgets
 from ui.main_window import Ui_MainWindow
 from TaskDialog import TaskDialog
 from WeekDialog import WeekDialog
 from CategoryDialog import CategoryDialog
 from ExportDialog import ExportDialog
-from db import init_db, clear_all_tasks, get_task_stats, get_user_settings, update_user_settings
+from DbWorker import get_worker
+from ReminderScheduler import ReminderScheduler
+from Theme import apply_theme, get_theme, THEME_NAMES, DEFAULT_THEME
+from TaskCalendar import TaskCalendar
+from logger import setup_logging, get_logger
+from db import (init_db, clear_all_tasks, get_task_stats, get_user_settings, update_user_settings,
+                set_storage_profile, STORAGE_PROFILES, DEFAULT_STORAGE_PROFILE, search_tasks,
+                DEFAULT_PREFETCH_DEPTH)
 import os
 
+logger = get_logger('main_window')
+
 class MainWindow(QMainWindow):
     def __init__(self, parent=None, user_id=1):
         super().__init__()
         
         # Создаем папки для данных
         self.create_data_folders()
+        setup_logging()
         self.user_id = user_id
         
         # Инициализация базы данных ПЕРВЫМ делом
         try:
             init_db()
-            print("База данных успешно инициализирована")
+            self.apply_storage_profile()
+            apply_theme((get_user_settings(self.user_id) or {}).get('theme') or DEFAULT_THEME)
+            logger.info("База данных успешно инициализирована")
         except Exception as e:
             QMessageBox.critical(
                 None, 
@@ -29,20 +41,24 @@ class MainWindow(QMainWindow):
             )
             return
         
+        # Долгие запросы к базе выполняются в фоновом потоке
+        self.worker = get_worker()
+        
         # Инициализация интерфейса
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
 
-        # Создание календаря
-        self.calendar = QCalendarWidget(self.ui.widget)
+        # Создание календаря (со значками количества задач на днях)
+        self.calendar = TaskCalendar(self.user_id, self.ui.widget)
+        # Соседние месяцы и недели подгружаются заранее на prefetch_depth шагов
+        self.prefetch_depth = (get_user_settings(self.user_id) or {}).get('prefetch_depth', DEFAULT_PREFETCH_DEPTH)
+        self.calendar.prefetcher.set_depth(self.prefetch_depth)
+        QApplication.instance().aboutToQuit.connect(self.calendar.shutdown)
         self.calendar.setGeometry(0, 0, self.ui.widget.width(), self.ui.widget.height())
         self.calendar.setGridVisible(True)
         self.calendar.setNavigationBarVisible(False)
         self.calendar.setVerticalHeaderFormat(QCalendarWidget.VerticalHeaderFormat.NoVerticalHeader)
 
-        # Настройка стилей для календаря
-        self.setup_calendar_styles()
-        
         # Текущая дата
         self.calendar.setSelectedDate(QDate.currentDate())
         
@@ -67,9 +83,9 @@ class MainWindow(QMainWindow):
 
         # Создаём диалоговые окна
         self.task_dialog = TaskDialog(user_id=self.user_id)
-        self.week_dialog = WeekDialog(self)
+        self.week_dialog = WeekDialog(self, user_id=self.user_id)
         self.category_dialog = CategoryDialog(self)
-        self.export_dialog = ExportDialog(self)
+        self.export_dialog = ExportDialog(self, user_id=self.user_id)
         
         # Настраиваем диалоги как немодальные и без захвата фокуса
         self.setup_dialogs()
@@ -92,6 +108,7 @@ class MainWindow(QMainWindow):
         self.categories_btn.clicked.connect(self.show_categories)
         self.settings_btn.clicked.connect(self.show_settings)
         self.stats_btn.clicked.connect(self.show_statistics)
+        self.search_edit.returnPressed.connect(self.search)
 
         # События календаря
         self.calendar.selectionChanged.connect(self.day_selection_changed)
@@ -101,6 +118,9 @@ class MainWindow(QMainWindow):
         # События диалога задач
         self.task_dialog.finished.connect(self.on_task_dialog_closed)
         
+        # Напоминания о задачах
+        self.setup_reminders()
+        
         # Авто-бэкап при запуске
         self.auto_backup()
         
@@ -122,7 +142,6 @@ class MainWindow(QMainWindow):
         
         for folder in folders:
             os.makedirs(folder, exist_ok=True)
-        print("Папки для данных созданы")
 
     def setup_enhanced_ui(self):
         """Настройка улучшенного интерфейса с дополнительными кнопками"""
@@ -151,17 +170,107 @@ class MainWindow(QMainWindow):
         if main_layout:
             # Вставляем после существующих кнопок
             main_layout.insertLayout(2, additional_buttons_layout)
+        
+        # Поле поиска в правом углу строки меню
+        self.search_edit = QtWidgets.QLineEdit()
+        self.search_edit.setPlaceholderText("🔍 Поиск задач")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setFixedWidth(220)
+        self.ui.menubar.setCornerWidget(self.search_edit, QtCore.Qt.Corner.TopRightCorner)
+
+    def search(self):
+        """Поиск задач и переход к дате выбранного результата"""
+        query = self.search_edit.text().strip()
+        if not query:
+            return
+        
+        results = search_tasks(self.user_id, query)
+        if not results:
+            self.ui.statusbar.showMessage(f"Ничего не найдено: {query}", 3000)
+            return
+        
+        if len(results) == 1:
+            self.jump_to_date(results[0]['task_date'])
+            return
+        
+        menu = QtWidgets.QMenu(self)
+        for result in results:
+            date = QDate.fromString(result['task_date'], 'yyyy-MM-dd')
+            mark = '✅' if result['done'] else '⬜'
+            action = menu.addAction(f"{mark} {date.toString('dd.MM.yyyy')}  {result['snippet']}")
+            action.setData(result['task_date'])
+        
+        action = menu.exec(self.search_edit.mapToGlobal(self.search_edit.rect().bottomLeft()))
+        if action:
+            self.jump_to_date(action.data())
+    
+    def jump_to_date(self, task_date):
+        """Переход календаря к дате задачи и открытие ее задач"""
+        date = QDate.fromString(task_date, 'yyyy-MM-dd')
+        if not date.isValid():
+            return
+        self.calendar.setSelectedDate(date)
+        self.current_selected_date = date
+        self.update_month_label()
+        self.open_or_update_task_dialog(date)
+
+    def setup_reminders(self):
+        """Планировщик напоминаний и значок в трее для уведомлений"""
+        self.tray_icon = None
+        if QtWidgets.QSystemTrayIcon.isSystemTrayAvailable():
+            icon = self.windowIcon()
+            if icon.isNull():
+                icon = self.style().standardIcon(QtWidgets.QStyle.StandardPixmap.SP_MessageBoxInformation)
+            self.tray_icon = QtWidgets.QSystemTrayIcon(icon, self)
+            self.tray_icon.setToolTip("Планировщик задач")
+            self.tray_icon.messageClicked.connect(self.on_reminder_clicked)
+            self.tray_icon.show()
+        self.last_reminder_date = None
+        
+        self.reminders = ReminderScheduler(self.user_id, self)
+        self.reminders.reminderDue.connect(self.show_reminder)
+        QApplication.instance().aboutToQuit.connect(self.reminders.shutdown)
+        
+        settings = get_user_settings(self.user_id) or {}
+        self.reminders.set_enabled(settings.get('notifications', True))
+
+    def show_reminder(self, task):
+        """Уведомление о задаче: сообщение в трее или строка состояния"""
+        date = QDate.fromString(task.task_date, 'yyyy-MM-dd')
+        when = task.due_time or date.toString('dd.MM.yyyy')
+        self.last_reminder_date = task.task_date
+        
+        if self.tray_icon is not None and self.tray_icon.supportsMessages():
+            self.tray_icon.showMessage(f"⏰ {when}", task.title,
+                                       QtWidgets.QSystemTrayIcon.MessageIcon.Information, 10000)
+        else:
+            self.ui.statusbar.showMessage(f"⏰ {when}  {task.title}", 60000)
+            QApplication.alert(self)
+
+    def on_reminder_clicked(self):
+        """Переход к дате задачи из уведомления"""
+        if self.last_reminder_date:
+            self.showNormal()
+            self.activateWindow()
+            self.jump_to_date(self.last_reminder_date)
+
+    def apply_storage_profile(self):
+        """Применение профиля хранения из настроек пользователя"""
+        settings = get_user_settings(self.user_id) or {}
+        profile = settings.get('storage_profile', DEFAULT_STORAGE_PROFILE)
+        if profile not in STORAGE_PROFILES:
+            profile = DEFAULT_STORAGE_PROFILE
+        set_storage_profile(profile)
 
     def auto_backup(self):
-        """Автоматическое создание бэкапа"""
-        settings = get_user_settings(self.user_id)
-        if settings and settings.get('auto_backup', True):
-            from db import export_tasks_to_json
-            backup_file = f"data/backups/auto_backup_{self.user_id}_{QDate.currentDate().toString('yyyyMMdd')}.json"
-            if export_tasks_to_json(self.user_id, backup_file):
-                print("Автоматический бэкап создан")
-            else:
-                print("Не удалось создать автоматический бэкап")
+        """Автоматическое создание бэкапа (инкрементального, если есть предыдущий) в фоне"""
+        from db import auto_backup
+        
+        def done(created):
+            if not created:
+                logger.warning("Не удалось создать автоматический бэкап")
+        
+        self.worker.submit(auto_backup, self.user_id, on_result=done)
 
     def show_categories(self):
         """Показать диалог категорий"""
@@ -177,17 +286,18 @@ class MainWindow(QMainWindow):
 
     def show_settings(self):
         """Показать настройки"""
-        from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton, QMessageBox
+        from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton, QMessageBox,
+                                     QLabel, QComboBox)
         
         dialog = QDialog(self)
         dialog.setWindowTitle("Настройки")
         dialog.setModal(True)
-        dialog.resize(300, 200)
+        dialog.resize(340, 340)
         
         layout = QVBoxLayout(dialog)
         
         # Получаем настройки текущего пользователя
-        user_id = 1  # TODO: замените на текущего пользователя
+        user_id = self.user_id
         settings = get_user_settings(user_id) or {}
         
         # Настройки
@@ -200,9 +310,41 @@ class MainWindow(QMainWindow):
         week_start_monday = QCheckBox("Неделя начинается с понедельника")
         week_start_monday.setChecked(settings.get('week_start', 'monday') == 'monday')
         
+        storage_label = QLabel("Режим работы с базой данных:")
+        storage_combo = QComboBox()
+        storage_combo.addItem("🛡️ Надежный (fsync на каждое сохранение)", 'durable')
+        storage_combo.addItem("⚡ Быстрый (рекомендуется)", 'fast')
+        storage_combo.addItem("📥 Массовый импорт (без fsync)", 'bulk-import')
+        index = storage_combo.findData(settings.get('storage_profile', DEFAULT_STORAGE_PROFILE))
+        if index >= 0:
+            storage_combo.setCurrentIndex(index)
+        
+        prefetch_label = QLabel("Подгружать заранее соседние месяцы и недели:")
+        prefetch_combo = QComboBox()
+        prefetch_combo.addItem("Не подгружать", 0)
+        prefetch_combo.addItem("По одному в каждую сторону", 1)
+        prefetch_combo.addItem("По два в каждую сторону", 2)
+        index = prefetch_combo.findData(self.prefetch_depth)
+        if index >= 0:
+            prefetch_combo.setCurrentIndex(index)
+        
+        theme_label = QLabel("Тема оформления:")
+        theme_combo = QComboBox()
+        for theme_name, title in THEME_NAMES.items():
+            theme_combo.addItem(title, theme_name)
+        index = theme_combo.findData(get_theme().name)
+        if index >= 0:
+            theme_combo.setCurrentIndex(index)
+        
         layout.addWidget(auto_backup_cb)
         layout.addWidget(notifications_cb)
         layout.addWidget(week_start_monday)
+        layout.addWidget(storage_label)
+        layout.addWidget(storage_combo)
+        layout.addWidget(prefetch_label)
+        layout.addWidget(prefetch_combo)
+        layout.addWidget(theme_label)
+        layout.addWidget(theme_combo)
         layout.addStretch()
         
         # Кнопки
@@ -215,8 +357,17 @@ class MainWindow(QMainWindow):
                 user_id,
                 auto_backup=auto_backup_cb.isChecked(),
                 notifications=notifications_cb.isChecked(),
-                week_start='monday' if week_start_monday.isChecked() else 'sunday'
+                week_start='monday' if week_start_monday.isChecked() else 'sunday',
+                storage_profile=storage_combo.currentData(),
+                theme=theme_combo.currentData(),
+                prefetch_depth=prefetch_combo.currentData()
             )
+            set_storage_profile(storage_combo.currentData())
+            self.reminders.set_enabled(notifications_cb.isChecked())
+            apply_theme(theme_combo.currentData())
+            self.calendar.refresh_formats()
+            self.prefetch_depth = prefetch_combo.currentData()
+            self.calendar.prefetcher.set_depth(self.prefetch_depth)
             dialog.accept()
             QMessageBox.information(self, 'Успех', 'Настройки сохранены')
         
@@ -231,8 +382,15 @@ class MainWindow(QMainWindow):
 
 
     def show_statistics(self):
-        """Показать расширенную статистику"""
-        stats = get_task_stats(self.user_id)
+        """Показать расширенную статистику (считается в фоновом потоке)"""
+        self.stats_btn.setEnabled(False)
+        self.worker.submit(get_task_stats, self.user_id, tag='main_window.statistics',
+                           on_result=self.show_statistics_message,
+                           on_error=lambda e: self.stats_btn.setEnabled(True))
+    
+    def show_statistics_message(self, stats):
+        """Окно с расширенной статистикой"""
+        self.stats_btn.setEnabled(True)
         
         stats_text = f"""
 📊 Детальная статистика:
@@ -277,53 +435,20 @@ class MainWindow(QMainWindow):
                 QtCore.Qt.WindowType.WindowDoesNotAcceptFocus
             )
 
-    def setup_calendar_styles(self):
-        """Настройка стилей календаря"""
-        self.calendar.setStyleSheet("""
-            QCalendarWidget {
-                background-color: white;
-                border: 1px solid #ccc;
-            }
-            QCalendarWidget QToolButton {
-                color: #2c3e50;
-                font-weight: bold;
-            }
-            QCalendarWidget QMenu {
-                background-color: white;
-                border: 1px solid #ccc;
-            }
-        """)
-        
-        today_format = QtGui.QTextCharFormat()
-        today_format.setBackground(QtGui.QColor(255, 228, 225))
-        today_format.setForeground(QtGui.QColor(199, 21, 133))
-        self.calendar.setDateTextFormat(QDate.currentDate(), today_format)
-
     def update_calendar_styles(self):
-        """Обновление стилей дат в календаре"""
-        self.calendar.setDateTextFormat(QDate(), QtGui.QTextCharFormat())
-        
-        today_format = QtGui.QTextCharFormat()
-        today_format.setBackground(QtGui.QColor(255, 228, 225))
-        today_format.setForeground(QtGui.QColor(199, 21, 133))
-        self.calendar.setDateTextFormat(QDate.currentDate(), today_format)
-        
-        if self.dialog_opened_date and self.dialog_opened_date.isValid():
-            selected_format = QtGui.QTextCharFormat()
-            if self.dialog_opened_date == QDate.currentDate():
-                selected_format.setBackground(QtGui.QColor(219, 112, 147))
-                selected_format.setForeground(QtGui.QColor(255, 255, 255))
-            else:
-                selected_format.setBackground(QtGui.QColor(220, 220, 220))
-                selected_format.setForeground(QtGui.QColor(0, 0, 0))
-            self.calendar.setDateTextFormat(self.dialog_opened_date, selected_format)
+        """Обновление выделения дня, задачи которого открыты (меняются только два дня)"""
+        self.calendar.set_opened_date(self.dialog_opened_date)
 
     def show_startup_stats(self):
         """Показать статистику при запуске"""
-        stats = get_task_stats(self.user_id)
-        self.ui.statusbar.showMessage(
-            f"Задачи: всего {stats['total']} | выполнено {stats['completed']} | сегодня {stats['today']}"
-        )
+        self.ui.statusbar.showMessage("⏳ Подсчет задач...")
+        
+        def show(stats):
+            self.ui.statusbar.showMessage(
+                f"Задачи: всего {stats['total']} | выполнено {stats['completed']} | сегодня {stats['today']}"
+            )
+        
+        self.worker.submit(get_task_stats, self.user_id, tag='main_window.status', on_result=show)
 
     def prev_month(self):
         """Переход на предыдущий месяц"""
@@ -428,8 +553,10 @@ class MainWindow(QMainWindow):
         if self.is_dialog_open:
             self.update_task_dialog(today)
         
-        stats = get_task_stats(self.user_id)
-        self.ui.statusbar.showMessage(f"Задач на сегодня: {stats['today']}")
+        self.worker.submit(
+            get_task_stats, self.user_id, tag='main_window.status',
+            on_result=lambda stats: self.ui.statusbar.showMessage(f"Задач на сегодня: {stats['today']}")
+        )
         
         self.update_calendar_styles()
         self.return_focus_to_calendar()
@@ -445,27 +572,33 @@ class MainWindow(QMainWindow):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            if clear_all_tasks(self.user_id):
-                QMessageBox.information(self, 'Успех', 'Все задачи удалены')
-                self.show_startup_stats()
-                if self.is_dialog_open:
-                    self.task_dialog.load_tasks()
-            else:
-                QMessageBox.warning(self, 'Ошибка', 'Не удалось очистить задачи')
+            self.ui.pushButton_3.setEnabled(False)
+            self.worker.submit(clear_all_tasks, self.user_id, on_result=self.on_tasks_cleared)
         
         self.return_focus_to_calendar()
 
+    def on_tasks_cleared(self, cleared):
+        """Результат очистки всех задач"""
+        self.ui.pushButton_3.setEnabled(True)
+        if cleared:
+            QMessageBox.information(self, 'Успех', 'Все задачи удалены')
+            self.show_startup_stats()
+            if self.is_dialog_open:
+                self.task_dialog.load_tasks()
+        else:
+            QMessageBox.warning(self, 'Ошибка', 'Не удалось очистить задачи')
+        self.return_focus_to_calendar()
+
     def show_week_view(self):
         """Показать задачи на неделю"""
         try:
-            print("Открытие недельного просмотра...")
-            
             today = QDate.currentDate()
             days_to_monday = today.dayOfWeek() - 1
             week_start = today.addDays(-days_to_monday)
             
             # Создаем новый диалог каждый раз
-            self.week_dialog = WeekDialog(self)
+            self.week_dialog = WeekDialog(self, user_id=self.user_id)
+            self.week_dialog.prefetcher.set_depth(self.prefetch_depth)
             self.week_dialog.set_date(week_start)
             
             # Просто показываем диалог
@@ -475,18 +608,19 @@ class MainWindow(QMainWindow):
             self.calendar.setFocus()
             
         except Exception as e:
-            print(f"Ошибка при открытии недельного просмотра: {e}")
+            logger.exception("Ошибка при открытии недельного просмотра: %s", e)
             QMessageBox.warning(self, 'Ошибка', f'Не удалось открыть недельный просмотр: {e}')
 
 if __name__ == "__main__":
     app = QApplication([])
+    setup_logging()
     
     try:
         window = MainWindow()
         window.show()
         app.exec()
     except Exception as e:
-        print(f"Критическая ошибка: {e}")
+        logger.critical("Критическая ошибка: %s", e, exc_info=True)
         QMessageBox.critical(
             None, 
             'Ошибка приложения', 
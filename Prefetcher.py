@@ -0,0 +1,85 @@
+"""Фоновая подгрузка соседних страниц (месяцев календаря, недель).
+
+Когда пользователь перестает листать (вид не менялся SETTLE_MS), в
+фоновый поток ставятся загрузки ближайших depth страниц в обе стороны -
+сначала ближние. Результаты ложатся в ограниченные кэши владельцев
+(счетчики месяцев TaskCalendar, кэш недель repository), и следующий шаг
+листания показывается из памяти. При переходе далеко еще не начатые
+загрузки, не нужные новому положению, отменяются, чтобы не задерживать
+загрузку того, что пользователь открыл.
+"""
+from PyQt6.QtCore import QObject, QTimer
+
+from DbWorker import get_worker
+from db import DEFAULT_PREFETCH_DEPTH
+from logger import get_logger
+
+logger = get_logger('prefetcher')
+
+# Сколько мс вид должен не меняться, чтобы начать предзагрузку
+SETTLE_MS = 300
+
+
+class Prefetcher(QObject):
+    """Предзагрузка соседей текущей страницы.
+
+    neighbours(center, depth) - ключи соседних страниц, ближние первыми;
+    is_cached(key) - есть ли страница в кэше владельца;
+    fetch(key) - (функция, аргументы, on_result) для фонового потока.
+    """
+
+    def __init__(self, neighbours, is_cached, fetch, depth=DEFAULT_PREFETCH_DEPTH, parent=None):
+        super().__init__(parent)
+        self.neighbours = neighbours
+        self.is_cached = is_cached
+        self.fetch = fetch
+        self.depth = depth
+        self.worker = get_worker()
+        self._center = None
+        self._pending = set()  # ключи, загрузка которых поставлена в очередь
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._prefetch)
+
+    def set_depth(self, depth):
+        self.depth = depth
+        if self._center is not None:
+            self.navigated(self._center)
+
+    def navigated(self, center):
+        """Вид перешел на страницу center: лишние загрузки отменяются, новые - после паузы"""
+        self._center = center
+        wanted = set(self.neighbours(center, self.depth)) if self.depth else set()
+        for key in self._pending - wanted:
+            self.worker.cancel(self._tag(key))
+        self._pending &= wanted
+        self._timer.start(SETTLE_MS)
+
+    def cancel(self):
+        """Отмена всех ждущих предзагрузок (например, при закрытии вида)"""
+        self._timer.stop()
+        for key in self._pending:
+            self.worker.cancel(self._tag(key))
+        self._pending.clear()
+
+    def _tag(self, key):
+        return (id(self), 'prefetch', key)
+
+    def _prefetch(self):
+        if not self.depth or self._center is None:
+            return
+        for key in self.neighbours(self._center, self.depth):
+            if key in self._pending or self.is_cached(key):
+                continue
+            func, args, on_result = self.fetch(key)
+            self._pending.add(key)
+            self.worker.submit(func, *args, tag=self._tag(key),
+                               on_result=lambda result, key=key, on_result=on_result: self._done(key, on_result, result),
+                               on_error=lambda error, key=key: self._pending.discard(key))
+        logger.debug("Предзагрузка вокруг %s: в очереди %s", self._center, len(self._pending))
+
+    def _done(self, key, on_result, result):
+        self._pending.discard(key)
+        if on_result is not None:
+            on_result(result)
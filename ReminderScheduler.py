@@ -0,0 +1,188 @@
+"""Планировщик напоминаний о задачах.
+
+Напоминания на ближайшие HORIZON_DAYS дней читаются из базы в фоновом
+потоке (db.get_reminders берет только частичный индекс напоминаний) и
+лежат в куче по времени срабатывания. Взведен всегда один таймер - на
+ближайшее напоминание или на момент, когда пора дочитать следующие дни.
+Опроса базы нет: по сигналу db.add_tasks_changed_listener перечитываются
+только измененные задачи (db.get_reminders_by_ids), их старые записи в
+куче помечаются устаревшими и пропускаются при извлечении, а таймер
+перевзводится по новой вершине. Все окно перечитывается только при
+переходе горизонта и после изменений, о которых неизвестно, какие задачи
+они затронули (импорт, правило повторения).
+"""
+import heapq
+import itertools
+from datetime import datetime, timedelta
+
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+import db
+from DbWorker import get_worker
+from logger import get_logger
+
+logger = get_logger('reminders')
+
+# На сколько дней вперед держать напоминания в памяти
+HORIZON_DAYS = 2
+# Самый долгий интервал таймера: раз в сутки время сверяется заново
+# (после сна компьютера или перевода часов)
+MAX_TIMER_MS = 24 * 60 * 60 * 1000
+# Пропущенные напоминания показываются, если опоздали не больше чем на это время
+MISSED_GRACE = timedelta(minutes=15)
+
+
+class ReminderScheduler(QObject):
+    """Куча напоминаний пользователя с одним таймером"""
+
+    # Пора напомнить о задаче (Task)
+    reminderDue = pyqtSignal(object)
+    # Изменение задач из любого потока; доставляется в поток объекта (GUI).
+    # user_id передается как есть (object): int-сигнал молча искажал бы
+    # значение другого типа, и сравнение с self.user_id не совпадало бы
+    _tasksChanged = pyqtSignal(object, object, object)
+
+    def __init__(self, user_id, parent=None):
+        super().__init__(parent)
+        self.user_id = user_id
+        self._heap = []  # (время, порядковый номер, Task)
+        self._seq = itertools.count()
+        # id задачи -> порядковый номер ее актуальной записи в куче; записи
+        # с другим номером устарели и пропускаются
+        self._entries = {}
+        # Уже показанные напоминания (id задачи, время), чтобы перечитывание не повторяло их
+        self._fired = set()
+        self._loaded_until = None  # до какого момента напоминания загружены
+        self._enabled = False
+        self._tag = f'reminders.{user_id}'
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._on_timer)
+
+        self._tasksChanged.connect(self._on_tasks_changed)
+        self._listener = self._tasksChanged.emit
+        db.add_tasks_changed_listener(self._listener)
+
+    def start(self):
+        """Включение напоминаний и загрузка ближайших"""
+        self._enabled = True
+        self.reload()
+
+    def stop(self):
+        """Выключение напоминаний"""
+        self._enabled = False
+        self._timer.stop()
+        get_worker().cancel(self._tag)
+        self._heap = []
+        self._entries = {}
+        self._loaded_until = None
+
+    def set_enabled(self, enabled):
+        if enabled and not self._enabled:
+            self.start()
+        elif not enabled and self._enabled:
+            self.stop()
+
+    def shutdown(self):
+        """Остановка и отписка от изменений задач"""
+        self.stop()
+        db.remove_tasks_changed_listener(self._listener)
+
+    def reload(self):
+        """Перечитывание напоминаний от текущей даты до горизонта"""
+        if not self._enabled:
+            return
+        today = datetime.now().date()
+        loaded_until = datetime.combine(today + timedelta(days=HORIZON_DAYS), datetime.min.time())
+        # Задача, назначенная на день после горизонта, может напомнить о себе раньше него
+        last_day = today + timedelta(days=HORIZON_DAYS, minutes=db.MAX_REMIND_BEFORE)
+        get_worker().submit(db.get_reminders, self.user_id, today.isoformat(), last_day.isoformat(),
+                            tag=self._tag,
+                            on_result=lambda reminders: self._set_reminders(reminders, loaded_until))
+
+    def _set_reminders(self, reminders, loaded_until):
+        if not self._enabled:
+            return
+        now = datetime.now()
+        missed_before = now - MISSED_GRACE
+        self._fired = {key for key in self._fired if key[1] >= missed_before}
+        self._entries = {}
+        self._loaded_until = loaded_until
+        self._heap = self._entries_for(reminders, missed_before)
+        heapq.heapify(self._heap)
+        logger.debug("Загружено напоминаний: %s", len(self._heap))
+        self._fire_due()
+
+    def _entries_for(self, reminders, missed_before):
+        """Записи кучи для напоминаний, попавших в окно; они становятся актуальными"""
+        entries = []
+        for when, task in reminders:
+            if missed_before <= when < self._loaded_until and (task.id, when) not in self._fired:
+                seq = next(self._seq)
+                self._entries[task.id] = seq
+                entries.append((when, seq, task))
+        return entries
+
+    def _on_tasks_changed(self, user_id, dates, task_ids):
+        if user_id != self.user_id or not self._enabled or self._loaded_until is None:
+            return
+        in_window = True
+        if dates is not None:
+            first = datetime.now().date().isoformat()
+            last = (self._loaded_until + timedelta(minutes=db.MAX_REMIND_BEFORE)).date().isoformat()
+            in_window = any(first <= day <= last for day in dates)
+        if task_ids is None:
+            if in_window:
+                self.reload()
+            return
+        if not in_window and not any(task_id in self._entries for task_id in task_ids):
+            return
+        get_worker().submit(db.get_reminders_by_ids, self.user_id, list(task_ids),
+                            on_result=lambda reminders: self._update_reminders(task_ids, reminders))
+
+    def _update_reminders(self, task_ids, reminders):
+        """Замена записей кучи только для задач task_ids"""
+        if not self._enabled or self._loaded_until is None:
+            return
+        if reminders is None:
+            self.reload()
+            return
+        for task_id in task_ids:
+            self._entries.pop(task_id, None)
+        for entry in self._entries_for(reminders, datetime.now() - MISSED_GRACE):
+            heapq.heappush(self._heap, entry)
+        if len(self._heap) > 2 * len(self._entries) + 16:
+            # Устаревших записей накопилось много - куча пересобирается
+            self._heap = [entry for entry in self._heap if not self._is_stale(entry)]
+            heapq.heapify(self._heap)
+        logger.debug("Обновлены напоминания задач %s: %s", task_ids, len(reminders))
+        self._fire_due()
+
+    def _on_timer(self):
+        if datetime.now() >= self._loaded_until:
+            self.reload()
+            return
+        self._fire_due()
+
+    def _is_stale(self, entry):
+        return self._entries.get(entry[2].id) != entry[1]
+
+    def _fire_due(self):
+        """Сигнал о наступивших напоминаниях и перевзвод таймера"""
+        now = datetime.now()
+        while self._heap and (self._heap[0][0] <= now or self._is_stale(self._heap[0])):
+            entry = heapq.heappop(self._heap)
+            if self._is_stale(entry):
+                continue
+            when, _, task = entry
+            del self._entries[task.id]
+            self._fired.add((task.id, when))
+            self.reminderDue.emit(task)
+
+        next_time = self._loaded_until
+        if self._heap:
+            next_time = min(next_time, self._heap[0][0])
+        delay_ms = int((next_time - now).total_seconds() * 1000) + 1
+        self._timer.start(max(0, min(delay_ms, MAX_TIMER_MS)))
@@ -0,0 +1,261 @@
+"""Календарь месяца со значками задач.
+
+paintCell рисует на дне число задач (цвет - по высшему приоритету
+невыполненных, серый - если все выполнены), точку просрочки и отметку
+обязательных задач. Счетчики видимого месяца загружаются одним
+сгруппированным запросом (get_task_counts_by_range) в фоновом потоке и
+хранятся в небольшом LRU-кэше по месяцам; при отрисовке база не
+читается. После изменения задач перечитываются и перерисовываются
+только затронутые дни. Соседние месяцы подгружаются заранее (Prefetcher),
+так что листание показывает значки сразу.
+"""
+from collections import OrderedDict
+
+from PyQt6.QtCore import QDate, QPoint, QRect, Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QFont, QPainter, QPolygon, QTextCharFormat
+from PyQt6.QtWidgets import QCalendarWidget
+
+import db
+from DbWorker import get_worker
+from Prefetcher import Prefetcher
+from Theme import current_colors
+from logger import get_logger
+
+logger = get_logger('task_calendar')
+
+# Сколько месяцев счетчиков держать в памяти (с запасом на предзагрузку соседей)
+MONTH_CACHE_SIZE = 12
+# Сетка календаря - 6 недель; месяц, начинающийся с первого дня недели,
+# показывается с целой неделей предыдущего месяца
+GRID_BEFORE_DAYS = 7
+GRID_DAYS = 42
+
+BADGE_SIZE = 16
+
+
+class TaskCalendar(QCalendarWidget):
+    """QCalendarWidget со значками количества задач на днях"""
+
+    # Изменение задач из любого потока; доставляется в поток объекта (GUI).
+    # user_id передается как есть (object): int-сигнал молча искажал бы
+    # значение другого типа, и сравнение с self.user_id не совпадало бы
+    _tasksChanged = pyqtSignal(object, object, object)
+
+    def __init__(self, user_id, parent=None):
+        super().__init__(parent)
+        self.user_id = user_id
+        self.worker = get_worker()
+        # (год, месяц) -> (первая дата 'yyyy-MM-dd', последняя, {дата: счетчики})
+        self._months = OrderedDict()
+        self._generation = 0  # меняется при каждом изменении задач
+        self._dirty_dates = set()
+        self._opened_date = None
+        self._badge_font = None
+
+        # Изменения, пришедшие подряд, перечитываются одним запросом
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self._reload_dirty_dates)
+
+        self.prefetcher = Prefetcher(self._neighbour_months, lambda key: key in self._months,
+                                     self._fetch_month, parent=self)
+
+        self.currentPageChanged.connect(self.load_month)
+        self._tasksChanged.connect(self._on_tasks_changed)
+        self._listener = self._tasksChanged.emit
+        db.add_tasks_changed_listener(self._listener)
+
+        self.refresh_formats()
+        self.load_month(self.yearShown(), self.monthShown())
+
+    def shutdown(self):
+        """Отписка от изменений задач"""
+        self.prefetcher.cancel()
+        db.remove_tasks_changed_listener(self._listener)
+
+    # ---------- Формат сегодняшнего и открытого дня ----------
+
+    def set_opened_date(self, date):
+        """Выделение дня, задачи которого открыты; меняются только два дня"""
+        if date == self._opened_date:
+            return
+        previous, self._opened_date = self._opened_date, date
+        for day in (previous, date):
+            if day is not None and day.isValid():
+                self._apply_format(day)
+
+    def refresh_formats(self):
+        """Форматы сегодняшнего и открытого дня заново (после смены темы)"""
+        self.setDateTextFormat(QDate(), QTextCharFormat())
+        self._apply_format(QDate.currentDate())
+        if self._opened_date is not None and self._opened_date.isValid():
+            self._apply_format(self._opened_date)
+
+    def _apply_format(self, date):
+        colors = current_colors()
+        today = QDate.currentDate()
+        text_format = QTextCharFormat()
+        if date == self._opened_date:
+            if date == today:
+                text_format.setBackground(colors.selected_today_background)
+                text_format.setForeground(colors.selected_today_text)
+            else:
+                text_format.setBackground(colors.selected_background)
+                text_format.setForeground(colors.selected_text)
+        elif date == today:
+            text_format.setBackground(colors.today_background)
+            text_format.setForeground(colors.today_text)
+        self.setDateTextFormat(date, text_format)
+
+    # ---------- Счетчики задач ----------
+
+    @staticmethod
+    def _grid_range(year, month):
+        first = QDate(year, month, 1).addDays(-GRID_BEFORE_DAYS)
+        return first.toString('yyyy-MM-dd'), first.addDays(GRID_BEFORE_DAYS + GRID_DAYS - 1).toString('yyyy-MM-dd')
+
+    def load_month(self, year, month):
+        """Счетчики для сетки месяца (из кэша или одним запросом в фоне)"""
+        key = (year, month)
+        self.prefetcher.navigated(key)
+        if key in self._months:
+            self._months.move_to_end(key)
+            self.updateCells()
+            return
+
+        func, args, on_result = self._fetch_month(key)
+        self.worker.submit(func, *args, tag=(id(self), 'month'), on_result=on_result)
+
+    @staticmethod
+    def _neighbour_months(key, depth):
+        """Соседние месяцы, ближние первыми: +1, -1, +2, -2, ..."""
+        first = QDate(key[0], key[1], 1)
+        months = []
+        for distance in range(1, depth + 1):
+            for step in (distance, -distance):
+                date = first.addMonths(step)
+                months.append((date.year(), date.month()))
+        return months
+
+    def _fetch_month(self, key):
+        """Запрос счетчиков месяца для фонового потока"""
+        first, last = self._grid_range(*key)
+        generation = self._generation
+        return (db.get_task_counts_by_range, (self.user_id, first, last),
+                lambda counts: self._set_month(key, first, last, counts, generation))
+
+    def _set_month(self, key, first, last, counts, generation):
+        if generation != self._generation:
+            # Пока месяц считался, задачи изменились - видимый месяц считаем
+            # заново, а предзагруженный просто не сохраняем
+            if key == (self.yearShown(), self.monthShown()):
+                self.load_month(*key)
+            return
+        self._months[key] = (first, last, counts)
+        self._months.move_to_end(key)
+        while len(self._months) > MONTH_CACHE_SIZE:
+            self._months.popitem(last=False)
+        if key == (self.yearShown(), self.monthShown()):
+            self.updateCells()
+
+    def _on_tasks_changed(self, user_id, dates, task_ids):
+        if user_id != self.user_id:
+            return
+        self._generation += 1
+        if dates is None:
+            self._months.clear()
+            self._dirty_dates.clear()
+            self.load_month(self.yearShown(), self.monthShown())
+            return
+        self._dirty_dates.update(dates)
+        self._flush_timer.start(0)
+
+    def _reload_dirty_dates(self):
+        """Перечитывание счетчиков только измененных дней, попавших в кэш"""
+        dates = {day for day in self._dirty_dates
+                 if any(first <= day <= last for first, last, _ in self._months.values())}
+        self._dirty_dates.clear()
+        if not dates:
+            return
+        generation = self._generation
+        self.worker.submit(
+            db.get_task_counts_by_range, self.user_id, min(dates), max(dates),
+            on_result=lambda counts: self._patch_dates(dates, counts, generation)
+        )
+
+    def _patch_dates(self, dates, counts, generation):
+        if generation != self._generation:
+            # За время запроса пришли новые изменения - их перечитает следующий запрос
+            self._dirty_dates.update(dates)
+            self._flush_timer.start(0)
+            return
+        for first, last, month_counts in self._months.values():
+            for day in dates:
+                if not first <= day <= last:
+                    continue
+                if day in counts:
+                    month_counts[day] = counts[day]
+                else:
+                    month_counts.pop(day, None)
+        for day in dates:
+            self.updateCell(QDate.fromString(day, 'yyyy-MM-dd'))
+
+    def day_counts(self, date):
+        """Счетчики дня из кэша видимого месяца (без запроса к базе)"""
+        month = self._months.get((self.yearShown(), self.monthShown()))
+        if month is None:
+            return None
+        return month[2].get(date.toString('yyyy-MM-dd'))
+
+    # ---------- Отрисовка ----------
+
+    def paintCell(self, painter, rect, date):
+        super().paintCell(painter, rect, date)
+
+        counts = self.day_counts(date)
+        if not counts or not counts['total']:
+            return
+
+        colors = current_colors()
+        open_count = counts['total'] - counts['done']
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+        # Число задач в правом верхнем углу
+        if self._badge_font is None:
+            self._badge_font = QFont(self.font())
+            self._badge_font.setPointSize(max(6, self.font().pointSize() - 2))
+            self._badge_font.setBold(True)
+        badge = QRect(rect.right() - BADGE_SIZE - 1, rect.top() + 2, BADGE_SIZE, BADGE_SIZE)
+        if open_count:
+            badge_color = colors.priority.get(counts['max_priority'], colors.priority[1])
+        else:
+            badge_color = colors.done
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(badge_color)
+        painter.drawEllipse(badge)
+        painter.setFont(self._badge_font)
+        painter.setPen(colors.task_text)
+        painter.drawText(badge, Qt.AlignmentFlag.AlignCenter, str(counts['total']))
+
+        # Точка просрочки: в прошедшем дне остались невыполненные задачи
+        if open_count and date < QDate.currentDate():
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(colors.overdue)
+            painter.drawEllipse(rect.left() + 4, rect.bottom() - 9, 6, 6)
+
+        # Отметка обязательных задач
+        if counts['mandatory']:
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(colors.mandatory)
+            size = 7
+            x, y = rect.right() - size - 3, rect.bottom() - size - 3
+            painter.drawPolygon(_diamond(x, y, size))
+
+        painter.restore()
+
+
+def _diamond(x, y, size):
+    """Ромб, вписанный в квадрат (x, y, size)"""
+    half = size // 2
+    return QPolygon([QPoint(x + half, y), QPoint(x + size, y + half), QPoint(x + half, y + size), QPoint(x, y + half)])
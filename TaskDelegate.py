@@ -0,0 +1,217 @@
+"""Отрисовка задач в представлениях без виджетов на каждую задачу.
+
+Делегат рисует строку задачи прямо на viewport: фон по приоритету,
+статус, значок приоритета, отметку обязательности, название
+(зачеркнутое у выполненных) и плашку категории; строки, изменение
+которых еще выполняется, приглушены. Цвета берутся из палитры текущей
+темы (Theme.py), шрифты создаются один раз и переиспользуются.
+"""
+from PyQt6.QtCore import Qt, QRect, QSize, QEvent, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QPainter, QPen
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle
+
+from TaskModels import TaskRole, DateRole
+from db import parse_occurrence_id
+from Theme import current_colors
+
+PRIORITY_ICONS = {3: "🔴", 2: "🟡", 1: "🟢"}
+
+TASK_HEIGHT = 30
+DAY_HEIGHT = 38
+BUTTON_SIZE = 25
+CATEGORY_WIDTH = 140
+MARGIN = 5
+
+
+def task_background(task, colors):
+    """Цвет фона задачи: выполненные серые, обязательные выделены"""
+    if task.done:
+        return colors.done
+    if task.is_mandatory:
+        return colors.mandatory
+    return colors.priority.get(task.priority, colors.priority[1])
+
+
+def task_title(task):
+    """Название задачи со значками времени и повторения"""
+    title = task.title or 'Без названия'
+    if parse_occurrence_id(task.id):
+        title = f"🔁 {title}"
+    if task.due_time:
+        title = f"⏰ {task.due_time} {title}"
+    return title
+
+
+class TaskDelegate(QStyledItemDelegate):
+    """Строки задач, заголовки дней недели и строки-подсказки.
+
+    Кнопки "⋯" и "+" в заголовке дня нарисованы, нажатия на них
+    приходят сигналами dayMenuRequested и addRequested.
+    """
+
+    # Дата дня и прямоугольник кнопки в координатах viewport
+    addRequested = pyqtSignal(object)
+    dayMenuRequested = pyqtSignal(object, QRect)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._fonts = {}
+        self._colors = {}
+
+    def _font(self, base, bold=False, strike=False, italic=False, point_size=None):
+        """Шрифт-вариант базового, созданный один раз"""
+        key = (base.key(), bold, strike, italic, point_size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = QFont(base)
+            font.setBold(bold)
+            font.setStrikeOut(strike)
+            font.setItalic(italic)
+            if point_size:
+                font.setPointSize(point_size)
+            self._fonts[key] = font
+        return font
+
+    def _color(self, name):
+        """QColor по строке цвета категории, созданный один раз"""
+        color = self._colors.get(name)
+        if color is None:
+            color = self._colors[name] = QColor(name)
+        return color
+
+    # ---------- Размеры и кнопки заголовка дня ----------
+
+    @staticmethod
+    def _is_day(index):
+        """Строка заголовка дня: без задачи, но с датой"""
+        return index.data(TaskRole) is None and index.data(DateRole) is not None
+
+    def sizeHint(self, option, index):
+        height = DAY_HEIGHT if self._is_day(index) else TASK_HEIGHT
+        return QSize(option.rect.width(), height)
+
+    @staticmethod
+    def _day_buttons(rect):
+        """Прямоугольники кнопок "⋯" и "+" в заголовке дня"""
+        top = rect.top() + (rect.height() - BUTTON_SIZE) // 2
+        add_rect = QRect(rect.right() - MARGIN - BUTTON_SIZE, top, BUTTON_SIZE, BUTTON_SIZE)
+        menu_rect = add_rect.translated(-BUTTON_SIZE - MARGIN, 0)
+        return menu_rect, add_rect
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and self._is_day(index)):
+            menu_rect, add_rect = self._day_buttons(option.rect)
+            pos = event.position().toPoint()
+            if add_rect.contains(pos):
+                self.addRequested.emit(index.data(DateRole))
+                return True
+            if menu_rect.contains(pos):
+                self.dayMenuRequested.emit(index.data(DateRole), menu_rect)
+                return True
+        return super().editorEvent(event, model, option, index)
+
+    # ---------- Отрисовка ----------
+
+    def paint(self, painter, option, index):
+        task = index.data(TaskRole)
+        colors = current_colors()
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        if task is not None:
+            # Недоступная строка - изменение задачи еще выполняется
+            if not option.state & QStyle.StateFlag.State_Enabled:
+                painter.setOpacity(0.5)
+            self._paint_task(painter, option, task, colors)
+        elif index.data(DateRole) is not None:
+            self._paint_day(painter, option, index, colors)
+        else:
+            painter.setFont(self._font(option.font, italic=True))
+            painter.setPen(colors.hint_text)
+            painter.drawText(option.rect.adjusted(MARGIN, 0, -MARGIN, 0),
+                             Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft,
+                             index.data(Qt.ItemDataRole.DisplayRole) or '')
+        painter.restore()
+
+    def _paint_day(self, painter, option, index, colors):
+        rect = option.rect.adjusted(1, 3, -1, -1)
+        painter.setPen(QPen(colors.day_border))
+        painter.setBrush(colors.day_background)
+        painter.drawRoundedRect(rect, 5, 5)
+
+        menu_rect, add_rect = self._day_buttons(option.rect)
+        text_rect = rect.adjusted(2 * MARGIN, 0, -(option.rect.right() - menu_rect.left() + MARGIN), 0)
+
+        title = index.data(Qt.ItemDataRole.DisplayRole)
+        painter.setFont(self._font(option.font, bold=True, point_size=12))
+        painter.setPen(colors.heading)
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, title)
+
+        if not index.model().hasChildren(index):
+            title_width = painter.fontMetrics().horizontalAdvance(title)
+            painter.setFont(self._font(option.font, italic=True))
+            painter.setPen(colors.hint_text)
+            painter.drawText(text_rect.adjusted(title_width + 2 * MARGIN, 0, 0, 0),
+                             Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, "Нет задач")
+
+        painter.setFont(self._font(option.font, bold=True))
+        painter.setPen(QPen(colors.day_border))
+        painter.setBrush(colors.day_background)
+        painter.drawRoundedRect(menu_rect, 3, 3)
+        painter.setPen(colors.heading)
+        painter.drawText(menu_rect, Qt.AlignmentFlag.AlignCenter, "⋯")
+
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(colors.add_button)
+        painter.drawRoundedRect(add_rect, 3, 3)
+        painter.setPen(colors.highlight_text)
+        painter.drawText(add_rect, Qt.AlignmentFlag.AlignCenter, "+")
+
+    def _paint_task(self, painter, option, task, colors):
+        rect = option.rect.adjusted(0, 1, 0, -1)
+        painter.fillRect(rect, task_background(task, colors))
+        if option.state & QStyle.StateFlag.State_MouseOver:
+            painter.fillRect(rect, colors.hover)
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.setPen(QPen(option.palette.highlight(), 2))
+            painter.drawRect(rect.adjusted(1, 1, -1, -1))
+
+        painter.setFont(option.font)
+        metrics = painter.fontMetrics()
+        align = Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft
+        x = rect.left() + MARGIN
+
+        # Статус, значок приоритета и отметка обязательности
+        painter.setPen(colors.done_text if task.done else colors.task_text)
+        icons = ["✅" if task.done else "⏳", PRIORITY_ICONS.get(task.priority, PRIORITY_ICONS[1])]
+        if task.is_mandatory:
+            icons.append("🔸")
+        for icon in icons:
+            painter.drawText(QRect(x, rect.top(), rect.width(), rect.height()), align, icon)
+            x += metrics.horizontalAdvance(icon) + 8
+
+        # Плашка категории справа
+        right = rect.right() - MARGIN
+        if task.category_id and task.category_name:
+            pill = QRect(right - CATEGORY_WIDTH, rect.top() + 2, CATEGORY_WIDTH, rect.height() - 4)
+            if task.done:
+                pill_color = colors.category_done
+            elif task.category_color:
+                pill_color = self._color(task.category_color)
+            else:
+                pill_color = colors.category_default
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(pill_color)
+            painter.drawRoundedRect(pill, 5, 5)
+            painter.setPen(colors.category_text)
+            name = metrics.elidedText(task.category_name, Qt.TextElideMode.ElideRight, pill.width() - 2 * MARGIN)
+            painter.drawText(pill, Qt.AlignmentFlag.AlignCenter, name)
+            right = pill.left() - MARGIN
+
+        # Название (зачеркнутое у выполненных)
+        painter.setFont(self._font(option.font, strike=task.done))
+        painter.setPen(colors.done_text if task.done else colors.task_text)
+        title_rect = QRect(x, rect.top(), max(0, right - x), rect.height())
+        title = painter.fontMetrics().elidedText(task_title(task), Qt.TextElideMode.ElideRight, title_rect.width())
+        painter.drawText(title_rect, align, title)
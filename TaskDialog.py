@@ -1,13 +1,18 @@
-from PyQt6.QtWidgets import (QDialog, QMessageBox, QInputDialog, QListWidgetItem, 
-                             QAbstractItemView, QMenu, QInputDialog, QCheckBox, 
-                             QHBoxLayout, QWidget, QPushButton, QVBoxLayout, QLabel,
-                             QComboBox, QTextEdit)
-from PyQt6.QtCore import Qt, QDate
-from PyQt6 import QtGui
-from TaskEditorDialog import create_task_editor_dialog
+from PyQt6.QtWidgets import (QDialog, QMessageBox, QAbstractItemView, QMenu,
+                             QHBoxLayout, QPushButton, QListView)
+from PyQt6.QtCore import Qt, QDate, QTimer
+from TaskEditorDialog import create_task_editor_dialog, ask_move_date, exec_bulk_menu
 from ui.taskdialog import Ui_Dialog
-from db import (add_task, get_tasks_by_date, remove_task, toggle_task_status, 
-                update_task, toggle_mandatory_status, get_categories, get_task_stats, get_task)
+from repository import (get_tasks_by_date, remove_task, toggle_task_status, 
+                        update_task, toggle_mandatory_status, get_categories, get_task_stats,
+                        bulk_update_tasks, bulk_move_tasks, bulk_delete_tasks,
+                        end_recurrence, parse_occurrence_id)
+from TaskModels import TaskListModel, TaskRole
+from TaskDelegate import TaskDelegate
+from DbWorker import get_worker, LOADING_DELAY_MS
+from logger import get_logger
+
+logger = get_logger('task_dialog')
 
 class TaskDialog(QDialog):
     def __init__(self, parent=None, user_id=1):
@@ -15,9 +20,22 @@ class TaskDialog(QDialog):
         self.ui = Ui_Dialog()
         self.ui.setupUi(self)
         self.user_id = user_id
+        self.worker = get_worker()
         
         self.current_date = QDate.currentDate()
-        self.ui.listWidget.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        
+        # Список задач - модель и делегат вместо QListWidget: после изменения
+        # одной задачи перерисовывается только ее строка
+        self.model = TaskListModel(self)
+        self.view = QListView(self)
+        self.view.setGeometry(self.ui.listWidget.geometry())
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(TaskDelegate(self.view))
+        self.view.setUniformItemSizes(True)
+        self.view.setMouseTracking(True)
+        self.ui.listWidget.hide()
+        # Ctrl/Shift+клик выделяет несколько задач для массовых действий
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.setup_enhanced_ui()
         self.load_categories()
         
@@ -27,11 +45,11 @@ class TaskDialog(QDialog):
         self.ui.pushButton_3.clicked.connect(self.close_dialog)
         
         # Двойной клик по задаче для отметки выполнения
-        self.ui.listWidget.doubleClicked.connect(self.toggle_task_done)
+        self.view.doubleClicked.connect(self.toggle_task_done)
         
         # Контекстное меню для редактирования
-        self.ui.listWidget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.ui.listWidget.customContextMenuRequested.connect(self.show_context_menu)
+        self.view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.show_context_menu)
         
     def setup_enhanced_ui(self):
         """Настройка улучшенного интерфейса"""
@@ -71,113 +89,56 @@ class TaskDialog(QDialog):
         self.load_tasks()
         
     def load_tasks(self):
-        """Загрузка задач для текущей даты"""
-        self.ui.listWidget.clear()
-        tasks = get_tasks_by_date(self.current_date, self.user_id)
+        """Загрузка задач для текущей даты в фоновом потоке"""
+        # Загрузка предыдущей даты, если она еще идет, отменяется
+        request_id = self.worker.submit(
+            get_tasks_by_date, self.current_date.toString('yyyy-MM-dd'), self.user_id,
+            tag=(id(self), 'tasks'), on_result=self.show_tasks
+        )
+        QTimer.singleShot(LOADING_DELAY_MS, lambda: self.show_loading(request_id))
+    
+    def show_loading(self, request_id):
+        """Состояние загрузки, если задачи грузятся дольше LOADING_DELAY_MS"""
+        if not self.worker.is_pending(request_id):
+            return
+        self.model.set_placeholder("⏳ Загрузка задач...")
+    
+    def show_tasks(self, tasks):
+        """Отображение загруженных задач (None - ошибка загрузки)"""
+        if tasks is None:
+            self.model.set_placeholder("⚠️ Не удалось загрузить задачи")
+            return
+        logger.debug("Задач на %s: %s", self.current_date, len(tasks))
+        self.model.set_tasks(self.current_date.toString('yyyy-MM-dd'), tasks)
+    
+    def apply_task(self, task):
+        """Замена одной строки задачи после изменения (без перезагрузки списка)"""
+        if task is None:
+            QMessageBox.warning(self, 'Ошибка', 'Не удалось изменить задачу')
+            return
+        self.model.update_task(task)
+    
+    def submit_write(self, func, *args, task_ids=(), on_result=None, **kwargs):
+        """Изменение задач в фоновом потоке базы.
+
+        Строки task_ids недоступны до ответа; on_result получает результат
+        func или None, если она завершилась исключением.
+        """
+        task_ids = list(task_ids)
+        self.model.set_pending(task_ids, True)
         
-        print(f"📋 Всего задач: {len(tasks)}")
+        def finish(result):
+            self.model.set_pending(task_ids, False)
+            on_result(result)
         
-        for task in tasks:
-            item = QListWidgetItem()
-            
-            # Получаем данные задачи
-            status = "✅" if task['done'] else "❌"
-            mandatory_indicator = "🔸 " if task['is_mandatory'] else ""
-            priority_indicator = "⚡" * task.get('priority', 1)
-            
-            # Категория - будет справа
-            category_name = task.get('category_name', '')
-            if category_name:
-                category_text = f" [{category_name}]"
-            else:
-                category_text = ""
-            
-            # Формируем текст задачи:
-            # СЛЕВА: индикаторы + название | статус | СПРАВА: категория
-            task_text = f"{mandatory_indicator}{priority_indicator} {task['title']} | {status}{category_text}"
-            print(f"   📝 Задача: '{task_text}' (mandatory={task['is_mandatory']})")
-            item.setText(task_text)
-            item.setData(Qt.ItemDataRole.UserRole, task['id'])
-            
-            # цвет
-            category_color = task.get('category_color')
-            if category_color:
-                try:
-                    color = QtGui.QColor(category_color)
-                    item.setForeground(color)
-                    print(f"   🎨 Текст окрашен в цвет категории: {category_color}")
-                except Exception as e:
-                    print(f"   ❌ Ошибка цвета: {e}")
-            
-            # всплывающая подсказка описания
-            description = task.get('description', '')
-            if description:
-                tooltip_text = f"📝 Описание:\n{description}"
-                
-                # Добавляем информацию о категории
-                if category_name:
-                    tooltip_text += f"\n\n🏷️ Категория: {category_name}"
-                
-                # Добавляем приоритет
-                priority_text = {
-                    1: "🟢 Низкий",
-                    2: "🟡 Средний", 
-                    3: "🔴 Высокий"
-                }.get(task.get('priority', 1), "⚪ Не указан")
-                
-                tooltip_text += f"\n⚡ Приоритет: {priority_text}"
-                
-                # Добавляем дату создания
-                if task.get('created_at'):
-                    tooltip_text += f"\n📅 Создана: {task['created_at']}"
-                
-                item.setToolTip(tooltip_text)
-            
-            if task['done']:
-                font = item.font()
-                font.setStrikeOut(True)
-                item.setFont(font)
-                # Для выполненных задач делаем более светлый цвет
-                current_color = item.foreground().color()
-                lighter_color = QtGui.QColor(
-                    min(current_color.red() + 100, 255),
-                    min(current_color.green() + 100, 255),
-                    min(current_color.blue() + 100, 255)
-                )
-                item.setForeground(lighter_color)
-            
-            self.ui.listWidget.addItem(item)
-        
-        print("=" * 50)
+        self.worker.submit(func, *args, tag=(id(self), 'write', tuple(task_ids)),
+                           on_result=finish, on_error=lambda e: finish(None), **kwargs)
     
-    def style_task_item(self, item, task):
-        """Стилизация элемента задачи"""
-        is_mandatory = task.get('is_mandatory', False)
-        is_done = task.get('done', False)
-        priority = task.get('priority', 1)
-        category_color = task.get('category_color')
-        
-        # Базовые стили
-        if is_mandatory:
-            item.setBackground(QtGui.QColor(240, 240, 240))
-        
-        if is_done:
-            font = item.font()
-            font.setStrikeOut(True)
-            item.setFont(font)
-            item.setForeground(QtGui.QColor(150, 150, 150))
-        else:
-            # Цвет в зависимости от приоритета
-            if priority == 3:  # Высокий
-                item.setForeground(QtGui.QColor(220, 20, 60))  # Красный
-            elif priority == 2:  # Средний
-                item.setForeground(QtGui.QColor(255, 140, 0))  # Оранжевый
-            else:  # Низкий
-                item.setForeground(QtGui.QColor(0, 0, 0))  # Черный
-            
-            # Цвет категории если есть
-            if category_color:
-                item.setForeground(QtGui.QColor(category_color))
+    def finish_bulk(self, result, error_text='Не удалось изменить задачи'):
+        """Перезагрузка списка после массового изменения (None - ошибка)"""
+        if result is None:
+            QMessageBox.warning(self, 'Ошибка', error_text)
+        self.load_tasks()
     
     def show_enhanced_add_task_dialog(self):
         """Показ улучшенного диалога добавления задачи"""
@@ -192,19 +153,26 @@ class TaskDialog(QDialog):
             self.load_tasks()
 
             
+    def selected_task_ids(self):
+        """ID выделенных задач (кроме тех, что еще изменяются)"""
+        return [index.data(TaskRole).id for index in self.view.selectionModel().selectedRows()
+                if index.data(TaskRole) is not None and not self.model.is_pending(index.data(TaskRole).id)]
+    
     def show_context_menu(self, position):
         """Показ контекстного меню для редактирования"""
-        item = self.ui.listWidget.itemAt(position)
-        if not item:
+        index = self.view.indexAt(position)
+        task_info = index.data(TaskRole)
+        if task_info is None or self.model.is_pending(task_info.id):
             return
-            
-        task_id = item.data(Qt.ItemDataRole.UserRole)
-        task_info = get_task(task_id, self.user_id)
-
         
-        if not task_info:
+        # Клик по одной из нескольких выделенных задач - меню массовых действий
+        task_ids = self.selected_task_ids()
+        if len(task_ids) > 1 and self.view.selectionModel().isSelected(index):
+            self.show_bulk_context_menu(position, task_ids)
             return
             
+        task_id = task_info.id
+            
         menu = QMenu(self)
         
         # Основные действия
@@ -227,27 +195,89 @@ class TaskDialog(QDialog):
         medium_priority_action = priority_menu.addAction("🟡 Средний")
         low_priority_action = priority_menu.addAction("🟢 Низкий")
         
-        action = menu.exec(self.ui.listWidget.mapToGlobal(position))
+        # Повторяющаяся задача: удаление выше убирает только этот день
+        occurrence = parse_occurrence_id(task_id)
+        stop_repeat_action = None
+        if occurrence:
+            menu.addSeparator()
+            stop_repeat_action = menu.addAction("🔁 Не повторять с этого дня")
+        
+        action = menu.exec(self.view.viewport().mapToGlobal(position))
         
         if action == edit_action:
-            self.edit_enhanced_task(task_info, item)
+            self.edit_enhanced_task(task_info)
         elif action == delete_action:
-            self.delete_specific_task(item)
+            self.delete_specific_task(task_id)
         elif action == toggle_mandatory_action:
-            self.toggle_mandatory_status(task_info, item)
+            self.toggle_mandatory_status(task_info)
         elif action == toggle_done_action:
-            self.toggle_specific_task(item)
+            self.toggle_specific_task(task_id)
         elif action == high_priority_action:
             self.change_priority(task_id, 3)
         elif action == medium_priority_action:
             self.change_priority(task_id, 2)
         elif action == low_priority_action:
             self.change_priority(task_id, 1)
+        elif action is not None and action == stop_repeat_action:
+            self.stop_recurrence(occurrence[0], task_id)
+    
+    def stop_recurrence(self, recurrence_id, task_id):
+        """Прекращение повторения задачи начиная с текущей даты"""
+        reply = QMessageBox.question(
+            self,
+            'Повторяющаяся задача',
+            'Удалить эту и все следующие повторения задачи?',
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            self.submit_write(end_recurrence, self.user_id, recurrence_id,
+                              self.current_date.toString('yyyy-MM-dd'),
+                              task_ids=[task_id], on_result=lambda ended: self.load_tasks())
     
-    def edit_enhanced_task(self, task_info, item):
+    def show_bulk_context_menu(self, position, task_ids):
+        """Контекстное меню для нескольких выделенных задач"""
+        choice = exec_bulk_menu(self, self.view.viewport().mapToGlobal(position),
+                                len(task_ids), self.categories)
+        if choice is None:
+            return
+        
+        kind, fields = choice
+        if kind == 'move':
+            self.move_tasks(task_ids)
+        elif kind == 'delete':
+            self.delete_tasks(task_ids)
+        else:
+            self.submit_write(bulk_update_tasks, self.user_id, task_ids,
+                              task_ids=task_ids, on_result=self.finish_bulk, **fields)
+    
+    def move_tasks(self, task_ids):
+        """Перенос выделенных задач на другую дату"""
+        new_date = ask_move_date(self, self.current_date, len(task_ids))
+        if new_date is None or new_date == self.current_date:
+            return
+        
+        self.submit_write(bulk_move_tasks, self.user_id, task_ids, new_date.toString('yyyy-MM-dd'),
+                          task_ids=task_ids,
+                          on_result=lambda result: self.finish_bulk(result, 'Не удалось перенести задачи'))
+    
+    def delete_tasks(self, task_ids):
+        """Удаление нескольких задач одной транзакцией"""
+        reply = QMessageBox.question(
+            self, 
+            'Подтверждение удаления',
+            f'Вы уверены, что хотите удалить выбранные задачи ({len(task_ids)})?',
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        
+        if reply == QMessageBox.StandardButton.Yes:
+            self.submit_write(bulk_delete_tasks, self.user_id, task_ids, task_ids=task_ids,
+                              on_result=lambda result: self.finish_bulk(result, 'Не удалось удалить задачи'))
+    
+    def edit_enhanced_task(self, task_info):
         """Редактирование задачи - используем ОБЩУЮ функцию как в неделях"""
         # Отладка: проверяем что приходит
-        print(f"🔍 TaskDialog edit: ID={task_info.get('id')}, Category ID={task_info.get('category_id')}, Name={task_info.get('category_name')}")
+        logger.debug("Редактирование задачи: ID=%s, Category ID=%s, Name=%s",
+                     task_info.get('id'), task_info.get('category_id'), task_info.get('category_name'))
         
         # Используем ТУ ЖЕ функцию что и в WeekDialog
         dialog = create_task_editor_dialog(
@@ -258,33 +288,15 @@ class TaskDialog(QDialog):
         )
         
         if dialog.exec():
-            self.load_tasks()
+            # Редактор сохраняет в фоновом потоке и возвращает новую версию задачи
+            self.apply_task(dialog.saved)
 
 
     def change_priority(self, task_id, priority):
         """Изменение приоритета задачи"""
-        if update_task(self.user_id, task_id, priority=priority):  
-            self.load_tasks()
+        self.submit_write(update_task, self.user_id, task_id, priority=priority,
+                          task_ids=[task_id], on_result=self.apply_task)
 
-    def update_enhanced_task(self, dialog, task_id, title, description, category_id, priority):
-        """Обновление задачи с расширенными параметрами"""
-        if not title.strip():
-            QMessageBox.warning(self, 'Ошибка', 'Введите название задачи')
-            return
-        
-        if update_task(
-            user_id=self.user_id,  
-            task_id=task_id,      
-            title=title.strip(),
-            description=description.strip(),
-            category_id=category_id,
-            priority=priority
-        ):
-            dialog.accept()
-            self.load_tasks()
-        else:
-            QMessageBox.warning(self, 'Ошибка', 'Не удалось обновить задачу')
-    
     def show_categories_dialog(self):
         """Показ диалога управления категориями"""
         from CategoryDialog import CategoryDialog
@@ -296,12 +308,18 @@ class TaskDialog(QDialog):
     def show_export_dialog(self):
         """Показ диалога экспорта/импорта"""
         from ExportDialog import ExportDialog
-        dialog = ExportDialog(self)
+        dialog = ExportDialog(self, user_id=self.user_id)
         dialog.exec()
     
     def show_stats(self):
-        """Показ статистики"""
-        stats = get_task_stats()
+        """Показ статистики (считается в фоновом потоке)"""
+        self.stats_btn.setEnabled(False)
+        self.worker.submit(get_task_stats, self.user_id, tag=(id(self), 'stats'),
+                           on_result=self.show_stats_message, on_error=lambda e: self.stats_btn.setEnabled(True))
+    
+    def show_stats_message(self, stats):
+        """Окно со статистикой"""
+        self.stats_btn.setEnabled(True)
         
         stats_text = f"""
 📊 Статистика задач:
@@ -321,18 +339,21 @@ class TaskDialog(QDialog):
         QMessageBox.information(self, 'Статистика', stats_text.strip())
     
     def delete_task(self):
-        """Удаление выбранной задачи"""
-        current_item = self.ui.listWidget.currentItem()
-        if not current_item:
+        """Удаление выбранной задачи (или всех выделенных)"""
+        task_ids = self.selected_task_ids()
+        if len(task_ids) > 1:
+            self.delete_tasks(task_ids)
+            return
+        
+        current = self.view.currentIndex().data(TaskRole)
+        if current is None or self.model.is_pending(current.id):
             QMessageBox.warning(self, 'Ошибка', 'Выберите задачу для удаления')
             return
             
-        self.delete_specific_task(current_item)
+        self.delete_specific_task(current.id)
     
-    def delete_specific_task(self, item):
+    def delete_specific_task(self, task_id):
         """Удаление конкретной задачи"""
-        task_id = item.data(Qt.ItemDataRole.UserRole)
-        
         reply = QMessageBox.question(
             self, 
             'Подтверждение удаления',
@@ -341,46 +362,33 @@ class TaskDialog(QDialog):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            remove_task(self.user_id, task_id)
-            self.load_tasks()
+            self.submit_write(remove_task, self.user_id, task_id, task_ids=[task_id],
+                              on_result=lambda deleted: self.task_removed(task_id, deleted))
+    
+    def task_removed(self, task_id, deleted):
+        """Удаление строки задачи после ответа базы"""
+        if deleted:
+            self.model.remove_task(task_id)
+        else:
+            QMessageBox.warning(self, 'Ошибка', 'Не удалось удалить задачу')
         
     def toggle_task_done(self, index):
         """Отметка задачи как выполненной/невыполненной"""
-        item = self.ui.listWidget.item(index.row())
-        task_id = item.data(Qt.ItemDataRole.UserRole)
-        toggle_task_status(task_id, self.user_id)  
-        self.load_tasks()
+        task = index.data(TaskRole)
+        if task is not None and not self.model.is_pending(task.id):
+            self.toggle_specific_task(task.id)
 
-    def toggle_specific_task(self, item):
+    def toggle_specific_task(self, task_id):
         """Изменение статуса задачи через контекстное меню"""
-        task_id = item.data(Qt.ItemDataRole.UserRole)
-        toggle_task_status(task_id, self.user_id)  
-        self.load_tasks()
+        self.submit_write(toggle_task_status, task_id, self.user_id,
+                          task_ids=[task_id], on_result=self.apply_task)
     
-    def toggle_mandatory_status(self, task_info, item):
+    def toggle_mandatory_status(self, task_info):
         """Переключение статуса обязательности задачи"""
-        print(f"🔄 Toggle mandatory для задачи {task_info['id']}")
-        
-        new_status = toggle_mandatory_status(task_info['id'], self.user_id)
-        print(f"📊 toggle_mandatory_status вернул: {new_status} (type: {type(new_status)})")
-        
-        if new_status is not None:  
-            updated_task_info = get_task(task_info['id'], self.user_id)
-            
-            if updated_task_info:
-                status = "✅" if updated_task_info['done'] else "❌"
-                mandatory_indicator = "🔸 " if updated_task_info['is_mandatory'] else ""
-                priority_indicator = "⚡" * updated_task_info.get('priority', 1)
-                
-                category_name = updated_task_info.get('category_name', '')
-                category_text = f" [{category_name}]" if category_name else ""
-                
-                task_text = f"{mandatory_indicator}{priority_indicator} {updated_task_info['title']} | {status}{category_text}"
-                item.setText(task_text)
-                
-                print(f"✅ UI обновлен: {task_text}")
-        else:
-            QMessageBox.warning(self, 'Ошибка', 'Не удалось изменить статус задачи')
+        # Функция сразу возвращает обновленную задачу - перечитывать не нужно
+        self.submit_write(toggle_mandatory_status, task_info['id'], self.user_id,
+                          task_ids=[task_info['id']], on_result=self.apply_task)
+    
     def close_dialog(self):
         """Закрытие диалога"""
         self.close()
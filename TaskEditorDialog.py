@@ -1,15 +1,18 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QLineEdit, QTextEdit, QComboBox, QCheckBox,
-                             QPushButton, QMessageBox)
+                             QPushButton, QMessageBox, QDateEdit, QTimeEdit, QMenu)
 from PyQt6.QtGui import QIcon, QPixmap, QColor
-from PyQt6.QtCore import QDate
-from db import add_task, update_task, get_categories
+from PyQt6.QtCore import QDate, QTime
+from repository import add_task, update_task, get_categories, add_recurrence, NO_TIME, NO_REMINDER
+from DbWorker import get_worker
+from recurrence import WEEKDAY_NAMES
 
 def create_task_editor_dialog(parent, mode='add', task_data=None, date=None, user_id=1):
     """
     СОЗДАЕТ ВАШ ДИАЛОГ ТОЧНО ТАК ЖЕ как в WeekDialog.py
     """
     dialog = QDialog(parent)
+    dialog.saved = None
     
     if mode == 'add':
         dialog.setWindowTitle(f"Добавить задачу на {date.toString('dd.MM.yyyy')}")
@@ -58,6 +61,67 @@ def create_task_editor_dialog(parent, mode='add', task_data=None, date=None, use
     mandatory_check = QCheckBox("🔸 Обязательная задача")
     layout.addWidget(mandatory_check)
     
+    # Время задачи и напоминание
+    time_layout = QHBoxLayout()
+    time_check = QCheckBox("⏰ Время:")
+    time_edit = QTimeEdit(QTime(9, 0))
+    time_edit.setDisplayFormat('HH:mm')
+    time_edit.setEnabled(False)
+    time_check.toggled.connect(time_edit.setEnabled)
+    remind_combo = QComboBox()
+    remind_combo.addItem("Без напоминания", None)
+    remind_combo.addItem("🔔 В момент задачи", 0)
+    remind_combo.addItem("🔔 За 5 минут", 5)
+    remind_combo.addItem("🔔 За 15 минут", 15)
+    remind_combo.addItem("🔔 За 30 минут", 30)
+    remind_combo.addItem("🔔 За час", 60)
+    remind_combo.addItem("🔔 За день", 24 * 60)
+    time_layout.addWidget(time_check)
+    time_layout.addWidget(time_edit)
+    time_layout.addWidget(remind_combo)
+    layout.addLayout(time_layout)
+    
+    # Повторение задается только при создании задачи
+    repeat_combo = QComboBox()
+    repeat_combo.addItem("Не повторять", None)
+    repeat_combo.addItem("🔁 Каждый день", 'daily')
+    repeat_combo.addItem("🔁 Каждую неделю", 'weekly')
+    repeat_combo.addItem("🔁 Каждый месяц", 'monthly')
+    
+    weekday_checks = []
+    weekday_layout = QHBoxLayout()
+    until_check = QCheckBox("До даты:")
+    until_edit = QDateEdit()
+    if mode == 'add':
+        layout.addWidget(QLabel("Повторять:"))
+        layout.addWidget(repeat_combo)
+        
+        for weekday, name in enumerate(WEEKDAY_NAMES):
+            check = QCheckBox(name)
+            check.setChecked(weekday == date.dayOfWeek() - 1)
+            weekday_checks.append(check)
+            weekday_layout.addWidget(check)
+        layout.addLayout(weekday_layout)
+        
+        until_layout = QHBoxLayout()
+        until_edit.setCalendarPopup(True)
+        until_edit.setDate(date.addMonths(3))
+        until_edit.setEnabled(False)
+        until_check.toggled.connect(until_edit.setEnabled)
+        until_layout.addWidget(until_check)
+        until_layout.addWidget(until_edit)
+        layout.addLayout(until_layout)
+        
+        def update_repeat_controls():
+            freq = repeat_combo.currentData()
+            for check in weekday_checks:
+                check.setVisible(freq == 'weekly')
+            until_check.setVisible(freq is not None)
+            until_edit.setVisible(freq is not None)
+        
+        repeat_combo.currentIndexChanged.connect(update_repeat_controls)
+        update_repeat_controls()
+    
     if mode == 'edit' and task_data:
         title_edit.setText(task_data.get('title', ''))
         desc_edit.setPlainText(task_data.get('description', ''))
@@ -79,6 +143,17 @@ def create_task_editor_dialog(parent, mode='add', task_data=None, date=None, use
         
         # Обязательность
         mandatory_check.setChecked(task_data.get('is_mandatory', False))
+        
+        # Время и напоминание
+        if task_data.get('due_time'):
+            time_check.setChecked(True)
+            time_edit.setTime(QTime.fromString(task_data['due_time'], 'HH:mm'))
+        remind_before = task_data.get('remind_before')
+        index = remind_combo.findData(remind_before)
+        if remind_before is not None and index < 0:
+            remind_combo.addItem(f"🔔 За {remind_before} мин", remind_before)
+            index = remind_combo.count() - 1
+        remind_combo.setCurrentIndex(max(index, 0))
     
     button_layout = QHBoxLayout()
     
@@ -99,28 +174,67 @@ def create_task_editor_dialog(parent, mode='add', task_data=None, date=None, use
             QMessageBox.warning(dialog, 'Ошибка', 'Введите название задачи')
             return
         
-        if mode == 'add':
-            result = add_task(
+        due_time = time_edit.time().toString('HH:mm') if time_check.isChecked() else None
+        remind_before = remind_combo.currentData()
+        
+        freq = repeat_combo.currentData()
+        if mode == 'add' and freq:
+            until = until_edit.date() if until_check.isChecked() else None
+            if until is not None and until < date:
+                QMessageBox.warning(dialog, 'Ошибка', 'Дата окончания повторения раньше даты задачи')
+                return
+            func, kwargs = add_recurrence, dict(
+                user_id=user_id,
+                title=title,
+                start_date=date.toString('yyyy-MM-dd'),
+                freq=freq,
+                weekdays=[weekday for weekday, check in enumerate(weekday_checks) if check.isChecked()],
+                until=until.toString('yyyy-MM-dd') if until is not None else None,
+                description=desc_edit.toPlainText(),
+                category_id=category_combo.currentData(),
+                priority=priority_combo.currentData(),
+                is_mandatory=mandatory_check.isChecked(),
+                due_time=due_time,
+                remind_before=remind_before
+            )
+        elif mode == 'add':
+            func, kwargs = add_task, dict(
                 title=title,
                 task_date=date.toString('yyyy-MM-dd'),
                 user_id=user_id,
                 description=desc_edit.toPlainText(),
                 category_id=category_combo.currentData(),
                 priority=priority_combo.currentData(),
-                is_mandatory=mandatory_check.isChecked()
+                is_mandatory=mandatory_check.isChecked(),
+                due_time=due_time,
+                remind_before=remind_before
             )
         else:
-            result = update_task(
+            func, kwargs = update_task, dict(
                 user_id=user_id,
                 task_id=task_data['id'],
                 title=title,
                 description=desc_edit.toPlainText(),
                 priority=priority_combo.currentData(),
                 category_id=category_combo.currentData(),
-                is_mandatory=mandatory_check.isChecked()
+                is_mandatory=mandatory_check.isChecked(),
+                # None в update_task значит "не менять", поэтому очистка - особыми значениями
+                due_time=due_time if due_time is not None else NO_TIME,
+                remind_before=remind_before if remind_before is not None else NO_REMINDER
             )
         
+        # Запись - в фоновом потоке базы; до ответа кнопки недоступны
+        save_btn.setEnabled(False)
+        cancel_btn.setEnabled(False)
+        get_worker().submit(func, tag=(id(dialog), 'save'), on_result=saved,
+                            on_error=lambda e: saved(None), **kwargs)
+    
+    def saved(result):
+        save_btn.setEnabled(True)
+        cancel_btn.setEnabled(True)
         if result:
+            # Task при изменении, id задачи или правила при добавлении
+            dialog.saved = result
             dialog.accept()
         else:
             QMessageBox.warning(dialog, 'Ошибка', 
@@ -132,3 +246,78 @@ def create_task_editor_dialog(parent, mode='add', task_data=None, date=None, use
     title_edit.setFocus()
     
     return dialog
+
+
+def ask_move_date(parent, date, count=1):
+    """Выбор даты для переноса задач. Возвращает QDate или None при отмене"""
+    from PyQt6.QtWidgets import QCalendarWidget
+    
+    dialog = QDialog(parent)
+    dialog.setWindowTitle("Перенести задачи")
+    dialog.setModal(True)
+    
+    layout = QVBoxLayout(dialog)
+    layout.addWidget(QLabel(f"Перенести задач: {count}. Выберите новую дату:"))
+    
+    calendar = QCalendarWidget()
+    calendar.setGridVisible(True)
+    calendar.setVerticalHeaderFormat(QCalendarWidget.VerticalHeaderFormat.NoVerticalHeader)
+    calendar.setSelectedDate(date)
+    calendar.activated.connect(dialog.accept)
+    layout.addWidget(calendar)
+    
+    buttons_layout = QHBoxLayout()
+    move_btn = QPushButton("Перенести")
+    cancel_btn = QPushButton("Отмена")
+    move_btn.clicked.connect(dialog.accept)
+    cancel_btn.clicked.connect(dialog.reject)
+    buttons_layout.addWidget(move_btn)
+    buttons_layout.addWidget(cancel_btn)
+    layout.addLayout(buttons_layout)
+    
+    if dialog.exec():
+        return calendar.selectedDate()
+    return None
+
+
+def exec_bulk_menu(parent, position, count, categories):
+    """Меню массовых действий для count выделенных задач.
+
+    Возвращает ('update', поля для bulk_update_tasks), ('move', None),
+    ('delete', None) или None, если ничего не выбрано.
+    """
+    menu = QMenu(parent)
+    
+    field_actions = {
+        menu.addAction(f"✅ Отметить выполненными ({count})"): {'done': True},
+        menu.addAction("❌ Снять отметку"): {'done': False},
+    }
+    menu.addSeparator()
+    field_actions[menu.addAction("🔸 Сделать обязательными")] = {'is_mandatory': True}
+    field_actions[menu.addAction("📝 Сделать обычными")] = {'is_mandatory': False}
+    menu.addSeparator()
+    
+    priority_menu = menu.addMenu("⚡ Приоритет")
+    field_actions[priority_menu.addAction("🔴 Высокий")] = {'priority': 3}
+    field_actions[priority_menu.addAction("🟡 Средний")] = {'priority': 2}
+    field_actions[priority_menu.addAction("🟢 Низкий")] = {'priority': 1}
+    
+    category_menu = menu.addMenu("🏷️ Категория")
+    field_actions[category_menu.addAction("Без категории")] = {'category_id': None}
+    for category in categories:
+        field_actions[category_menu.addAction(category['name'])] = {'category_id': category['id']}
+    
+    move_action = menu.addAction("📅 Перенести на дату...")
+    menu.addSeparator()
+    delete_action = menu.addAction(f"🗑️ Удалить выбранные ({count})")
+    
+    action = menu.exec(position)
+    if action is None:
+        return None
+    if action == move_action:
+        return 'move', None
+    if action == delete_action:
+        return 'delete', None
+    if action in field_actions:
+        return 'update', field_actions[action]
+    return None
@@ -0,0 +1,310 @@
+"""Модели задач для представлений Qt.
+
+Диалоги раньше пересоздавали виджеты всех задач после каждого
+изменения. Модели хранят уже загруженные задачи (Task из db.py) и после
+изменения одной задачи сообщают представлению только об этой строке
+(dataChanged, beginInsertRows, beginRemoveRows) - перерисовывается
+только она. Полный сброс модели - только при смене недели или дня.
+
+Пока изменение задачи выполняется в фоновом потоке, ее строка
+недоступна (set_pending): повторный клик не отправит второй запрос,
+а делегат рисует строку приглушенной.
+"""
+from PyQt6.QtCore import QAbstractItemModel, QAbstractListModel, QModelIndex, Qt, QDate
+
+# Роли данных: задача (Task) и дата строки (QDate)
+TaskRole = Qt.ItemDataRole.UserRole + 1
+DateRole = Qt.ItemDataRole.UserRole + 2
+
+DAY_NAMES = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
+PRIORITY_NAMES = {1: "🟢 Низкий", 2: "🟡 Средний", 3: "🔴 Высокий"}
+
+# internalId строки дня; у строки задачи internalId - номер ее дня + 1
+_DAY_ID = 0
+
+
+def task_tooltip(task):
+    """Всплывающая подсказка задачи: описание, категория, приоритет"""
+    description = task.description
+    category_name = task.category_name
+    if not description and not category_name:
+        return None
+
+    tooltip_text = ""
+    if description:
+        tooltip_text += f"📝 Описание:\n{description}\n\n"
+    if category_name:
+        tooltip_text += f"🏷️ Категория: {category_name}\n"
+    tooltip_text += f"⚡ Приоритет: {PRIORITY_NAMES.get(task.priority, '⚪ Не указан')}"
+    if task.created_at:
+        tooltip_text += f"\n📅 Создана: {task.created_at}"
+    return tooltip_text
+
+
+class TaskListModel(QAbstractListModel):
+    """Задачи одного дня списком.
+
+    Пока задачи грузятся, в списке одна строка-подсказка без задачи
+    (TaskRole - None).
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.task_date = None
+        self._tasks = []
+        self._placeholder = None
+        self._pending = set()
+
+    def set_tasks(self, task_date, tasks):
+        self.beginResetModel()
+        self.task_date = task_date
+        self._tasks = list(tasks)
+        self._placeholder = None
+        self.endResetModel()
+
+    def set_placeholder(self, text):
+        """Список из одной строки-подсказки (например, "Загрузка...")"""
+        self.beginResetModel()
+        self._tasks = []
+        self._placeholder = text
+        self.endResetModel()
+
+    def tasks(self):
+        return list(self._tasks)
+
+    def row_of(self, task_id):
+        for row, task in enumerate(self._tasks):
+            if task.id == task_id:
+                return row
+        return None
+
+    def set_pending(self, task_ids, pending):
+        """Строки задач недоступны, пока их изменение не завершится"""
+        for task_id in task_ids:
+            if pending:
+                self._pending.add(task_id)
+            else:
+                self._pending.discard(task_id)
+            row = self.row_of(task_id)
+            if row is not None and self._placeholder is None:
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+
+    def is_pending(self, task_id):
+        return task_id in self._pending
+
+    def update_task(self, task):
+        """Замена задачи новой версией; перенесенная на другой день убирается из списка"""
+        row = self.row_of(task.id)
+        if task.task_date != self.task_date:
+            if row is not None:
+                self.remove_task(task.id)
+            return
+        if row is None:
+            return self.insert_task(task)
+        self._tasks[row] = task
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def insert_task(self, task):
+        if task.task_date != self.task_date or self._placeholder is not None:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._tasks), len(self._tasks))
+        self._tasks.append(task)
+        self.endInsertRows()
+
+    def remove_task(self, task_id):
+        row = self.row_of(task_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._tasks[row]
+        self.endRemoveRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self._placeholder is not None:
+            return 1
+        return len(self._tasks)
+
+    def flags(self, index):
+        if not index.isValid() or self._placeholder is not None:
+            return Qt.ItemFlag.NoItemFlags
+        if self._tasks[index.row()].id in self._pending:
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if self._placeholder is not None:
+            return self._placeholder if role == Qt.ItemDataRole.DisplayRole else None
+
+        task = self._tasks[index.row()]
+        if role == TaskRole:
+            return task
+        if role == Qt.ItemDataRole.DisplayRole:
+            return task.title
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return task_tooltip(task)
+        return None
+
+
+class WeekTaskModel(QAbstractItemModel):
+    """Неделя в виде дерева: семь строк дней, под каждой - задачи дня"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.start_date = QDate.currentDate()
+        self._days = [[] for _ in range(7)]  # списки Task по дням недели
+        self._pending = set()
+
+    # ---------- Заполнение ----------
+
+    def set_week(self, start_date, tasks_by_day):
+        """Новая неделя: единственное место, где модель сбрасывается целиком"""
+        self.beginResetModel()
+        self.start_date = start_date
+        self._days = [list(tasks_by_day.get(self.date_str(day), [])) for day in range(7)]
+        self.endResetModel()
+
+    def date_str(self, day):
+        return self.start_date.addDays(day).toString('yyyy-MM-dd')
+
+    def day_of(self, task_date):
+        """Номер дня недели для даты 'yyyy-MM-dd' или None, если дата вне недели"""
+        day = self.start_date.daysTo(QDate.fromString(task_date, 'yyyy-MM-dd'))
+        return day if 0 <= day < 7 else None
+
+    def day_tasks(self, day):
+        return list(self._days[day])
+
+    def find_task(self, task_id):
+        """(день, строка) задачи или None"""
+        for day, tasks in enumerate(self._days):
+            for row, task in enumerate(tasks):
+                if task.id == task_id:
+                    return day, row
+        return None
+
+    def set_pending(self, task_ids, pending):
+        """Строки задач недоступны, пока их изменение не завершится"""
+        for task_id in task_ids:
+            if pending:
+                self._pending.add(task_id)
+            else:
+                self._pending.discard(task_id)
+            position = self.find_task(task_id)
+            if position is not None:
+                index = self.index(position[1], 0, self.index(position[0], 0))
+                self.dataChanged.emit(index, index)
+
+    def is_pending(self, task_id):
+        return task_id in self._pending
+
+    # ---------- Точечные изменения ----------
+
+    def update_task(self, task):
+        """Замена задачи новой версией: меняется одна строка.
+
+        Если задача переехала на другой день, она переносится туда (или
+        удаляется, если новый день вне недели).
+        """
+        position = self.find_task(task.id)
+        if position is None:
+            return self.insert_task(task)
+        day, row = position
+        if self.date_str(day) != task.task_date:
+            self.remove_task(task.id)
+            return self.insert_task(task)
+
+        self._days[day][row] = task
+        index = self.index(row, 0, self.index(day, 0))
+        self.dataChanged.emit(index, index)
+
+    def insert_task(self, task):
+        """Добавление задачи в конец ее дня"""
+        day = self.day_of(task.task_date)
+        if day is None:
+            return
+        tasks = self._days[day]
+        parent = self.index(day, 0)
+        self.beginInsertRows(parent, len(tasks), len(tasks))
+        tasks.append(task)
+        self.endInsertRows()
+        # У дня меняется подпись "Нет задач"
+        self.dataChanged.emit(parent, parent)
+
+    def remove_task(self, task_id):
+        position = self.find_task(task_id)
+        if position is None:
+            return
+        day, row = position
+        parent = self.index(day, 0)
+        self.beginRemoveRows(parent, row, row)
+        del self._days[day][row]
+        self.endRemoveRows()
+        self.dataChanged.emit(parent, parent)
+
+    # ---------- QAbstractItemModel ----------
+
+    def index(self, row, column, parent=QModelIndex()):
+        if column != 0 or row < 0:
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, 0, _DAY_ID) if row < 7 else QModelIndex()
+        if parent.internalId() == _DAY_ID and row < len(self._days[parent.row()]):
+            return self.createIndex(row, 0, parent.row() + 1)
+        return QModelIndex()
+
+    def parent(self, index=QModelIndex()):
+        if not index.isValid() or index.internalId() == _DAY_ID:
+            return QModelIndex()
+        return self.createIndex(index.internalId() - 1, 0, _DAY_ID)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return 7
+        if parent.internalId() == _DAY_ID:
+            return len(self._days[parent.row()])
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        # Заголовки дней не выделяются - в выделение попадают только задачи
+        if index.internalId() == _DAY_ID:
+            return Qt.ItemFlag.ItemIsEnabled
+        if self._days[index.internalId() - 1][index.row()].id in self._pending:
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if index.internalId() == _DAY_ID:
+            day = index.row()
+            date = self.start_date.addDays(day)
+            if role == Qt.ItemDataRole.DisplayRole:
+                return f"{DAY_NAMES[date.dayOfWeek() - 1]} ({date.toString('dd.MM.yyyy')})"
+            if role == DateRole:
+                return date
+            return None
+
+        day = index.internalId() - 1
+        task = self._days[day][index.row()]
+        if role == TaskRole:
+            return task
+        if role == Qt.ItemDataRole.DisplayRole:
+            return task.title
+        if role == DateRole:
+            return self.start_date.addDays(day)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            # Строится только при наведении, а не для каждой задачи заранее
+            return task_tooltip(task)
+        return None
@@ -0,0 +1,194 @@
+"""Темы оформления.
+
+Вместо setStyleSheet на отдельных виджетах приложение получает одну
+таблицу стилей на тему: она собирается из шаблона один раз и
+кэшируется, так что смена темы - один вызов QApplication.setStyleSheet.
+Состояния виджетов (загрузка, подсказка) задаются динамическими
+свойствами и селекторами вида [loading="true"], а не новой CSS-строкой.
+Строки задач рисует делегат - ему тема отдает готовые QColor (палитру),
+созданные один раз на тему.
+"""
+from string import Template
+
+from PyQt6.QtGui import QColor, QPalette
+from PyQt6.QtWidgets import QApplication
+
+from logger import get_logger
+
+logger = get_logger('theme')
+
+DEFAULT_THEME = 'light'
+
+# Названия тем для настроек
+THEME_NAMES = {
+    'light': "☀️ Светлая",
+    'dark': "🌙 Темная",
+}
+
+# Цвета тем: общие для таблицы стилей, палитры Qt и делегата задач
+THEME_COLORS = {
+    'light': {
+        'window': '#f0f0f0', 'base': '#ffffff', 'text': '#000000', 'border': '#cccccc',
+        'button': '#e9ecef', 'highlight': '#3d8ee0', 'highlight_text': '#ffffff',
+        'heading': '#2c3e50', 'hint_text': '#6c757d',
+        'priority_high': '#eb8686', 'priority_medium': '#f0d479', 'priority_low': '#a7f3a7',
+        'done': '#BEBEBE', 'mandatory': '#fdbb8f', 'task_text': '#000000', 'done_text': '#525252',
+        'category_text': '#EEEEEE', 'category_done': '#cccccc', 'category_default': '#e0e0e0',
+        'day_background': '#f8f9fa', 'day_border': '#dee2e6', 'add_button': '#28a745',
+        'today_background': '#ffe4e1', 'today_text': '#c71585', 'overdue': '#dc3545',
+        'selected_background': '#dcdcdc', 'selected_text': '#000000',
+        'selected_today_background': '#db7093', 'selected_today_text': '#ffffff',
+    },
+    'dark': {
+        'window': '#2b2b2b', 'base': '#1f1f1f', 'text': '#e6e6e6', 'border': '#4a4a4a',
+        'button': '#3a3a3a', 'highlight': '#4f8fd6', 'highlight_text': '#ffffff',
+        'heading': '#d6e2ee', 'hint_text': '#9aa3ab',
+        'priority_high': '#8a3d3d', 'priority_medium': '#7d6a2a', 'priority_low': '#3d6b3d',
+        'done': '#4a4a4a', 'mandatory': '#8f5a36', 'task_text': '#f0f0f0', 'done_text': '#a0a0a0',
+        'category_text': '#f5f5f5', 'category_done': '#5a5a5a', 'category_default': '#606060',
+        'day_background': '#333333', 'day_border': '#4a4a4a', 'add_button': '#2f8f46',
+        'today_background': '#5a2d45', 'today_text': '#ffb6d9', 'overdue': '#ff6b6b',
+        'selected_background': '#505050', 'selected_text': '#ffffff',
+        'selected_today_background': '#a8466e', 'selected_today_text': '#ffffff',
+    },
+}
+
+STYLESHEET = Template("""
+QWidget {
+    background-color: $window;
+    color: $text;
+}
+QLineEdit, QTextEdit, QComboBox, QDateEdit, QTimeEdit, QListView, QListWidget, QTreeView {
+    background-color: $base;
+    border: 1px solid $border;
+}
+QPushButton {
+    background-color: $button;
+    border: 1px solid $border;
+    border-radius: 3px;
+    padding: 3px 8px;
+}
+QPushButton:hover {
+    border-color: $highlight;
+}
+QMenu::item:selected, QComboBox QAbstractItemView::item:selected {
+    background-color: $highlight;
+    color: $highlight_text;
+}
+QToolTip {
+    background-color: $base;
+    color: $text;
+    border: 1px solid $border;
+}
+QCalendarWidget QAbstractItemView {
+    background-color: $base;
+    selection-background-color: $highlight;
+    selection-color: $highlight_text;
+}
+QCalendarWidget QToolButton {
+    color: $heading;
+    font-weight: bold;
+}
+QCalendarWidget QMenu {
+    background-color: $base;
+    border: 1px solid $border;
+}
+QLabel[loading="true"] {
+    color: $hint_text;
+}
+QLabel[hint="true"] {
+    color: $hint_text;
+    font-style: italic;
+}
+""")
+
+
+class ThemePalette:
+    """Готовые QColor темы для отрисовки делегатом"""
+
+    def __init__(self, colors):
+        for name, value in colors.items():
+            setattr(self, name, QColor(value))
+        self.priority = {3: self.priority_high, 2: self.priority_medium, 1: self.priority_low}
+        self.hover = QColor(self.text)
+        self.hover.setAlpha(16)
+
+
+class Theme:
+    """Тема: таблица стилей, палитра Qt и палитра делегата, собранные один раз"""
+
+    def __init__(self, name):
+        colors = THEME_COLORS[name]
+        self.name = name
+        self.stylesheet = STYLESHEET.substitute(colors)
+        self.colors = ThemePalette(colors)
+
+        self.qpalette = QPalette()
+        for role, color in (
+            (QPalette.ColorRole.Window, 'window'),
+            (QPalette.ColorRole.WindowText, 'text'),
+            (QPalette.ColorRole.Base, 'base'),
+            (QPalette.ColorRole.AlternateBase, 'window'),
+            (QPalette.ColorRole.Text, 'text'),
+            (QPalette.ColorRole.Button, 'button'),
+            (QPalette.ColorRole.ButtonText, 'text'),
+            (QPalette.ColorRole.ToolTipBase, 'base'),
+            (QPalette.ColorRole.ToolTipText, 'text'),
+            (QPalette.ColorRole.Highlight, 'highlight'),
+            (QPalette.ColorRole.HighlightedText, 'highlight_text'),
+        ):
+            self.qpalette.setColor(role, QColor(colors[color]))
+
+
+_themes = {}
+_current = None
+
+
+def get_theme(name=None):
+    """Тема по имени (по умолчанию - текущая); собирается при первом обращении"""
+    if name is None:
+        return _current or get_theme(DEFAULT_THEME)
+    if name not in THEME_COLORS:
+        logger.warning("Неизвестная тема %s, используется %s", name, DEFAULT_THEME)
+        name = DEFAULT_THEME
+    theme = _themes.get(name)
+    if theme is None:
+        theme = _themes[name] = Theme(name)
+    return theme
+
+
+def current_colors():
+    """Палитра делегата текущей темы"""
+    return get_theme().colors
+
+
+def apply_theme(name):
+    """Установка темы всему приложению. Возвращает имя примененной темы"""
+    global _current
+    theme = get_theme(name)
+    if theme is _current:
+        return theme.name
+    _current = theme
+    app = QApplication.instance()
+    if app is not None:
+        app.setPalette(theme.qpalette)
+        app.setStyleSheet(theme.stylesheet)
+    logger.info("Тема оформления: %s", theme.name)
+    return theme.name
+
+
+def set_state(widget, **properties):
+    """Динамические свойства для селекторов таблицы стилей.
+
+    Виджет перерисовывается (unpolish/polish) только если свойство
+    действительно изменилось.
+    """
+    changed = False
+    for name, value in properties.items():
+        if widget.property(name) != value:
+            widget.setProperty(name, value)
+            changed = True
+    if changed:
+        style = widget.style()
+        style.unpolish(widget)
+        style.polish(widget)
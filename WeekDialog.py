@@ -1,12 +1,19 @@
-from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
-                             QScrollArea, QWidget, QFrame, QPushButton, 
-                             QMenu, QInputDialog, QMessageBox, QLineEdit, 
-                             QCheckBox, QComboBox, QTextEdit)
-from PyQt6.QtCore import Qt, QDate
-from PyQt6 import QtGui
+from PyQt6.QtWidgets import QDialog, QMenu, QMessageBox, QTreeView, QAbstractItemView
+from PyQt6.QtCore import Qt, QDate, QTimer
 from ui.week_dialog import Ui_WeekDialog
-from db import get_tasks_by_week, add_task, update_task, remove_task, toggle_task_status, toggle_mandatory_status
-from TaskEditorDialog import create_task_editor_dialog
+from repository import (get_tasks_by_week, cached_tasks_by_week, is_week_cached,
+                        update_task, remove_task, toggle_task_status,
+                        toggle_mandatory_status, bulk_update_tasks, bulk_move_tasks, bulk_delete_tasks,
+                        end_recurrence, get_categories, parse_occurrence_id)
+from TaskEditorDialog import create_task_editor_dialog, ask_move_date, exec_bulk_menu
+from TaskModels import WeekTaskModel, TaskRole, DateRole
+from TaskDelegate import TaskDelegate
+from Theme import set_state
+from Prefetcher import Prefetcher
+from DbWorker import get_worker, LOADING_DELAY_MS
+from logger import get_logger
+
+logger = get_logger('week_dialog')
 
 
 class WeekDialog(QDialog):
@@ -15,279 +22,191 @@ class WeekDialog(QDialog):
         self.ui = Ui_WeekDialog()
         self.ui.setupUi(self)
         self.user_id = user_id
+        self.worker = get_worker()
         
         self.current_date = QDate.currentDate()
-        self.week_layout = self.ui.weekLayout
+        
+        # Неделя - одно дерево: дни и задачи рисует делегат, без виджетов на задачу
+        self.model = WeekTaskModel(self)
+        self.delegate = TaskDelegate(self)
+        self.view = QTreeView()
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(self.delegate)
+        self.view.setHeaderHidden(True)
+        self.view.setRootIsDecorated(False)
+        self.view.setItemsExpandable(False)
+        self.view.setIndentation(12)
+        # Ctrl/Shift+клик выделяет задачи разных дней для массовых действий
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.view.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.view.setMouseTracking(True)
+        self.view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.show_context_menu)
+        self.delegate.addRequested.connect(self.add_task_to_day)
+        self.delegate.dayMenuRequested.connect(self.show_day_button_menu)
+        # Новые задачи в развернутом дне показываются сразу
+        self.model.rowsInserted.connect(lambda parent, first, last: self.view.expand(parent))
+        self.ui.verticalLayout.replaceWidget(self.ui.scrollArea, self.view)
+        self.ui.scrollArea.hide()
+        
+        # Соседние недели подгружаются в кэш repository заранее
+        self.prefetcher = Prefetcher(
+            self.neighbour_weeks,
+            lambda start: is_week_cached(start, self.user_id),
+            lambda start: (get_tasks_by_week, (QDate.fromString(start, 'yyyy-MM-dd').toPyDate(), self.user_id), None),
+            parent=self
+        )
+        self.finished.connect(lambda result: self.prefetcher.cancel())
         
         # Подключаем кнопки навигации
         self.ui.prevWeekBtn.clicked.connect(self.prev_week)
         self.ui.nextWeekBtn.clicked.connect(self.next_week)
         self.ui.closeBtn.clicked.connect(self.close_dialog)
-        
-        self.load_week_tasks()
+        # Задачи загружаются в set_date: вызывающий всегда задает неделю сам
         
     def load_week_tasks(self):
-        """Загрузка и отображение задач на неделю"""
-        self.clear_week_layout()
-        
-        self.tasks_by_day = get_tasks_by_week(self.current_date, self.user_id)
-        
-        # Обновляем заголовок
-        end_date = self.current_date.addDays(6)
-        self.ui.weekLabel.setText(
-            f"Неделя: {self.current_date.toString('dd.MM.yyyy')} - {end_date.toString('dd.MM.yyyy')}"
+        """Загрузка задач на неделю (из кэша сразу, иначе в фоновом потоке)"""
+        self.prefetcher.navigated(self.current_date.toString('yyyy-MM-dd'))
+        tasks_by_day = cached_tasks_by_week(self.current_date.toPyDate(), self.user_id)
+        if tasks_by_day is not None:
+            self.worker.cancel((id(self), 'week'))
+            self.show_week_tasks(tasks_by_day)
+            return
+        
+        # Загрузка предыдущей недели, если она еще идет, отменяется
+        request_id = self.worker.submit(
+            get_tasks_by_week, self.current_date.toPyDate(), self.user_id,
+            tag=(id(self), 'week'), on_result=self.show_week_tasks
         )
-        
-        # Дни недели на русском
-        days_russian = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
-        
-        # Создаем виджеты для каждого дня недели
-        for i in range(7):
-            current_date = self.current_date.addDays(i)
-            date_str = current_date.toString('yyyy-MM-dd')
-            
-            day_frame = self.create_day_frame(days_russian[i], current_date, date_str)
-            self.week_layout.addWidget(day_frame)
+        QTimer.singleShot(LOADING_DELAY_MS, lambda: self.show_loading(request_id))
     
-    def clear_week_layout(self):
-        """Очистка layout недели"""
-        while self.week_layout.count():
-            item = self.week_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
+    @staticmethod
+    def neighbour_weeks(start, depth):
+        """Начала соседних недель 'yyyy-MM-dd', ближние первыми"""
+        date = QDate.fromString(start, 'yyyy-MM-dd')
+        return [date.addDays(7 * step).toString('yyyy-MM-dd')
+                for distance in range(1, depth + 1) for step in (distance, -distance)]
     
-    def create_day_frame(self, day_name, current_date, date_str):
-        """Создание фрейма для дня"""
-        day_frame = QFrame()
-        day_frame.setFrameStyle(QFrame.Shape.Box)
-        day_frame.setStyleSheet("""
-            QFrame {
-                background-color: #f8f9fa;
-                border: 1px solid #dee2e6;
-                border-radius: 5px;
-                margin: 5px;
-                padding: 10px;
-            }
-        """)
-        
-        day_layout = QVBoxLayout(day_frame)
-        
-        # Заголовок дня
-        header_layout = QHBoxLayout()
-        day_title = QLabel(f"{day_name} ({current_date.toString('dd.MM.yyyy')})")
-        day_title.setStyleSheet("font-weight: bold; font-size: 12pt; color: #2c3e50;")
-        
-        add_day_task_btn = QPushButton("+")
-        add_day_task_btn.setFixedSize(25, 25)
-        add_day_task_btn.setStyleSheet("""
-            QPushButton {
-                font-weight: bold;
-                background-color: #28a745;
-                color: white;
-                border: none;
-                border-radius: 3px;
-            }
-            QPushButton:hover {
-                background-color: #218838;
-            }
-        """)
-        add_day_task_btn.clicked.connect(lambda checked, date=current_date: self.add_task_to_day(date))
-        
-        header_layout.addWidget(day_title)
-        header_layout.addStretch()
-        header_layout.addWidget(add_day_task_btn)
-        day_layout.addLayout(header_layout)
-        
-        # Задачи для этого дня
-        day_tasks = self.tasks_by_day.get(date_str, [])
-        
-        if day_tasks:
-            for task in day_tasks:
-                task_widget = self.create_task_widget(task, current_date)
-                day_layout.addWidget(task_widget)
-        else:
-            no_tasks_label = QLabel("Нет задач")
-            no_tasks_label.setStyleSheet("color: #6c757d; font-style: italic;")
-            day_layout.addWidget(no_tasks_label)
-        
-        day_layout.addStretch()
-        return day_frame
+    def week_title(self):
+        """Заголовок с диапазоном дат недели"""
+        end_date = self.current_date.addDays(6)
+        return f"Неделя: {self.current_date.toString('dd.MM.yyyy')} - {end_date.toString('dd.MM.yyyy')}"
     
-    def create_task_widget(self, task, date):
-        """Создание виджета для одной задачи"""
-        task_frame = QFrame()
-
-        task_frame.setFrameStyle(QFrame.Shape.NoFrame)
-        
-        is_mandatory = task.get('is_mandatory', False)
-        is_done = task.get('done', False)
-        priority = task.get('priority', 1)
-        category_name = task.get('category_name', '')
-        category_color = task.get('category_color', '')
-        
-        #  Определяем цвета по приоритету
-        if priority == 3:  # Высокий
-            bg_color = "#eb8686"  # Светло-красный
-        elif priority == 2:  # Средний
-            bg_color = "#f0d479"  # Светло-желтый
-        else:  # Низкий
-            bg_color = "#a7f3a7"  # Светло-зеленый
+    def show_loading(self, request_id):
+        """Состояние загрузки, если неделя грузится дольше LOADING_DELAY_MS"""
+        if not self.worker.is_pending(request_id):
+            return
+        self.ui.weekLabel.setText(f"{self.week_title()} ⏳")
+        set_state(self.ui.weekLabel, loading=True)
+        self.view.setEnabled(False)
+    
+    def show_week_tasks(self, tasks_by_day):
+        """Отображение загруженных задач на неделю (None - ошибка загрузки)"""
+        self.model.set_week(self.current_date, tasks_by_day or {})
+        self.view.expandAll()
         
-        # Если задача выполнена - серые цвета
-        if is_done:
-            bg_color = "#BEBEBE"  # Светло-серый
-            text_color = "#525252"  # Темно-серый для текста
+        # Обновляем заголовок
+        if tasks_by_day is None:
+            self.ui.weekLabel.setText(f"{self.week_title()} ⚠️ задачи не загрузились")
         else:
-            text_color = "#000000"  # Черный текст
-        
-        # Если задача обязательная - добавляем акцент
-        if is_mandatory and not is_done:
-            bg_color = "#fdbb8f"  # Еще более красный
-
-        # Устанавливаем стиль фрейма задачи
-        task_frame.setStyleSheet(f"""
-            QFrame {{
-                background-color: {bg_color};
-                border: none;
-            }}
-        """)
-        
-        task_frame.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        task_frame.customContextMenuRequested.connect(
-            lambda pos, t=task, d=date: self.show_task_context_menu(pos, t, d)
-        )
-        
-        task_layout = QHBoxLayout(task_frame)
-        task_layout.setContentsMargins(5, 3, 5, 3)
-        task_layout.setSpacing(8)
-        
-        # Статус задачи
-        status = "✅" if is_done else "⏳"
-        status_label = QLabel(status)
-        if is_done:
-            status_label.setStyleSheet("color: #666666;")
-        
-        # Иконка приоритета 
-        priority_icon = QLabel()
-        if priority == 3:
-            priority_icon.setText("🔴")  # Красный кружок
-        elif priority == 2:
-            priority_icon.setText("🟡")  # Желтый кружок  
+            self.ui.weekLabel.setText(self.week_title())
+        set_state(self.ui.weekLabel, loading=False)
+        self.view.setEnabled(True)
+    
+    def show_context_menu(self, position):
+        """Контекстное меню задачи или дня под курсором"""
+        index = self.view.indexAt(position)
+        if not index.isValid():
+            return
+        global_pos = self.view.viewport().mapToGlobal(position)
+        task = index.data(TaskRole)
+        if task is None:
+            self.show_day_menu(global_pos, index.data(DateRole))
+            return
+        if self.model.is_pending(task.id):
+            return
+        
+        # Клик по одной из нескольких выделенных задач - меню массовых действий
+        task_ids = self.selected_task_ids()
+        if len(task_ids) > 1 and self.view.selectionModel().isSelected(index):
+            self.show_bulk_context_menu(global_pos, task_ids)
         else:
-            priority_icon.setText("🟢")  # Зеленый кружок
-        
-        # Текст задачи
-        task_text = QLabel(task.get('title', 'Без названия'))
-        
-        # Стиль для текста задачи
-        text_style = f"color: {text_color};"
-        if is_done:
-            text_style += " text-decoration: line-through;"
-        task_text.setStyleSheet(text_style)
-
-        if task.get('category_id'):  
-            print(f"   ✅ У задачи есть category_id: {task.get('category_id')}")
-            
-            category_name = task.get('category_name', '')
-            
-            # Создаем виджет для категории
-            category_widget = QFrame()
-            category_widget.setFrameStyle(QFrame.Shape.NoFrame)
-            # Определяем цвет для плашки категории
-            if is_done:
-                # Для выполненных задач - серые цвета
-                category_bg = "#cccccc"  # Темно-серый фон
-                category_text_color = "#EEEEEE"  # Белый текст
-            elif category_color:
-                # Используем цвет категории
-                category_bg = category_color
-                category_text_color = "#EEEEEE"  # Белый текст
-            else:
-                # По умолчанию
-                category_bg = "#e0e0e0"
-                category_text_color = "#EEEEEE"
-            
-            # обрезаем название
-            display_name = category_name
-            if len(display_name) > 10:
-                display_name = display_name[:8] + ".."
-            
-            category_widget.setStyleSheet(f"""
-                QFrame {{
-                    background-color: {category_bg};
-                    border: none;
-                    border-radius: 5px;
-                    padding: 2px 6px;
-                    min-width: 100px;
-                    max-width: 200px;
-                }}
-            """)
-            
-            category_layout = QHBoxLayout(category_widget)
-            category_layout.setContentsMargins(4, 2, 4, 2)
-            
-            # Текст категории
-            category_label = QLabel(display_name)
-            category_label.setStyleSheet(f"""
-                QLabel {{
-                    color: {category_text_color};
-                    font-size: 13px;
-                    padding: 0px;
-                    margin: 0px;
-                }}
-            """)
-            category_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            
-            # Добавляем всплывающую подсказку с полным названием
-            if len(category_name) > 10:
-                category_widget.setToolTip(f"Категория: {category_name}")
-            
-            category_layout.addWidget(category_label)
-            category_widget.setFixedHeight(40)
-            category_widget.setMinimumWidth(140)
-            category_widget.setMaximumWidth(200)
-            
-            print(f"   🎨 Создана плашка категории: '{display_name}' цвет: {category_bg}")
+            self.show_task_context_menu(global_pos, task, index.data(DateRole))
+    
+    def selected_task_ids(self):
+        """ID выделенных задач всех дней (кроме тех, что еще изменяются)"""
+        return [index.data(TaskRole).id for index in self.view.selectionModel().selectedRows()
+                if index.data(TaskRole) is not None and not self.model.is_pending(index.data(TaskRole).id)]
+    
+    def show_bulk_context_menu(self, position, task_ids):
+        """Меню массовых действий для выделенных задач (то же, что в TaskDialog)"""
+        choice = exec_bulk_menu(self, position, len(task_ids), get_categories(self.user_id))
+        if choice is None:
+            return
+        
+        kind, fields = choice
+        if kind == 'move':
+            self.move_tasks(task_ids)
+        elif kind == 'delete':
+            self.delete_tasks(task_ids)
         else:
-            category_widget = None
-            print(f"   ❌ У задачи нет category_id")
-        
-        # 9. Добавляем элементы в layout
-        task_layout.addWidget(status_label)
-        task_layout.addWidget(priority_icon)
-        task_layout.addWidget(task_text)
-        task_layout.addStretch()  # Растягиваемое пространство
-        
-        if category_widget:
-            task_layout.addWidget(category_widget)
-
-
-        # 10. Добавляем всплывающую подсказку с описанием
-        description = task.get('description', '')
-        if description or category_name:
-            tooltip_text = ""
-            
-            if description:
-                tooltip_text += f"📝 Описание:\n{description}\n\n"
-            
-            if category_name:
-                tooltip_text += f"🏷️ Категория: {category_name}\n"
-            
-            priority_text = {
-                1: "🟢 Низкий",
-                2: "🟡 Средний", 
-                3: "🔴 Высокий"
-            }.get(priority, "⚪ Не указан")
-            
-            tooltip_text += f"⚡ Приоритет: {priority_text}"
-            
-            if task.get('created_at'):
-                tooltip_text += f"\n📅 Создана: {task['created_at']}"
-            
-            task_frame.setToolTip(tooltip_text)
-        
-        return task_frame
+            self.submit_write(bulk_update_tasks, self.user_id, task_ids,
+                              task_ids=task_ids, on_result=self.finish_bulk, **fields)
+    
+    def move_tasks(self, task_ids):
+        """Перенос выделенных задач (возможно, разных дней) на одну дату"""
+        new_date = ask_move_date(self, self.current_date, len(task_ids))
+        if new_date is None:
+            return
+        self.submit_write(bulk_move_tasks, self.user_id, task_ids, new_date.toString('yyyy-MM-dd'),
+                          task_ids=task_ids,
+                          on_result=lambda result: self.finish_bulk(result, 'Не удалось перенести задачи'))
+    
+    def delete_tasks(self, task_ids):
+        """Удаление выделенных задач одной транзакцией"""
+        reply = QMessageBox.question(
+            self,
+            'Подтверждение удаления',
+            f'Вы уверены, что хотите удалить выбранные задачи ({len(task_ids)})?',
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            self.submit_write(bulk_delete_tasks, self.user_id, task_ids, task_ids=task_ids,
+                              on_result=lambda result: self.finish_bulk(result, 'Не удалось удалить задачи'))
+    
+    def show_day_button_menu(self, date, button_rect):
+        """Меню кнопки "⋯" в заголовке дня"""
+        self.show_day_menu(self.view.viewport().mapToGlobal(button_rect.bottomLeft()), date)
+    
+    def apply_task(self, task):
+        """Замена одной строки задачи после изменения (без перезагрузки недели)"""
+        if task is None:
+            QMessageBox.warning(self, 'Ошибка', 'Не удалось изменить задачу')
+            return
+        self.model.update_task(task)
+    
+    def submit_write(self, func, *args, task_ids=(), on_result=None, **kwargs):
+        """Изменение задач в фоновом потоке базы.
 
+        Строки task_ids недоступны до ответа; on_result получает результат
+        func или None, если она завершилась исключением.
+        """
+        task_ids = list(task_ids)
+        self.model.set_pending(task_ids, True)
+        
+        def finish(result):
+            self.model.set_pending(task_ids, False)
+            on_result(result)
+        
+        self.worker.submit(func, *args, tag=(id(self), 'write', tuple(task_ids)),
+                           on_result=finish, on_error=lambda e: finish(None), **kwargs)
+    
+    def finish_bulk(self, result, error_text='Не удалось изменить задачи'):
+        """Перезагрузка недели после массового изменения (None - ошибка)"""
+        if result is None:
+            QMessageBox.warning(self, 'Ошибка', error_text)
+        self.load_week_tasks()
+    
     def show_task_context_menu(self, position, task, date):
         """Контекстное меню для задачи"""
         menu = QMenu(self)
@@ -311,7 +230,14 @@ class WeekDialog(QDialog):
         medium_priority = priority_menu.addAction("🟡 Средний")
         low_priority = priority_menu.addAction("🟢 Низкий")
         
-        action = menu.exec(self.mapToGlobal(position))
+        # Повторяющаяся задача: удаление выше убирает только этот день
+        occurrence = parse_occurrence_id(task['id'])
+        stop_repeat_action = None
+        if occurrence:
+            menu.addSeparator()
+            stop_repeat_action = menu.addAction("🔁 Не повторять с этого дня")
+        
+        action = menu.exec(position)
         
         if action == edit_action:
             self.edit_task(task, date)
@@ -327,6 +253,62 @@ class WeekDialog(QDialog):
             self.set_task_priority(task, 2)
         elif action == low_priority:
             self.set_task_priority(task, 1)
+        elif action is not None and action == stop_repeat_action:
+            self.stop_recurrence(occurrence[0], task['id'], date)
+    
+    def stop_recurrence(self, recurrence_id, task_id, date):
+        """Прекращение повторения задачи начиная с дня date"""
+        reply = QMessageBox.question(
+            self,
+            'Повторяющаяся задача',
+            'Удалить эту и все следующие повторения задачи?',
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            self.submit_write(end_recurrence, self.user_id, recurrence_id, date.toString('yyyy-MM-dd'),
+                              task_ids=[task_id], on_result=lambda ended: self.load_week_tasks())
+    
+    def show_day_menu(self, position, date):
+        """Меню массовых действий с задачами дня (каждое - одна транзакция)"""
+        # Задачи, которые еще изменяются, в массовые действия не попадают
+        day_tasks = [task for task in self.model.day_tasks(self.current_date.daysTo(date))
+                     if not self.model.is_pending(task.id)]
+        if not day_tasks:
+            return
+        all_ids = [task['id'] for task in day_tasks]
+        open_ids = [task['id'] for task in day_tasks if not task['done']]
+        
+        menu = QMenu(self)
+        done_action = menu.addAction("✅ Отметить все выполненными")
+        done_action.setEnabled(bool(open_ids))
+        move_action = menu.addAction(f"📅 Перенести невыполненные ({len(open_ids)})...")
+        move_action.setEnabled(bool(open_ids))
+        menu.addSeparator()
+        delete_action = menu.addAction(f"🗑️ Удалить все задачи дня ({len(all_ids)})")
+        
+        action = menu.exec(position)
+        
+        if action == done_action:
+            self.submit_write(bulk_update_tasks, self.user_id, open_ids, done=True,
+                              task_ids=open_ids, on_result=self.finish_bulk)
+        elif action == move_action:
+            new_date = ask_move_date(self, date.addDays(1), len(open_ids))
+            if new_date is None or new_date == date:
+                return
+            self.submit_write(bulk_move_tasks, self.user_id, open_ids, new_date.toString('yyyy-MM-dd'),
+                              task_ids=open_ids,
+                              on_result=lambda result: self.finish_bulk(result, 'Не удалось перенести задачи'))
+        elif action == delete_action:
+            reply = QMessageBox.question(
+                self,
+                'Подтверждение удаления',
+                f"Удалить все задачи на {date.toString('dd.MM.yyyy')} ({len(all_ids)})?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+            self.submit_write(bulk_delete_tasks, self.user_id, all_ids, task_ids=all_ids,
+                              on_result=lambda result: self.finish_bulk(result, 'Не удалось удалить задачи'))
     
     def edit_task(self, task, date):
         """Редактирование задачи"""
@@ -338,7 +320,8 @@ class WeekDialog(QDialog):
         )
         
         if dialog.exec():
-            self.load_week_tasks()
+            # Редактор сохраняет в фоновом потоке и возвращает новую версию задачи
+            self.apply_task(dialog.saved)
 
     def delete_task(self, task):
         """Удаление задачи"""
@@ -350,23 +333,30 @@ class WeekDialog(QDialog):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            remove_task(self.user_id, task['id'])
-            self.load_week_tasks()
+            self.submit_write(remove_task, self.user_id, task['id'], task_ids=[task['id']],
+                              on_result=lambda deleted: self.task_removed(task['id'], deleted))
+    
+    def task_removed(self, task_id, deleted):
+        """Удаление строки задачи после ответа базы"""
+        if deleted:
+            self.model.remove_task(task_id)
+        else:
+            QMessageBox.warning(self, 'Ошибка', 'Не удалось удалить задачу')
     
     def toggle_task(self, task):
         """Изменение статуса задачи"""
-        toggle_task_status(task['id'], self.user_id)
-        self.load_week_tasks()
+        self.submit_write(toggle_task_status, task['id'], self.user_id,
+                          task_ids=[task['id']], on_result=self.apply_task)
     
     def toggle_mandatory_status(self, task):
         """Переключение статуса обязательности"""
-        toggle_mandatory_status(task['id'], self.user_id)
-        self.load_week_tasks()
+        self.submit_write(toggle_mandatory_status, task['id'], self.user_id,
+                          task_ids=[task['id']], on_result=self.apply_task)
     
     def set_task_priority(self, task, priority):
         """Установка приоритета задачи"""
-        update_task(self.user_id, task['id'], priority=priority)
-        self.load_week_tasks()
+        self.submit_write(update_task, self.user_id, task['id'], priority=priority,
+                          task_ids=[task['id']], on_result=self.apply_task)
     
     def add_task_to_day(self, date):
         """Добавление задачи на день"""
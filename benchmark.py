@@ -0,0 +1,273 @@
+"""Бенчмарки слоя работы с базой данных.
+
+Запуск: python benchmark.py [число_задач]
+
+База создается во временной папке, рабочие данные в data/ не затрагиваются.
+"""
+import heapq
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import db
+import repository
+
+USER_ID = 1
+
+
+def timeit(func, repeat):
+    """Среднее время одного вызова в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def fill_tasks(count, days=365):
+    """Заполнение базы случайными задачами за последние days дней"""
+    start = date.today() - timedelta(days=days)
+    rows = []
+    for i in range(count):
+        task_date = start + timedelta(days=random.randrange(days + 1))
+        rows.append((
+            USER_ID, f"Задача {i}", task_date.isoformat(), db.to_day_num(task_date), f"Описание задачи {i}",
+            random.randint(1, 3), random.random() < 0.2, random.random() < 0.5,
+            random.randint(1, 6)
+        ))
+
+    with db.transaction() as conn:
+        conn.executemany('''
+            INSERT INTO tasks (user_id, title, task_date, day_num, description, priority, is_mandatory, done, category_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+
+def bench_connection(repeat=200):
+    """Клик по дате в календаре -> TaskDialog.load_tasks -> get_tasks_by_date"""
+    today = date.today()
+
+    def per_call_connection():
+        # Старое поведение: новое соединение на каждый вызов
+        db.close_connection()
+        db.get_tasks_by_date(today, USER_ID)
+
+    def persistent_connection():
+        db.get_tasks_by_date(today, USER_ID)
+
+    cold = timeit(per_call_connection, repeat)
+    warm = timeit(persistent_connection, repeat)
+    print(f"get_tasks_by_date: соединение на вызов {cold:.3f} мс, "
+          f"постоянное соединение {warm:.3f} мс (x{cold / warm:.1f})")
+
+
+def bench_stats(repeat=50):
+    """Статистика для строки состояния: один проход по задачам и кэш"""
+    def uncached():
+        db._notify_tasks_changed(USER_ID)
+        db.get_task_stats(USER_ID)
+
+    def cached():
+        db.get_task_stats(USER_ID)
+
+    cold = timeit(uncached, repeat)
+    warm = timeit(cached, repeat)
+    print(f"get_task_stats: запрос {cold:.3f} мс, из кэша {warm:.4f} мс")
+
+
+def bench_cache(repeat=200):
+    """Перерисовка недели после изменения задачи: запрос к SQLite против кэша repository"""
+    week_start = date.today() - timedelta(days=date.today().weekday())
+    task_id = db.add_task("Задача для бенчмарка", week_start.isoformat(), USER_ID)
+
+    def uncached():
+        db.get_tasks_by_week(week_start, USER_ID)
+
+    def after_change():
+        # Изменение в понедельник: соседняя неделя остается в кэше
+        db.toggle_task_status(task_id, USER_ID)
+        repository.get_tasks_by_week(week_start + timedelta(days=7), USER_ID)
+
+    repository.get_tasks_by_week(week_start + timedelta(days=7), USER_ID)
+    cold = timeit(uncached, repeat)
+    warm = timeit(lambda: repository.get_tasks_by_week(week_start, USER_ID), repeat)
+    changed = timeit(after_change, repeat)
+    db.remove_task(USER_ID, task_id)
+    print(f"get_tasks_by_week: запрос {cold:.3f} мс, из кэша {warm:.4f} мс, "
+          f"изменение задачи + соседняя неделя из кэша {changed:.3f} мс")
+
+
+def bench_month_counts(repeat=50):
+    """Плотность задач на видимый месяц: один сгруппированный запрос против 42 запросов по дням"""
+    first = date.today().replace(day=1)
+    days = [first + timedelta(days=i) for i in range(42)]
+
+    def per_day():
+        for day in days:
+            db.get_tasks_by_date(day, USER_ID)
+
+    def one_query():
+        db.get_task_counts_by_range(USER_ID, days[0], days[-1])
+
+    slow = timeit(per_day, repeat)
+    fast = timeit(one_query, repeat)
+    print(f"месяц в календаре: 42 запроса по дням {slow:.3f} мс, "
+          f"get_task_counts_by_range {fast:.3f} мс")
+
+
+def bench_day_num(repeat=50):
+    """Диапазон дат и просроченные задачи: текстовая task_date против целого day_num"""
+    conn = db.get_connection()
+    first = date.today().replace(day=1) - timedelta(days=90)
+    last = first + timedelta(days=41)
+    today = date.today()
+
+    # Прежний индекс по тексту даты создается только на время замера
+    conn.execute('CREATE INDEX bench_user_date ON tasks(user_id, task_date)')
+    conn.commit()
+
+    def text_range():
+        conn.execute('''
+            SELECT task_date, COUNT(*), SUM(done) FROM tasks INDEXED BY bench_user_date
+            WHERE user_id = ? AND task_date BETWEEN ? AND ? GROUP BY task_date
+        ''', (USER_ID, first.isoformat(), last.isoformat())).fetchall()
+
+    def int_range():
+        conn.execute('''
+            SELECT task_date, COUNT(*), SUM(done) FROM tasks INDEXED BY idx_tasks_user_day
+            WHERE user_id = ? AND day_num BETWEEN ? AND ? GROUP BY day_num
+        ''', (USER_ID, db.to_day_num(first), db.to_day_num(last))).fetchall()
+
+    def text_overdue():
+        conn.execute('SELECT SUM(task_date < ? AND NOT done) FROM tasks WHERE user_id = ?',
+                     (today.isoformat(), USER_ID)).fetchone()
+
+    def int_overdue():
+        conn.execute('SELECT SUM(day_num < ? AND NOT done) FROM tasks WHERE user_id = ?',
+                     (db.to_day_num(today), USER_ID)).fetchone()
+
+    try:
+        print(f"6 недель по датам: task_date {timeit(text_range, repeat):.3f} мс, "
+              f"day_num {timeit(int_range, repeat):.3f} мс; "
+              f"просроченные: task_date {timeit(text_overdue, 5):.1f} мс, "
+              f"day_num {timeit(int_overdue, 5):.1f} мс")
+    finally:
+        conn.execute('DROP INDEX bench_user_date')
+        conn.commit()
+
+
+def bench_recurrence(repeat=50, rules=50):
+    """Неделя с повторяющимися задачами: правила, идущие уже 10 лет, разворачиваются только на неделю"""
+    monday = date.today() - timedelta(days=date.today().weekday())
+    start = monday - timedelta(days=3650)
+    ids = [db.add_recurrence(USER_ID, f"Повтор {i}", start, ('daily', 'weekly', 'monthly')[i % 3],
+                             weekdays=(i % 7, (i + 3) % 7))
+           for i in range(rules)]
+
+    week = timeit(lambda: db.get_tasks_by_week(monday, USER_ID), repeat)
+    month = timeit(lambda: db.get_task_counts_by_range(USER_ID, monday, monday + timedelta(days=41)), repeat)
+    print(f"повторяющиеся задачи ({rules} правил за 10 лет): неделя {week:.3f} мс, "
+          f"счетчики на 6 недель {month:.3f} мс")
+
+    for recurrence_id in ids:
+        db.delete_recurrence(USER_ID, recurrence_id)
+
+
+def bench_reminders(repeat=50, reminders=5000):
+    """Загрузка напоминаний на горизонт планировщика: частичный индекс и куча"""
+    today = date.today()
+    ids = [db.add_task(f"Напоминание {i}", today + timedelta(days=i % 3), USER_ID,
+                       due_time=f"{i % 24:02d}:{i % 60:02d}", remind_before=(0, 5, 15, 60)[i % 4])
+           for i in range(reminders)]
+
+    def load():
+        heap = [(when, i, task) for i, (when, task) in
+                enumerate(db.get_reminders(USER_ID, today, today + timedelta(days=3)))]
+        heapq.heapify(heap)
+
+    elapsed = timeit(load, repeat)
+    print(f"напоминания ({reminders} шт. на 3 дня): загрузка в кучу {elapsed:.3f} мс")
+
+    db.bulk_delete_tasks(USER_ID, ids)
+
+
+def bench_export():
+    """Потоковый экспорт в JSON: время и пиковая память Python"""
+    elapsed = timeit(lambda: db.export_tasks_to_json(USER_ID, 'benchmark.json'), 1)
+
+    # Память меряется отдельным прогоном: tracemalloc сильно замедляет код
+    tracemalloc.start()
+    db.export_tasks_to_json(USER_ID, 'benchmark.json')
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = os.path.getsize(os.path.join('data', 'exports', 'benchmark.json'))
+    print(f"export_tasks_to_json: {elapsed:.1f} мс, файл {size / 1024:.0f} КиБ, "
+          f"пик памяти {peak / 1024:.0f} КиБ")
+
+
+def bench_snapshot():
+    """Снимок через backup API против JSON-бэкапа; восстановление снимка против переимпорта JSON"""
+    db.export_tasks_to_json(USER_ID, 'benchmark.json')
+    json_path = os.path.join('data', 'exports', 'benchmark.json')
+
+    snapshot_path = os.path.join('data', 'backups', 'benchmark.db')
+    snapshot = timeit(lambda: db.create_snapshot(snapshot_path), 1)
+    backup = timeit(lambda: db.create_backup(USER_ID, full=True), 1)
+
+    def reimport():
+        db.clear_all_tasks(USER_ID)
+        db.import_tasks_from_json(USER_ID, json_path)
+
+    restore = timeit(lambda: db.restore_snapshot(snapshot_path), 1)
+    json_restore = timeit(reimport, 1)
+    size = os.path.getsize(snapshot_path)
+    print(f"снимок базы {snapshot:.1f} мс ({size / 1024:.0f} КиБ), полный JSON-бэкап {backup:.1f} мс; "
+          f"восстановление снимка {restore:.1f} мс, очистка и импорт JSON {json_restore:.1f} мс")
+
+
+def bench_search(repeat=50):
+    """Полнотекстовый поиск FTS5 против LIKE по названию и описанию"""
+    def like():
+        cursor = db.get_connection().cursor()
+        cursor.execute('''
+            SELECT id FROM tasks
+            WHERE user_id = ? AND (title LIKE ? OR description LIKE ?)
+            LIMIT ?
+        ''', (USER_ID, '%12345%', '%12345%', db.SEARCH_LIMIT))
+        cursor.fetchall()
+
+    rare = timeit(lambda: db.search_tasks(USER_ID, '12345'), repeat)
+    common = timeit(lambda: db.search_tasks(USER_ID, 'описание'), 5)
+    slow = timeit(like, 5)
+    print(f"search_tasks: редкое слово {rare:.3f} мс, слово во всех задачах {common:.1f} мс, "
+          f"LIKE {slow:.1f} мс")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        db.init_db()
+        fill_tasks(count)
+
+        print(f"Задач в базе: {count}")
+        bench_connection()
+        bench_stats()
+        bench_cache()
+        bench_month_counts()
+        bench_day_num()
+        bench_recurrence()
+        bench_reminders()
+        bench_search()
+        bench_export()
+        bench_snapshot()
+
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
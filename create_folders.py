@@ -1,8 +1,9 @@
 import os
-import sqlite3
+
+from db import init_db
 
 def create_data_folders():
-    """Создание папок для данных и пустой базы"""
+    """Создание папок для данных и базы"""
     folders = [
         'data',
         'data/backups',
@@ -15,36 +16,14 @@ def create_data_folders():
         os.makedirs(folder, exist_ok=True)
         print(f"Создана папка: {folder}")
     
+    # Схему создает и обновляет init_db (миграции из migrations.py)
     db_path = os.path.join('data', 'planner.db')
-    if not os.path.exists(db_path):
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                task_date TEXT,
-                description TEXT,
-                priority INTEGER DEFAULT 1,
-                is_mandatory INTEGER DEFAULT 0,
-                done INTEGER DEFAULT 0,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                name TEXT NOT NULL
-            )
-        ''')
-        conn.commit()
-        conn.close()
-        print("Создана пустая база данных planner.db")
+    db_exists = os.path.exists(db_path)
+    init_db()
+    if db_exists:
+        print("База данных уже существует, схема обновлена")
     else:
-        print("База данных уже существует")
+        print("Создана пустая база данных planner.db")
 
 if __name__ == "__main__":
     create_data_folders()
@@ -1,15 +1,151 @@
 import sqlite3
 import os
 import json
-from datetime import datetime, timedelta
-import hashlib
+import gzip
+import lzma
+import re
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+import logging
+
+from logger import get_logger
+from migrations import migrate, SEARCH_INSERT_TRIGGER
+from passwords import hash_password
+from recurrence import Rule, occurrences, last_occurrence, weekdays_mask, mask_weekdays, describe
+
+logger = get_logger('db')
+
+DB_PATH = 'data/planner.db'
 
 def get_db_path():
     """Получение пути к базе данных"""
-    return 'data/planner.db'
+    return DB_PATH
+
+# ========== ПОДКЛЮЧЕНИЕ К БАЗЕ ДАННЫХ ==========
+
+# Одно долгоживущее соединение на поток: sqlite3.Connection нельзя
+# разделять между потоками, а открывать его на каждый вызов дорого.
+_local = threading.local()
+
+def get_connection():
+    """Получение соединения текущего потока (создается при первом обращении)"""
+    conn = getattr(_local, 'conn', None)
+    db_path = get_db_path()
+
+    # Путь к базе поменялся (например, в бенчмарке) - переподключаемся
+    if conn is not None and _local.path != db_path:
+        close_connection()
+        conn = None
+
+    if conn is None:
+        conn = sqlite3.connect(db_path)
+        _local.conn = conn
+        _local.path = db_path
+        _local.depth = 0
+        _local.profile = None
+
+    # Профиль хранения применяется при открытии и после его смены
+    if _local.profile != _storage_profile:
+        _apply_storage_profile(conn, _storage_profile)
+        _local.profile = _storage_profile
+    return conn
+
+def close_connection():
+    """Закрытие соединения текущего потока"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+@contextmanager
+def transaction():
+    """Транзакция на соединении текущего потока.
+
+    При успешном выходе из блока делает commit, при исключении - rollback.
+    Вложенные вызовы присоединяются к внешней транзакции. BEGIN выдается
+    явно: sqlite3 сам открывает транзакцию только перед DML, и DDL в
+    начале блока (DROP TRIGGER и т.п.) иначе фиксировался бы сразу.
+    """
+    conn = get_connection()
+    depth = _local.depth
+    if depth == 0 and not conn.in_transaction:
+        conn.execute('BEGIN')
+    _local.depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        if depth == 0:
+            conn.rollback()
+        raise
+    else:
+        if depth == 0:
+            conn.commit()
+    finally:
+        _local.depth = depth
+
+# ========== ПРОФИЛИ ХРАНЕНИЯ ==========
+
+# PRAGMA, которые выставляются на каждом новом соединении.
+# cache_size в отрицательных значениях задается в КиБ, mmap_size - в байтах.
+STORAGE_PROFILES = {
+    # fsync на каждый коммит: ничего не теряется даже при отключении питания
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -8000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+    },
+    # fsync только на чекпоинтах WAL: при сбое ОС теряются последние коммиты,
+    # но база остается целой
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -32000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    # Для массовой загрузки данных: без fsync и с большим кэшем
+    'bulk-import': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -128000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000,
+    },
+}
+
+DEFAULT_STORAGE_PROFILE = 'fast'
+
+_storage_profile = DEFAULT_STORAGE_PROFILE
+
+def _apply_storage_profile(conn, name):
+    """Применение PRAGMA профиля к соединению"""
+    for pragma, value in STORAGE_PROFILES[name].items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
+
+def get_storage_profile():
+    """Имя активного профиля хранения"""
+    return _storage_profile
+
+def set_storage_profile(name):
+    """Смена профиля хранения для всех соединений процесса.
+
+    Соединение текущего потока перенастраивается сразу, соединения
+    других потоков - при следующем обращении к get_connection().
+    """
+    global _storage_profile
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Неизвестный профиль хранения: {name}")
+    _storage_profile = name
+    get_connection()
 
 def init_db():
-    """Инициализация базы данных с поддержкой пользователей"""
+    """Инициализация базы данных: создание или обновление схемы (см. migrations.py)"""
     db_path = get_db_path()
     
     # Создаем папку data если её нет
@@ -18,131 +154,20 @@ def init_db():
     # Проверяем, существует ли база данных
     db_exists = os.path.exists(db_path)
     
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # 1. Таблица пользователей (первая - без зависимостей)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # 2. Таблица категорий (вторая - зависит только от users)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            color TEXT DEFAULT '#007acc',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            UNIQUE(user_id, name)
-        )
-    ''')
-    
-    # 3. Таблица задач (третья - зависит от users и categories)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            task_date TEXT NOT NULL,
-            description TEXT,
-            priority INTEGER DEFAULT 1,
-            is_mandatory BOOLEAN DEFAULT FALSE,
-            done BOOLEAN DEFAULT FALSE,
-            category_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (category_id) REFERENCES categories (id)
-        )
-    ''')
-    
-    # 4. Остальные таблицы
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS templates (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        name TEXT NOT NULL,
-        data TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        UNIQUE(user_id, name),
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_settings (
-            user_id INTEGER PRIMARY KEY,
-            auto_backup BOOLEAN DEFAULT TRUE,
-            notifications BOOLEAN DEFAULT TRUE,
-            week_start TEXT DEFAULT 'monday',
-            theme TEXT DEFAULT 'light',
-            language TEXT DEFAULT 'ru',
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Создаем индексы для быстрого поиска
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_date ON tasks(user_id, task_date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_done ON tasks(user_id, done)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_priority ON tasks(user_id, priority)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_categories_user ON categories(user_id)')
-    
-    # Создаем администратора по умолчанию если база новая
-    if not db_exists:
-        admin_password_hash = hash_password("admin")
-        cursor.execute(
-            'INSERT INTO users (username, password_hash) VALUES (?, ?)',
-            ('Admin', admin_password_hash)
-        )
-        admin_id = cursor.lastrowid
-        
-        # Создаем настройки для администратора
-        cursor.execute(
-            'INSERT INTO user_settings (user_id) VALUES (?)',
-            (admin_id,)
-        )
-        
-        # Создаем стандартные категории для администратора
-        default_categories = [
-            ('Работа', '#ff6b6b'),
-            ('Личное', '#4ecdc4'),
-            ('Здоровье', '#45b7d1'),
-            ('Обучение', '#96ceb4'),
-            ('Семья', '#feca57'),
-            ('Другое', '#a29bfe')
-        ]
-        
-        for name, color in default_categories:
-            cursor.execute(
-                'INSERT INTO categories (user_id, name, color) VALUES (?, ?, ?)',
-                (admin_id, name, color)
-            )
-    
-    conn.commit()
-    conn.close()
+    # На актуальной базе - одно чтение PRAGMA user_version
+    migrate(get_connection())
     
     # Создаем папки для бэкапов и экспортов
     os.makedirs('data/backups', exist_ok=True)
     os.makedirs('data/exports', exist_ok=True)
     
-    print(f"База данных {'создана' if not db_exists else 'подключена'}: {db_path}")
-# ========== ФУНКЦИИ ДЛЯ РАБОТЫ С ПОЛЬЗОВАТЕЛЯМИ ==========
-
-def hash_password(password: str) -> str:
-    salt = "planner_salt_v1"
-    return hashlib.sha256((password + salt).encode()).hexdigest()
+    logger.info("База данных %s: %s", 'создана' if not db_exists else 'подключена', db_path)
 
+# ========== ФУНКЦИИ ДЛЯ РАБОТЫ С ПОЛЬЗОВАТЕЛЯМИ ==========
 
 def create_user(username, password):
     """Создание нового пользователя"""
-    conn = sqlite3.connect(get_db_path())
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
@@ -178,17 +203,18 @@ def create_user(username, password):
         conn.commit()
         return user_id
     except sqlite3.IntegrityError:
+        conn.rollback()
         return None  # Пользователь уже существует
     except Exception as e:
-        print(f"Ошибка при создании пользователя: {e}")
+        conn.rollback()
+        logger.error("Ошибка при создании пользователя: %s", e)
         return None
     finally:
-        conn.close()
+        cursor.close()
 
 def authenticate_user(username, password):
     """Аутентификация пользователя"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     
     try:
         password_hash = hash_password(password)
@@ -200,33 +226,39 @@ def authenticate_user(username, password):
         result = cursor.fetchone()
         return result[0] if result else None
     except Exception as e:
-        print(f"Ошибка при аутентификации: {e}")
+        logger.error("Ошибка при аутентификации: %s", e)
         return None
     finally:
-        conn.close()
+        cursor.close()
 
 def get_users():
     """Получение списка пользователей"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     
     try:
         cursor.execute('SELECT id, username FROM users ORDER BY username')
         users = cursor.fetchall()
         return [{'id': row[0], 'username': row[1]} for row in users]
     except Exception as e:
-        print(f"Ошибка при получении пользователей: {e}")
+        logger.error("Ошибка при получении пользователей: %s", e)
         return []
     finally:
-        conn.close()
+        cursor.close()
+
+# На сколько месяцев и недель в каждую сторону подгружать задачи заранее
+DEFAULT_PREFETCH_DEPTH = 2
+MAX_PREFETCH_DEPTH = 2
 
 def get_user_settings(user_id):
     """Получение настроек пользователя"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     
     try:
-        cursor.execute('SELECT * FROM user_settings WHERE user_id = ?', (user_id,))
+        cursor.execute('''
+            SELECT user_id, auto_backup, notifications, week_start, theme, language, storage_profile,
+                   prefetch_depth
+            FROM user_settings WHERE user_id = ?
+        ''', (user_id,))
         result = cursor.fetchone()
         if result:
             return {
@@ -235,18 +267,21 @@ def get_user_settings(user_id):
                 'notifications': bool(result[2]),
                 'week_start': result[3],
                 'theme': result[4],
-                'language': result[5]
+                'language': result[5],
+                'storage_profile': result[6] or DEFAULT_STORAGE_PROFILE,
+                'prefetch_depth': result[7] if result[7] is not None else DEFAULT_PREFETCH_DEPTH
             }
         return None
     except Exception as e:
-        print(f"Ошибка при получении настроек: {e}")
+        logger.error("Ошибка при получении настроек: %s", e)
         return None
     finally:
-        conn.close()
+        cursor.close()
 
-def update_user_settings(user_id, auto_backup=None, notifications=None, week_start=None, theme=None, language=None):
+def update_user_settings(user_id, auto_backup=None, notifications=None, week_start=None, theme=None, language=None,
+                         storage_profile=None, prefetch_depth=None):
     """Обновление настроек пользователя"""
-    conn = sqlite3.connect(get_db_path())
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
@@ -268,6 +303,16 @@ def update_user_settings(user_id, auto_backup=None, notifications=None, week_sta
         if language is not None:
             updates.append("language = ?")
             params.append(language)
+        if storage_profile is not None:
+            if storage_profile not in STORAGE_PROFILES:
+                raise ValueError(f"Неизвестный профиль хранения: {storage_profile}")
+            updates.append("storage_profile = ?")
+            params.append(storage_profile)
+        if prefetch_depth is not None:
+            if not 0 <= prefetch_depth <= MAX_PREFETCH_DEPTH:
+                raise ValueError(f"Некорректная глубина предзагрузки: {prefetch_depth}")
+            updates.append("prefetch_depth = ?")
+            params.append(prefetch_depth)
             
         params.append(user_id)
         
@@ -280,200 +325,389 @@ def update_user_settings(user_id, auto_backup=None, notifications=None, week_sta
         conn.commit()
         return True
     except Exception as e:
-        print(f"Ошибка при обновлении настроек: {e}")
+        conn.rollback()
+        logger.error("Ошибка при обновлении настроек: %s", e)
         return False
     finally:
-        conn.close()
+        cursor.close()
+# ========== МОДЕЛЬ ЗАДАЧИ ==========
+
+TASK_FIELDS = (
+    'id', 'user_id', 'title', 'task_date', 'description', 'priority',
+    'is_mandatory', 'done', 'category_id', 'created_at', 'updated_at',
+    'category_name', 'category_color', 'due_time', 'remind_before'
+)
+
+_TASK_FIELD_SET = frozenset(TASK_FIELDS)
+
+# Колонки перечислены явно в порядке TASK_FIELDS, чтобы строка не зависела
+# от порядка колонок в таблице (ALTER TABLE добавляет их в конец)
+_TASK_COLUMNS = '''
+    SELECT t.id, t.user_id, t.title, t.task_date, t.description, t.priority,
+           t.is_mandatory, t.done, t.category_id, t.created_at, t.updated_at,
+           c.name, c.color, t.due_time, t.remind_before
+'''
+
+_CATEGORY_JOIN = '''
+    LEFT JOIN categories c ON t.category_id = c.id AND c.user_id = t.user_id
+'''
+
+TASK_SELECT = _TASK_COLUMNS + 'FROM tasks t' + _CATEGORY_JOIN
+
+# Выборка по дате или диапазону дат. Без статистики ANALYZE планировщик
+# может взять малоизбирательный idx_tasks_user_done и перебрать все задачи
+# пользователя, поэтому индекс по (user_id, day_num) указан явно.
+TASK_SELECT_BY_DATE = _TASK_COLUMNS + 'FROM tasks t INDEXED BY idx_tasks_user_day' + _CATEGORY_JOIN
+
+# RETURNING для UPDATE задач: строка в порядке TASK_FIELDS. JOIN в RETURNING
+# недоступен, поэтому категория берется коррелированными подзапросами
+TASK_RETURNING = '''
+    RETURNING id, user_id, title, task_date, description, priority,
+              is_mandatory, done, category_id, created_at, updated_at,
+              (SELECT c.name FROM categories c WHERE c.id = tasks.category_id AND c.user_id = tasks.user_id),
+              (SELECT c.color FROM categories c WHERE c.id = tasks.category_id AND c.user_id = tasks.user_id),
+              due_time, remind_before
+'''
+
+# Порядок задач внутри дня: сначала невыполненные, затем обязательные
+# и более приоритетные
+TASK_DAY_ORDER = 't.done ASC, t.is_mandatory DESC, t.priority DESC, t.created_at'
+
+class Task:
+    """Задача вместе с названием и цветом категории.
+
+    Компактная запись на __slots__ вместо словаря на каждую строку.
+    Поддерживает доступ как к словарю (task['title'], task.get('priority', 1)),
+    поэтому диалоги работают с ней так же, как раньше со словарями.
+    """
+    __slots__ = TASK_FIELDS
+
+    def __init__(self, id, user_id, title, task_date, description, priority,
+                 is_mandatory, done, category_id, created_at, updated_at,
+                 category_name=None, category_color=None, due_time=None, remind_before=None):
+        self.id = id
+        self.user_id = user_id
+        self.title = title
+        self.task_date = task_date
+        self.description = description
+        self.priority = priority
+        self.is_mandatory = bool(is_mandatory)
+        self.done = bool(done)
+        self.category_id = category_id
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.category_name = category_name
+        self.category_color = category_color
+        self.due_time = due_time
+        self.remind_before = remind_before
+
+    def __getitem__(self, key):
+        if key not in _TASK_FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in _TASK_FIELD_SET
+
+    def __eq__(self, other):
+        if not isinstance(other, Task):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in TASK_FIELDS)
+
+    def __repr__(self):
+        return f"Task(id={self.id!r}, title={self.title!r}, task_date={self.task_date!r})"
+
+    def get(self, key, default=None):
+        """Значение поля как у dict.get"""
+        if key not in _TASK_FIELD_SET:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return TASK_FIELDS
+
+    def to_dict(self):
+        """Обычный словарь со всеми полями задачи"""
+        return {name: getattr(self, name) for name in TASK_FIELDS}
+
+def task_row_factory(cursor, row):
+    """row_factory для запросов на основе TASK_SELECT"""
+    return Task(*row)
+
 # ========== ФУНКЦИИ ДЛЯ РАБОТЫ С ЗАДАЧАМИ ==========
 
-def add_task(title, task_date, user_id, description="", category_id=None, priority=1, is_mandatory=False):
-    """Добавление задачи"""
-    conn = sqlite3.connect(get_db_path())
+def _date_str(value):
+    """Дата в формате хранения 'yyyy-MM-dd' из QDate, date или строки"""
+    if isinstance(value, str):
+        return value
+    if hasattr(value, 'toString'):
+        return value.toString('yyyy-MM-dd')
+    return value.strftime('%Y-%m-%d')
+
+# date.toordinal() + JULIAN_DAY_OFFSET == QDate.toJulianDay()
+JULIAN_DAY_OFFSET = 1721425
+
+def to_day_num(value):
+    """Номер дня (юлианский день, колонка day_num) из QDate, date или строки 'yyyy-MM-dd'"""
+    if hasattr(value, 'toJulianDay'):
+        return value.toJulianDay()
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d')
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal() + JULIAN_DAY_OFFSET
+
+def from_day_num(day_num):
+    """Дата 'yyyy-MM-dd' по номеру дня"""
+    return date.fromordinal(day_num - JULIAN_DAY_OFFSET).isoformat()
+
+# Время задачи хранится строкой 'HH:MM', напоминание - в минутах до него.
+# В update_task None значит "не менять", поэтому снятие времени и
+# напоминания передается этими значениями
+NO_TIME = ''
+NO_REMINDER = -1
+
+# Самое раннее напоминание - за сутки до задачи
+MAX_REMIND_BEFORE = 24 * 60
+
+_DUE_TIME_RE = re.compile(r'^([01]\d|2[0-3]):[0-5]\d$')
+
+def _due_time_value(due_time):
+    """Значение колонки due_time: 'HH:MM' или NULL для NO_TIME"""
+    if due_time == NO_TIME:
+        return None
+    if not _DUE_TIME_RE.match(due_time):
+        raise ValueError(f"Некорректное время задачи: {due_time}")
+    return due_time
+
+def _remind_before_value(remind_before):
+    """Значение колонки remind_before: минуты или NULL для NO_REMINDER"""
+    if remind_before == NO_REMINDER:
+        return None
+    if not 0 <= remind_before <= MAX_REMIND_BEFORE:
+        raise ValueError(f"Напоминание возможно не раньше чем за {MAX_REMIND_BEFORE} минут")
+    return remind_before
+
+def add_task(title, task_date, user_id, description="", category_id=None, priority=1, is_mandatory=False,
+             due_time=None, remind_before=None):
+    """Добавление задачи (due_time - 'HH:MM', remind_before - минуты до напоминания)"""
+    due_time = _due_time_value(due_time) if due_time is not None else None
+    remind_before = _remind_before_value(remind_before) if remind_before is not None else None
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
         cursor.execute('''
-            INSERT INTO tasks (user_id, title, task_date, description, category_id, priority, is_mandatory)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, title, task_date, description, category_id, priority, is_mandatory))
+            INSERT INTO tasks (user_id, title, task_date, day_num, description, category_id, priority, is_mandatory,
+                               due_time, remind_before)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, title, _date_str(task_date), to_day_num(task_date), description, category_id, priority, is_mandatory,
+              due_time, remind_before))
         
         task_id = cursor.lastrowid
         conn.commit()
-        print(f"Задача добавлена (ID: {task_id}) для пользователя {user_id}")
+        _notify_tasks_changed(user_id, [_date_str(task_date)], [task_id])
+        logger.debug("Задача добавлена (ID: %s) для пользователя %s", task_id, user_id)
         return task_id
     except Exception as e:
-        print(f"Ошибка при добавлении задачи: {e}")
+        conn.rollback()
+        logger.error("Ошибка при добавлении задачи: %s", e)
         return None
     finally:
-        conn.close()
+        cursor.close()
 
 
 def get_tasks_by_date(date_obj, user_id):
-    """Получение задач по дате для конкретного пользователя"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    """Получение задач по дате для конкретного пользователя.
+
+    Возвращает список Task или None при ошибке (например, база занята),
+    чтобы кэш repository не запомнил пустой день.
+    """
+    cursor = get_connection().cursor()
     
     try:
-        if hasattr(date_obj, 'toString'):
-            date_str = date_obj.toString('yyyy-MM-dd')
-        else:
-            date_str = date_obj.strftime('%Y-%m-%d')
+        date_str = _date_str(date_obj)
             
-        # ВАЖНО: Добавлено AND c.user_id = t.user_id
-        cursor.execute('''
-            SELECT t.*, c.name as category_name, c.color as category_color 
-            FROM tasks t
-            LEFT JOIN categories c ON t.category_id = c.id AND c.user_id = t.user_id
-            WHERE t.task_date = ? AND t.user_id = ?
-            ORDER BY 
-                t.done ASC,
-                t.is_mandatory DESC, 
-                t.priority DESC, 
-                t.created_at
-        ''', (date_str, user_id))
+        day_num = to_day_num(date_obj)
+            
+        cursor.row_factory = task_row_factory
+        cursor.execute(TASK_SELECT_BY_DATE + f'''
+            WHERE t.user_id = ? AND t.day_num = ?
+            ORDER BY {TASK_DAY_ORDER}
+        ''', (user_id, day_num))
         
-        tasks = cursor.fetchall()
+        tasks = _with_occurrences(cursor.fetchall(), _load_occurrences(user_id, day_num, day_num).get(date_str))
         
         # ДЕТАЛЬНАЯ отладка
-        print(f"🔍 SQL вернул {len(tasks)} строк")
-        if tasks:
-            print(f"   Пример первой задачи:")
-            print(f"     Столбцов в строке: {len(tasks[0])}")
-            print(f"     ID задачи: {tasks[0][0]}")
-            print(f"     Category ID: {tasks[0][8]}")
-            print(f"     Category Name: '{tasks[0][11] if len(tasks[0]) > 11 else 'None'}'")
-            print(f"     Category Color: '{tasks[0][12] if len(tasks[0]) > 12 else 'None'}'")
-        
-        result = []
-        for task in tasks:
-            task_dict = {
-                'id': task[0], 'user_id': task[1], 'title': task[2],
-                'task_date': task[3], 'description': task[4], 'priority': task[5],
-                'is_mandatory': bool(task[6]), 'done': bool(task[7]),
-                'category_id': task[8],
-                'created_at': task[9], 'updated_at': task[10],
-                'category_name': task[11] if len(task) > 11 else None,
-                'category_color': task[12] if len(task) > 12 else None
-            }
+        logger.debug("Задач на %s: %s", date_str, len(tasks))
+        if logger.isEnabledFor(logging.DEBUG):
+            for task in tasks:
+                # Отладка для задач с категориями
+                if task.category_id:
+                    logger.debug("Задача '%s' → Category ID: %s, Name: '%s'",
+                                 task.title, task.category_id, task.category_name)
             
-            # Отладка для задач с категориями
-            if task_dict['category_id']:
-                print(f"   📍 Задача '{task_dict['title']}' → Category ID: {task_dict['category_id']}, Name: '{task_dict['category_name']}'")
-            
-            result.append(task_dict)
-            
-        return result
+        return tasks
         
     except Exception as e:
-        print(f"Ошибка при получении задач: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
+        logger.exception("Ошибка при получении задач: %s", e)
+        return None
     finally:
-        conn.close()
+        cursor.close()
 
 def get_tasks_by_week(start_date, user_id):
     """Получение задач на неделю для конкретного пользователя"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    if hasattr(start_date, 'addDays'):
+        end_date = start_date.addDays(6)
+    else:
+        end_date = start_date + timedelta(days=6)
+    
+    return get_tasks_by_range(user_id, start_date, end_date)
+
+def get_tasks_by_range(user_id, start_date, end_date):
+    """Задачи пользователя за период (включительно), сгруппированные по дням.
+
+    Возвращает словарь 'yyyy-MM-dd' -> список Task (дни без задач в нем
+    отсутствуют) или None при ошибке.
+    """
+    cursor = get_connection().cursor()
     
     try:
-        if hasattr(start_date, 'addDays'):
-            end_date = start_date.addDays(6)
-            start_date_str = start_date.toString('yyyy-MM-dd')
-            end_date_str = end_date.toString('yyyy-MM-dd')
-        else:
-            end_date = start_date + timedelta(days=6)
-            start_date_str = start_date.strftime('%Y-%m-%d')
-            end_date_str = end_date.strftime('%Y-%m-%d')
+        start_date_str = _date_str(start_date)
+        end_date_str = _date_str(end_date)
         
-        cursor.execute('''
-            SELECT t.*, c.name as category_name, c.color as category_color 
-            FROM tasks t
-            LEFT JOIN categories c ON t.category_id = c.id
-            WHERE t.task_date BETWEEN ? AND ? AND t.user_id = ?
-            ORDER BY 
-                t.task_date,
-                t.done ASC,  -- ← ВАЖНО: Сначала невыполненные
-                t.is_mandatory DESC, 
-                t.priority DESC
-        ''', (start_date_str, end_date_str, user_id))
+        first_num, last_num = to_day_num(start_date), to_day_num(end_date)
+        
+        cursor.row_factory = task_row_factory
+        cursor.execute(TASK_SELECT_BY_DATE + f'''
+            WHERE t.user_id = ? AND t.day_num BETWEEN ? AND ?
+            ORDER BY t.day_num, {TASK_DAY_ORDER}
+        ''', (user_id, first_num, last_num))
         
         tasks = cursor.fetchall()
         
         tasks_by_day = {}
         for task in tasks:
-            day = task[3]
+            day = task.task_date
             if day not in tasks_by_day:
                 tasks_by_day[day] = []
             
-            tasks_by_day[day].append({
-                'id': task[0], 'user_id': task[1], 'title': task[2],
-                'task_date': task[3], 'description': task[4], 'priority': task[5],
-                'is_mandatory': bool(task[6]), 'done': bool(task[7]),
-                'category_id': task[8], 
-                'created_at': task[9], 'updated_at': task[10],
-                'category_name': task[11] if len(task) > 11 else None,
-                'category_color': task[12] if len(task) > 12 else None
-            })
+            tasks_by_day[day].append(task)
+        
+        occurrences_by_day = _load_occurrences(user_id, first_num, last_num)
+        if occurrences_by_day:
+            for day, day_occurrences in occurrences_by_day.items():
+                tasks_by_day[day] = _with_occurrences(tasks_by_day.get(day, []), day_occurrences)
+            tasks_by_day = dict(sorted(tasks_by_day.items()))
             
-        print(f"📅 Неделя: {len(tasks)} задач (выполненные в конце каждого дня)")
+        logger.debug("Задач с %s по %s: %s", start_date_str, end_date_str, len(tasks))
         return tasks_by_day
         
     except Exception as e:
-        print(f"Ошибка: {e}")
+        logger.error("Ошибка при получении задач за период: %s", e)
+        return None
+    finally:
+        cursor.close()
+
+def get_task_counts_by_range(user_id, start_date, end_date):
+    """Счетчики задач по дням за период (например, видимый месяц календаря).
+
+    Один проход по индексу idx_tasks_user_day без чтения текстов задач.
+    Возвращает словарь 'yyyy-MM-dd' -> {'total', 'done', 'mandatory',
+    'max_priority'}; max_priority - высший приоритет невыполненных задач
+    (0, если выполнены все). Дни без задач в словаре отсутствуют.
+    """
+    cursor = get_connection().cursor()
+    
+    try:
+        first_num, last_num = to_day_num(start_date), to_day_num(end_date)
+        cursor.execute('''
+            SELECT task_date, COUNT(*), SUM(done), SUM(is_mandatory),
+                   COALESCE(MAX(CASE WHEN NOT done THEN priority END), 0)
+            FROM tasks INDEXED BY idx_tasks_user_day
+            WHERE user_id = ? AND day_num BETWEEN ? AND ?
+            GROUP BY day_num
+        ''', (user_id, first_num, last_num))
+        
+        counts = {
+            day: {'total': total, 'done': done, 'mandatory': mandatory, 'max_priority': max_priority}
+            for day, total, done, mandatory, max_priority in cursor.fetchall()
+        }
+        
+        # Повторяющиеся задачи разворачиваются только на этот период
+        for day, day_occurrences in _load_occurrences(user_id, first_num, last_num).items():
+            day_counts = counts.setdefault(day, {'total': 0, 'done': 0, 'mandatory': 0, 'max_priority': 0})
+            for task in day_occurrences:
+                day_counts['total'] += 1
+                day_counts['done'] += task.done
+                day_counts['mandatory'] += task.is_mandatory
+                if not task.done:
+                    day_counts['max_priority'] = max(day_counts['max_priority'], task.priority or 0)
+        return counts
+    except Exception as e:
+        logger.error("Ошибка при подсчете задач за период: %s", e)
         return {}
     finally:
-        conn.close()
+        cursor.close()
 
 def update_task(user_id, task_id, title=None, description=None, task_date=None, 
-                priority=None, is_mandatory=None, category_id=None):
-    """Обновление задачи"""
-    conn = sqlite3.connect(get_db_path())
+                priority=None, is_mandatory=None, category_id=None, due_time=None, remind_before=None):
+    """Обновление задачи одним UPDATE ... RETURNING.
+
+    Возвращает обновленную задачу (Task) или None, если задача не найдена,
+    обновлять нечего или произошла ошибка. Для вхождения повторяющейся
+    задачи изменение касается только этого дня (update_occurrence).
+    NO_TIME и NO_REMINDER снимают время и напоминание.
+    """
+    if parse_occurrence_id(task_id) is not None:
+        return update_occurrence(user_id, task_id, title=title, description=description, task_date=task_date,
+                                 priority=priority, is_mandatory=is_mandatory, category_id=category_id,
+                                 due_time=due_time, remind_before=remind_before)
+    
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        # Проверяем, существует ли задача
-        cursor.execute('SELECT id FROM tasks WHERE id = ? AND user_id = ?', (task_id, user_id))
-        task_exists = cursor.fetchone()
-        
-        if not task_exists:
-            print(f"❌ Задача {task_id} не найдена для пользователя {user_id}")
-            return False
-        
-        print(f"✅ Задача {task_id} существует для пользователя {user_id}")
-        
         updates = []
         params = []
         
         if title is not None:
             updates.append("title = ?")
             params.append(title)
-            print(f"  - Обновляем title: {title}")
         if description is not None:
             updates.append("description = ?")
             params.append(description)
-            print(f"  - Обновляем description: {description}")
         if task_date is not None:
-            updates.append("task_date = ?")
-            params.append(task_date)
-            print(f"  - Обновляем task_date: {task_date}")
+            updates.append("task_date = ?, day_num = ?")
+            params.extend((_date_str(task_date), to_day_num(task_date)))
         if priority is not None:
             updates.append("priority = ?")
             params.append(priority)
-            print(f"  - Обновляем priority: {priority}")
         if is_mandatory is not None:
             updates.append("is_mandatory = ?")
             params.append(is_mandatory)
-            print(f"  - Обновляем is_mandatory: {is_mandatory}")
         if category_id is not None:
             updates.append("category_id = ?")
             params.append(category_id)
-            print(f"  - Обновляем category_id: {category_id}")
+        if due_time is not None:
+            updates.append("due_time = ?")
+            params.append(_due_time_value(due_time))
+        if remind_before is not None:
+            updates.append("remind_before = ?")
+            params.append(_remind_before_value(remind_before))
             
         if not updates:
-            print("⚠️ Нет полей для обновления")
-            return False
+            logger.debug("Нет полей для обновления задачи %s", task_id)
+            return None
+        
+        dates = set()
+        if task_date is not None:
+            # Перенос на другую дату: для кэшей нужна и старая дата,
+            # а RETURNING отдает только новые значения
+            cursor.execute('SELECT task_date FROM tasks WHERE id = ? AND user_id = ?', (task_id, user_id))
+            row = cursor.fetchone()
+            if row:
+                dates.add(row[0])
             
         updates.append("updated_at = CURRENT_TIMESTAMP")
         
@@ -481,89 +715,96 @@ def update_task(user_id, task_id, title=None, description=None, task_date=None,
         params.append(task_id)
         params.append(user_id)
         
-        # Собираем SQL запрос
-        sql = f'''
+        logger.debug("Обновление задачи %s: %s %s", task_id, updates, params)
+        
+        cursor.row_factory = task_row_factory
+        cursor.execute(f'''
             UPDATE tasks 
             SET {', '.join(updates)}
             WHERE id = ? AND user_id = ?
-        '''
-        
-        print(f"📋 SQL запрос: {sql}")
-        print(f"📦 Параметры: {params}")
+        ''' + TASK_RETURNING, params)
+        task = cursor.fetchone()
+        conn.commit()
         
-        try:
-            cursor.execute(sql, params)
-            conn.commit()
-            
-            updated = cursor.rowcount > 0
-            print(f"🔄 Задача {task_id} обновлена: {updated} (строк изменено: {cursor.rowcount})")
-            
-            if cursor.rowcount == -1:
-                print("⚠️ rowcount = -1: возможно ошибка в SQL или таблица не поддерживает rowcount")
-                
-            return updated
-            
-        except sqlite3.Error as e:
-            print(f"❌ Ошибка SQL: {e}")
-            conn.rollback()
-            return False
+        if task is None:
+            logger.debug("Задача %s не найдена для пользователя %s", task_id, user_id)
+            return None
         
+        dates.add(task.task_date)
+        _notify_tasks_changed(user_id, sorted(dates), [task.id])
+        logger.debug("Задача %s обновлена", task_id)
+        return task
     except Exception as e:
-        print(f"❌ Общая ошибка в update_task: {e}")
-        return False
+        conn.rollback()
+        logger.error("Ошибка в update_task: %s", e)
+        return None
     finally:
-        conn.close()
+        cursor.close()
 
 def remove_task(user_id, task_id):
     """Удаление задачи по ID с проверкой пользователя"""
-    conn = sqlite3.connect(get_db_path())
+    if parse_occurrence_id(task_id) is not None:
+        return skip_occurrence(user_id, task_id)
+    
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute('DELETE FROM tasks WHERE id = ? AND user_id = ?', (task_id, user_id))
+        cursor.execute('DELETE FROM tasks WHERE id = ? AND user_id = ? RETURNING task_date', (task_id, user_id))
+        row = cursor.fetchone()
         conn.commit()
-        deleted = cursor.rowcount > 0
+        deleted = row is not None
         if deleted:
-            print(f"Задача {task_id} удалена пользователем {user_id}")
+            _notify_tasks_changed(user_id, [row[0]], [task_id])
+            logger.debug("Задача %s удалена пользователем %s", task_id, user_id)
         return deleted
     except Exception as e:
-        print(f"Ошибка при удалении задачи: {e}")
+        conn.rollback()
+        logger.error("Ошибка при удалении задачи: %s", e)
         return False
     finally:
-        conn.close()
+        cursor.close()
 
 def toggle_task_status(task_id, user_id):
-    """Переключение статуса выполнения задачи"""
-    conn = sqlite3.connect(get_db_path())
+    """Переключение статуса выполнения задачи.
+
+    Один запрос UPDATE ... RETURNING без предварительного SELECT.
+    Возвращает обновленную задачу (Task) или None, если задача не найдена
+    или произошла ошибка.
+    """
+    occurrence = get_occurrence(user_id, task_id)
+    if occurrence is not None:
+        return update_occurrence(user_id, task_id, done=not occurrence.done)
+    
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        # Получаем текущий статус
-        cursor.execute('SELECT done FROM tasks WHERE id = ? AND user_id = ?', (task_id, user_id))
-        result = cursor.fetchone()
-        
-        if result is None:
-            print(f"Задача {task_id} не найдена для пользователя {user_id}")
-            return False
-            
-        current_status = result[0]
-        
-        # Инвертируем статус
-        cursor.execute('UPDATE tasks SET done = ? WHERE id = ? AND user_id = ?', 
-                      (not current_status, task_id, user_id))
+        cursor.row_factory = task_row_factory
+        cursor.execute('''
+            UPDATE tasks SET done = NOT done, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND user_id = ?
+        ''' + TASK_RETURNING, (task_id, user_id))
+        task = cursor.fetchone()
         conn.commit()
         
-        print(f"Статус задачи {task_id} изменен на {not current_status}")
-        return not current_status
+        if task is None:
+            logger.debug("Задача %s не найдена для пользователя %s", task_id, user_id)
+            return None
+        
+        _notify_tasks_changed(user_id, [task.task_date], [task.id])
+        logger.debug("Статус задачи %s изменен на %s", task_id, task.done)
+        return task
     except Exception as e:
-        print(f"Ошибка при изменении статуса задачи: {e}")
-        return False
+        conn.rollback()
+        logger.error("Ошибка при изменении статуса задачи: %s", e)
+        return None
     finally:
-        conn.close()
+        cursor.close()
 
 def save_template(user_id, name, template_data):
     """Сохранение шаблона задач"""
-    conn = sqlite3.connect(get_db_path())
+    conn = get_connection()
     cursor = conn.cursor()
 
     try:
@@ -577,15 +818,15 @@ def save_template(user_id, name, template_data):
         conn.commit()
         return True
     except Exception as e:
-        print(f"Ошибка сохранения шаблона: {e}")
+        conn.rollback()
+        logger.error("Ошибка сохранения шаблона: %s", e)
         return False
     finally:
-        conn.close()
+        cursor.close()
 
 def get_available_templates(user_id):
     """Получение списка шаблонов пользователя"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
 
     try:
         cursor.execute(
@@ -594,210 +835,1019 @@ def get_available_templates(user_id):
         )
         return [row[0] for row in cursor.fetchall()]
     except Exception as e:
-        print(f"Ошибка получения шаблонов: {e}")
+        logger.error("Ошибка получения шаблонов: %s", e)
         return []
     finally:
-        conn.close()
+        cursor.close()
 
 
 def get_task(task_id, user_id):
     """Получение одной задачи по ID с проверкой пользователя"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    if parse_occurrence_id(task_id) is not None:
+        return get_occurrence(user_id, task_id)
+    
+    cursor = get_connection().cursor()
 
     try:
-        # ВАЖНО: Добавить JOIN с категориями!
-        cursor.execute(
-            '''
-            SELECT t.*, c.name as category_name, c.color as category_color 
-            FROM tasks t
-            LEFT JOIN categories c ON t.category_id = c.id
-            WHERE t.id = ? AND t.user_id = ?
-            ''',
-            (task_id, user_id)
-        )
+        cursor.row_factory = task_row_factory
+        cursor.execute(TASK_SELECT + 'WHERE t.id = ? AND t.user_id = ?', (task_id, user_id))
 
         task = cursor.fetchone()
         if not task:
-            print(f"❌ Задача {task_id} не найдена для пользователя {user_id}")
+            logger.debug("Задача %s не найдена для пользователя %s", task_id, user_id)
             return None
 
-        print(f"✅ Задача {task_id} найдена, категория: ID={task[8]}, Name={task[11] if len(task) > 11 else 'None'}")
-
-        return {
-            'id': task[0],
-            'user_id': task[1],
-            'title': task[2],
-            'task_date': task[3],
-            'description': task[4],
-            'priority': task[5],
-            'is_mandatory': bool(task[6]),
-            'done': bool(task[7]),
-            'category_id': task[8],  # ← Теперь есть!
-            'created_at': task[9],
-            'updated_at': task[10],
-            'category_name': task[11] if len(task) > 11 else None,  # ← И это!
-            'category_color': task[12] if len(task) > 12 else None   # ← И это!
-        }
+        logger.debug("Задача %s найдена, категория: ID=%s, Name=%s", task_id, task.category_id, task.category_name)
+
+        return task
     except Exception as e:
-        print(f"❌ Ошибка при получении задачи: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Ошибка при получении задачи: %s", e)
         return None
     finally:
-        conn.close()
+        cursor.close()
 
 def toggle_mandatory_status(task_id, user_id):
-    """Переключение статуса обязательности задачи"""
-    conn = sqlite3.connect(get_db_path())
+    """Переключение статуса обязательности задачи.
+
+    Один запрос UPDATE ... RETURNING без предварительного SELECT.
+    Возвращает обновленную задачу (Task) или None, если задача не найдена
+    или произошла ошибка.
+    """
+    occurrence = get_occurrence(user_id, task_id)
+    if occurrence is not None:
+        return update_occurrence(user_id, task_id, is_mandatory=not occurrence.is_mandatory)
+    
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        # Получаем текущий статус
-        cursor.execute('SELECT is_mandatory FROM tasks WHERE id = ? AND user_id = ?', (task_id, user_id))
-        result = cursor.fetchone()
-        
-        if result is None:
-            print(f"❌ Задача {task_id} не найдена для пользователя {user_id}")
-            return None  # Возвращаем None при ошибке
-            
-        current_status = bool(result[0])  # Преобразуем в bool
-        new_status = not current_status
-        
-        # Инвертируем статус
-        cursor.execute('UPDATE tasks SET is_mandatory = ? WHERE id = ? AND user_id = ?', 
-                      (new_status, task_id, user_id))
+        cursor.row_factory = task_row_factory
+        cursor.execute('''
+            UPDATE tasks SET is_mandatory = NOT is_mandatory, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND user_id = ?
+        ''' + TASK_RETURNING, (task_id, user_id))
+        task = cursor.fetchone()
         conn.commit()
         
-        print(f"✅ Статус обязательности задачи {task_id} изменен с {current_status} на {new_status}")
-        return new_status  # Всегда возвращаем НОВЫЙ статус (True или False)
+        if task is None:
+            logger.debug("Задача %s не найдена для пользователя %s", task_id, user_id)
+            return None
         
+        _notify_tasks_changed(user_id, [task.task_date], [task.id])
+        logger.debug("Статус обязательности задачи %s изменен на %s", task_id, task.is_mandatory)
+        return task
     except Exception as e:
-        print(f"❌ Ошибка при изменении статуса обязательности: {e}")
-        return None  # Возвращаем None при ошибке
-        
+        conn.rollback()
+        logger.error("Ошибка при изменении статуса обязательности: %s", e)
+        return None
     finally:
-        conn.close()
+        cursor.close()
 
-# ========== ФУНКЦИИ ДЛЯ РАБОТЫ С КАТЕГОРИЯМИ ==========
+# ========== МАССОВЫЕ ОПЕРАЦИИ С ЗАДАЧАМИ ==========
 
-def get_categories(user_id):
-    """Получение всех категорий пользователя"""
-    conn = sqlite3.connect(get_db_path())
+# Поля, которые можно менять у набора задач через bulk_update_tasks
+BULK_UPDATE_FIELDS = ('done', 'priority', 'is_mandatory', 'category_id')
+
+# Список id передается одним JSON-параметром и разворачивается json_each:
+# один запрос на любое число задач без сборки "IN (?, ?, ...)"
+_TASK_IDS_FILTER = 'user_id = ? AND id IN (SELECT value FROM json_each(?))'
+
+def _task_ids_param(task_ids):
+    """Список id задач в виде JSON-массива для json_each"""
+    return json.dumps([int(task_id) for task_id in task_ids])
+
+def bulk_update_tasks(user_id, task_ids, **fields):
+    """Изменение полей у набора задач одним UPDATE в одной транзакции.
+
+    fields - значения из BULK_UPDATE_FIELDS (category_id=None снимает
+    категорию). Возвращает число измененных задач или None при ошибке.
+    """
+    unknown = set(fields) - set(BULK_UPDATE_FIELDS)
+    if unknown:
+        raise ValueError(f"Поля нельзя менять массово: {', '.join(sorted(unknown))}")
+    if not task_ids or not fields:
+        return 0
+    
+    conn = get_connection()
     cursor = conn.cursor()
     
+    ids, occurrence_ids = _split_task_ids(task_ids)
+    
     try:
-        cursor.execute('SELECT id, name, color FROM categories WHERE user_id = ? ORDER BY name', (user_id,))
-        categories = cursor.fetchall()
-        return [{'id': cat[0], 'name': cat[1], 'color': cat[2]} for cat in categories]
+        dates = []
+        if ids:
+            updates = [f"{name} = ?" for name in fields]
+            updates.append("updated_at = CURRENT_TIMESTAMP")
+            cursor.execute(f'''
+                UPDATE tasks SET {', '.join(updates)}
+                WHERE {_TASK_IDS_FILTER}
+                RETURNING task_date
+            ''', (*fields.values(), user_id, _task_ids_param(ids)))
+            dates = [row[0] for row in cursor.fetchall()]
+        # У повторений изменения сохраняются для каждого дня отдельно;
+        # category_id=None передан явно - категория снимается и у них
+        override_fields = {name: value for name, value in fields.items() if value is not None}
+        if 'category_id' in fields and fields['category_id'] is None:
+            override_fields['category_id'] = NO_CATEGORY
+        for recurrence_id, day in occurrence_ids:
+            if override_fields and _save_override(cursor, user_id, recurrence_id, day, **override_fields):
+                dates.append(day)
+        conn.commit()
+        
+        if dates:
+            _notify_tasks_changed(user_id, sorted(set(dates)), list(task_ids))
+        logger.debug("Массово изменено задач: %s (%s)", len(dates), fields)
+        return len(dates)
     except Exception as e:
-        print(f"Ошибка при получении категорий: {e}")
-        return []
+        conn.rollback()
+        logger.error("Ошибка при массовом изменении задач: %s", e)
+        return None
     finally:
-        conn.close()
+        cursor.close()
 
-def add_category(name, user_id, color='#007acc'):
-    """Добавление категории"""
-    conn = sqlite3.connect(get_db_path())
+def bulk_move_tasks(user_id, task_ids, new_date):
+    """Перенос набора задач на другую дату в одной транзакции.
+
+    Возвращает число перенесенных задач или None при ошибке.
+    """
+    if not task_ids:
+        return 0
+    
+    new_date = _date_str(new_date)
+    ids, occurrence_ids = _split_task_ids(task_ids)
+    # Перенесенные повторения становятся обычными задачами
+    detached = [task for task in (get_occurrence(user_id, occurrence_id(*parsed)) for parsed in occurrence_ids)
+                if task is not None and task.task_date != new_date]
+    
+    conn = get_connection()
     cursor = conn.cursor()
+    ids_param = _task_ids_param(ids)
     
     try:
-        cursor.execute('INSERT INTO categories (user_id, name, color) VALUES (?, ?, ?)', 
-                      (user_id, name, color))
+        # Старые даты нужны кэшам, а RETURNING отдает только новые значения
+        cursor.execute(f'SELECT DISTINCT task_date FROM tasks WHERE {_TASK_IDS_FILTER}', (user_id, ids_param))
+        dates = {row[0] for row in cursor.fetchall()}
+        cursor.execute(f'''
+            UPDATE tasks SET task_date = ?, day_num = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE {_TASK_IDS_FILTER}
+        ''', (new_date, to_day_num(new_date), user_id, ids_param))
+        moved = cursor.rowcount
+        changed_ids = list(task_ids)
+        for task in detached:
+            changed_ids.append(_detach_occurrence(cursor, task, new_date))
+            dates.add(task.task_date)
+        moved += len(detached)
         conn.commit()
-        return cursor.lastrowid
-    except sqlite3.IntegrityError:
-        return None  # Категория с таким именем уже существует
+        
+        if moved:
+            dates.add(new_date)
+            _notify_tasks_changed(user_id, sorted(dates), changed_ids)
+        logger.debug("Перенесено задач на %s: %s", new_date, moved)
+        return moved
     except Exception as e:
-        print(f"Ошибка при добавлении категории: {e}")
+        conn.rollback()
+        logger.error("Ошибка при переносе задач: %s", e)
         return None
     finally:
-        conn.close()
+        cursor.close()
 
-def update_category(category_id, user_id, name, color):
-    """Обновление категории"""
-    conn = sqlite3.connect(get_db_path())
+def bulk_delete_tasks(user_id, task_ids):
+    """Удаление набора задач одним DELETE в одной транзакции.
+
+    Возвращает число удаленных задач или None при ошибке.
+    """
+    if not task_ids:
+        return 0
+    
+    conn = get_connection()
     cursor = conn.cursor()
     
+    ids, occurrence_ids = _split_task_ids(task_ids)
+    
     try:
-        cursor.execute('''
-            UPDATE categories 
-            SET name = ?, color = ? 
-            WHERE id = ? AND user_id = ?
-        ''', (name, color, category_id, user_id))
+        cursor.execute(f'DELETE FROM tasks WHERE {_TASK_IDS_FILTER} RETURNING task_date',
+                       (user_id, _task_ids_param(ids)))
+        dates = [row[0] for row in cursor.fetchall()]
+        for recurrence_id, day in occurrence_ids:
+            if _save_override(cursor, user_id, recurrence_id, day, skipped=True):
+                dates.append(day)
         conn.commit()
-        return cursor.rowcount > 0
+        
+        if dates:
+            _notify_tasks_changed(user_id, sorted(set(dates)), list(task_ids))
+        logger.debug("Массово удалено задач: %s", len(dates))
+        return len(dates)
     except Exception as e:
-        print(f"Ошибка при обновлении категории: {e}")
-        return False
+        conn.rollback()
+        logger.error("Ошибка при массовом удалении задач: %s", e)
+        return None
     finally:
-        conn.close()
+        cursor.close()
+
+# ========== ПОВТОРЯЮЩИЕСЯ ЗАДАЧИ ==========
+
+# Вхождение повторяющейся задачи приходит в списках задач как Task с id
+# вида 'r<id правила>:yyyy-MM-dd'. Функции изменения задач узнают такие id
+# и сохраняют изменение одного дня в recurrence_overrides, правило не меняется.
+_OCCURRENCE_ID_RE = re.compile(r'^r(\d+):(\d{4}-\d{2}-\d{2})$')
+
+# Поля, которые можно изменить у отдельного вхождения (порядок - как в
+# выборке recurrence_overrides в _load_occurrences)
+OCCURRENCE_FIELDS = ('title', 'description', 'priority', 'is_mandatory', 'done', 'category_id',
+                     'due_time', 'remind_before')
+
+# NULL в recurrence_overrides значит "как в правиле", поэтому снятая у
+# вхождения категория хранится этим значением (как NO_TIME и NO_REMINDER)
+NO_CATEGORY = 0
+
+_RECURRENCE_COLUMNS = '''
+    id, user_id, title, description, priority, is_mandatory, category_id,
+    created_at, updated_at, freq, interval, weekdays, start_day, until_day, count,
+    due_time, remind_before
+'''
+
+def occurrence_id(recurrence_id, day):
+    """id вхождения правила recurrence_id в день day"""
+    return f"r{recurrence_id}:{_date_str(day)}"
+
+def parse_occurrence_id(task_id):
+    """(id правила, 'yyyy-MM-dd') для id вхождения или None для обычной задачи"""
+    if not isinstance(task_id, str):
+        return None
+    match = _OCCURRENCE_ID_RE.match(task_id)
+    if match is None:
+        return None
+    return int(match.group(1)), match.group(2)
+
+def _split_task_ids(task_ids):
+    """Разделение id на обычные задачи и вхождения повторяющихся"""
+    ids, occurrence_ids = [], []
+    for task_id in task_ids:
+        parsed = parse_occurrence_id(task_id)
+        if parsed is None:
+            ids.append(task_id)
+        else:
+            occurrence_ids.append(parsed)
+    return ids, occurrence_ids
+
+def _day_date(day_num):
+    """datetime.date по номеру дня"""
+    return date.fromordinal(day_num - JULIAN_DAY_OFFSET)
+
+def _recurrence_rule(row):
+    """Rule по строке recurrences (_RECURRENCE_COLUMNS)"""
+    freq, interval, weekdays, start_day, until_day = row[9:14]
+    return Rule(freq, _day_date(start_day), interval, weekdays,
+                _day_date(until_day) if until_day is not None else None)
+
+def _occurrence_task(row, day, override, categories):
+    """Task для вхождения правила row в день day с изменениями override"""
+    values = dict(zip(('title', 'description', 'priority', 'is_mandatory', 'category_id'), row[2:7]), done=False,
+                  due_time=row[15], remind_before=row[16])
+    updated_at = row[8]
+    if override is not None:
+        for name, value in zip(OCCURRENCE_FIELDS, override):
+            if value is not None:
+                values[name] = value
+        updated_at = override[-1]
+    if values['category_id'] == NO_CATEGORY:
+        values['category_id'] = None
+    category_name, category_color = categories.get(values['category_id'], (None, None))
+    # NO_TIME и NO_REMINDER в override снимают время и напоминание правила
+    remind_before = values['remind_before'] if values['remind_before'] != NO_REMINDER else None
+    return Task(occurrence_id(row[0], day), row[1], values['title'], day, values['description'],
+                values['priority'], values['is_mandatory'], values['done'], values['category_id'],
+                row[7], updated_at, category_name, category_color, values['due_time'] or None, remind_before)
+
+def _load_occurrences(user_id, first_num, last_num, recurrence_id=None):
+    """Вхождения повторяющихся задач в днях first_num..last_num.
+
+    Правила разворачиваются только на этот период. Возвращает словарь
+    'yyyy-MM-dd' -> список Task; дни без вхождений в нем отсутствуют.
+    """
+    cursor = get_connection().cursor()
+
+    try:
+        query = f'''
+            SELECT {_RECURRENCE_COLUMNS} FROM recurrences
+            WHERE user_id = ? AND start_day <= ? AND (until_day IS NULL OR until_day >= ?)
+        '''
+        params = [user_id, last_num, first_num]
+        if recurrence_id is not None:
+            query += ' AND id = ?'
+            params.append(recurrence_id)
+        cursor.execute(query, params)
+        rules = cursor.fetchall()
+        if not rules:
+            return {}
+
+        cursor.execute('''
+            SELECT o.recurrence_id, o.day_num, o.skipped,
+                   o.title, o.description, o.priority, o.is_mandatory, o.done, o.category_id,
+                   o.due_time, o.remind_before, o.updated_at
+            FROM recurrence_overrides o JOIN recurrences r ON r.id = o.recurrence_id
+            WHERE r.user_id = ? AND o.day_num BETWEEN ? AND ?
+        ''', (user_id, first_num, last_num))
+        overrides = {(row[0], row[1]): row[2:] for row in cursor.fetchall()}
+        cursor.execute('SELECT id, name, color FROM categories WHERE user_id = ?', (user_id,))
+        categories = {row[0]: row[1:] for row in cursor.fetchall()}
+
+        first, last = _day_date(first_num), _day_date(last_num)
+        by_day = {}
+        for row in rules:
+            for day in occurrences(_recurrence_rule(row), first, last):
+                override = overrides.get((row[0], day.toordinal() + JULIAN_DAY_OFFSET))
+                if override is not None and override[0]:
+                    continue
+                day_str = day.isoformat()
+                by_day.setdefault(day_str, []).append(
+                    _occurrence_task(row, day_str, override and override[1:], categories))
+        return by_day
+    finally:
+        cursor.close()
+
+def _task_day_key(task):
+    """Ключ сортировки задач внутри дня (как TASK_DAY_ORDER)"""
+    return (task.done, not task.is_mandatory, -(task.priority or 0), task.created_at or '')
+
+def _with_occurrences(tasks, day_occurrences):
+    """Задачи дня вместе с вхождениями повторяющихся задач"""
+    if not day_occurrences:
+        return tasks
+    return sorted([*tasks, *day_occurrences], key=_task_day_key)
+
+def get_occurrence(user_id, task_id):
+    """Вхождение повторяющейся задачи по id вида 'r<id>:yyyy-MM-dd' или None"""
+    parsed = parse_occurrence_id(task_id)
+    if parsed is None:
+        return None
+    recurrence_id, day = parsed
+    day_num = to_day_num(day)
+    try:
+        tasks = _load_occurrences(user_id, day_num, day_num, recurrence_id).get(day)
+    except Exception as e:
+        logger.error("Ошибка при получении повторяющейся задачи: %s", e)
+        return None
+    return tasks[0] if tasks else None
+
+def _save_override(cursor, user_id, recurrence_id, day, **fields):
+    """Запись изменений одного дня правила (upsert в recurrence_overrides).
+
+    Возвращает False, если правило не принадлежит пользователю.
+    """
+    columns = list(fields)
+    cursor.execute(f'''
+        INSERT INTO recurrence_overrides (recurrence_id, day_num, {', '.join(columns)})
+        SELECT ?, ?, {', '.join('?' for _ in columns)}
+        WHERE EXISTS (SELECT 1 FROM recurrences WHERE id = ? AND user_id = ?)
+        ON CONFLICT (recurrence_id, day_num) DO UPDATE SET
+            {', '.join(f'{name} = excluded.{name}' for name in columns)},
+            updated_at = CURRENT_TIMESTAMP
+    ''', (recurrence_id, to_day_num(day), *fields.values(), recurrence_id, user_id))
+    return cursor.rowcount > 0
+
+def _detach_occurrence(cursor, task, new_date):
+    """Перенос вхождения на другую дату: день правила пропускается, а на
+    новую дату создается обычная задача. Возвращает id задачи.
+    """
+    recurrence_id, day = parse_occurrence_id(task.id)
+    _save_override(cursor, task.user_id, recurrence_id, day, skipped=True)
+    cursor.execute('''
+        INSERT INTO tasks (user_id, title, task_date, day_num, description, category_id, priority, is_mandatory, done,
+                           due_time, remind_before)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (task.user_id, task.title, _date_str(new_date), to_day_num(new_date), task.description,
+          task.category_id, task.priority, task.is_mandatory, task.done, task.due_time, task.remind_before))
+    return cursor.lastrowid
+
+def update_occurrence(user_id, task_id, task_date=None, **fields):
+    """Изменение одного вхождения повторяющейся задачи.
+
+    Поля из OCCURRENCE_FIELDS (None - без изменений) сохраняются только для
+    этого дня. Перенос на другую дату (task_date) отделяет вхождение от
+    правила: оно становится обычной задачей. Возвращает обновленную задачу
+    (Task) или None, если вхождение не найдено или произошла ошибка.
+    """
+    unknown = set(fields) - set(OCCURRENCE_FIELDS)
+    if unknown:
+        raise ValueError(f"Поля нельзя менять у повторения: {', '.join(sorted(unknown))}")
+    fields = {name: value for name, value in fields.items() if value is not None}
+    if 'due_time' in fields and fields['due_time'] != NO_TIME:
+        _due_time_value(fields['due_time'])
+    if 'remind_before' in fields and fields['remind_before'] != NO_REMINDER:
+        _remind_before_value(fields['remind_before'])
+
+    task = get_occurrence(user_id, task_id)
+    if task is None:
+        logger.debug("Повторение %s не найдено для пользователя %s", task_id, user_id)
+        return None
+    recurrence_id, day = parse_occurrence_id(task_id)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        if task_date is not None and _date_str(task_date) != day:
+            new_date = _date_str(task_date)
+            for name, value in fields.items():
+                setattr(task, name, value)
+            task.due_time = task.due_time or None
+            if task.remind_before == NO_REMINDER:
+                task.remind_before = None
+            new_id = _detach_occurrence(cursor, task, new_date)
+            conn.commit()
+            _notify_tasks_changed(user_id, sorted({day, new_date}), [task_id, new_id])
+            logger.debug("Повторение %s перенесено на %s (задача %s)", task_id, new_date, new_id)
+            return get_task(new_id, user_id)
+
+        if fields:
+            _save_override(cursor, user_id, recurrence_id, day, **fields)
+            conn.commit()
+            _notify_tasks_changed(user_id, [day], [task_id])
+            logger.debug("Повторение %s изменено: %s", task_id, fields)
+        return get_occurrence(user_id, task_id)
+    except Exception as e:
+        conn.rollback()
+        logger.error("Ошибка при изменении повторения: %s", e)
+        return None
+    finally:
+        cursor.close()
+
+def skip_occurrence(user_id, task_id):
+    """Удаление одного вхождения повторяющейся задачи (остальные дни остаются)"""
+    parsed = parse_occurrence_id(task_id)
+    if parsed is None:
+        return False
+    recurrence_id, day = parsed
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        skipped = _save_override(cursor, user_id, recurrence_id, day, skipped=True)
+        conn.commit()
+        if skipped:
+            _notify_tasks_changed(user_id, [day], [task_id])
+            logger.debug("Повторение %s удалено пользователем %s", task_id, user_id)
+        return skipped
+    except Exception as e:
+        conn.rollback()
+        logger.error("Ошибка при удалении повторения: %s", e)
+        return False
+    finally:
+        cursor.close()
+
+def add_recurrence(user_id, title, start_date, freq, interval=1, weekdays=(), until=None, count=None,
+                   description="", category_id=None, priority=1, is_mandatory=False,
+                   due_time=None, remind_before=None):
+    """Создание повторяющейся задачи.
+
+    freq - 'daily', 'weekly' или 'monthly'; weekdays - дни недели
+    (0 - понедельник) для еженедельных; until - последняя дата, count -
+    число повторений. Некорректное правило - ValueError. Возвращает id
+    правила или None при ошибке записи.
+    """
+    due_time = _due_time_value(due_time) if due_time is not None else None
+    remind_before = _remind_before_value(remind_before) if remind_before is not None else None
+    until = _day_date(to_day_num(until)) if until is not None else None
+    rule = Rule(freq, _day_date(to_day_num(start_date)), interval, weekdays_mask(weekdays), until)
+    if count:
+        # "N раз" сводится к дате последнего повторения: при чтении
+        # правило разворачивается только на запрошенный период
+        last = last_occurrence(rule, count)
+        rule.until = last if rule.until is None else min(rule.until, last)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute('''
+            INSERT INTO recurrences (user_id, title, description, priority, is_mandatory, category_id,
+                                     freq, interval, weekdays, start_day, until_day, count,
+                                     due_time, remind_before)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, title, description, priority, is_mandatory, category_id,
+              rule.freq, rule.interval, rule.weekdays, to_day_num(rule.start),
+              to_day_num(rule.until) if rule.until is not None else None, count,
+              due_time, remind_before))
+        recurrence_id = cursor.lastrowid
+        conn.commit()
+        _notify_tasks_changed(user_id)
+        logger.debug("Повторяющаяся задача %s: %s", recurrence_id, describe(rule))
+        return recurrence_id
+    except Exception as e:
+        conn.rollback()
+        logger.error("Ошибка при добавлении повторяющейся задачи: %s", e)
+        return None
+    finally:
+        cursor.close()
+
+def get_recurrences(user_id):
+    """Правила повторения пользователя (словари с текстовым описанием 'text')"""
+    cursor = get_connection().cursor()
+
+    try:
+        cursor.execute(f'SELECT {_RECURRENCE_COLUMNS} FROM recurrences WHERE user_id = ? ORDER BY start_day, id',
+                       (user_id,))
+        recurrences = []
+        for row in cursor.fetchall():
+            rule = _recurrence_rule(row)
+            recurrences.append({
+                'id': row[0],
+                'title': row[2],
+                'description': row[3],
+                'priority': row[4],
+                'is_mandatory': bool(row[5]),
+                'category_id': row[6],
+                'freq': rule.freq,
+                'interval': rule.interval,
+                'weekdays': mask_weekdays(rule.weekdays),
+                'start_date': rule.start.isoformat(),
+                'until_date': rule.until.isoformat() if rule.until else None,
+                'count': row[14],
+                'due_time': row[15],
+                'remind_before': row[16],
+                'text': describe(rule)
+            })
+        return recurrences
+    except Exception as e:
+        logger.error("Ошибка при получении повторяющихся задач: %s", e)
+        return []
+    finally:
+        cursor.close()
+
+def end_recurrence(user_id, recurrence_id, from_date):
+    """Прекращение повторения начиная с даты from_date (более ранние дни остаются)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    from_num = to_day_num(from_date)
+
+    try:
+        cursor.execute('''
+            UPDATE recurrences SET until_day = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND user_id = ? AND (until_day IS NULL OR until_day >= ?)
+        ''', (from_num - 1, recurrence_id, user_id, from_num))
+        ended = cursor.rowcount > 0
+        if ended:
+            cursor.execute('DELETE FROM recurrence_overrides WHERE recurrence_id = ? AND day_num >= ?',
+                           (recurrence_id, from_num))
+        conn.commit()
+        if ended:
+            _notify_tasks_changed(user_id)
+        return ended
+    except Exception as e:
+        conn.rollback()
+        logger.error("Ошибка при завершении повторения: %s", e)
+        return False
+    finally:
+        cursor.close()
+
+def delete_recurrence(user_id, recurrence_id):
+    """Удаление повторяющейся задачи вместе со всеми ее повторениями"""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute('DELETE FROM recurrences WHERE id = ? AND user_id = ?', (recurrence_id, user_id))
+        deleted = cursor.rowcount > 0
+        if deleted:
+            cursor.execute('DELETE FROM recurrence_overrides WHERE recurrence_id = ?', (recurrence_id,))
+        conn.commit()
+        if deleted:
+            _notify_tasks_changed(user_id)
+        return deleted
+    except Exception as e:
+        conn.rollback()
+        logger.error("Ошибка при удалении повторяющейся задачи: %s", e)
+        return False
+    finally:
+        cursor.close()
+
+# ========== НАПОМИНАНИЯ ==========
+
+# Время задачи без due_time, если у нее есть напоминание
+DEFAULT_DUE_TIME = '09:00'
+
+def reminder_time(task):
+    """Момент напоминания о задаче (datetime) или None, если напоминания нет"""
+    if task.remind_before is None:
+        return None
+    due = datetime.fromisoformat(f"{task.task_date} {task.due_time or DEFAULT_DUE_TIME}")
+    return due - timedelta(minutes=task.remind_before)
+
+def get_reminders(user_id, start_date, end_date):
+    """Напоминания о невыполненных задачах на даты start_date..end_date.
+
+    Читает только частичный индекс idx_tasks_reminders и вхождения
+    повторяющихся задач за этот период. Возвращает список
+    (момент напоминания, Task), отсортированный по времени.
+    """
+    cursor = get_connection().cursor()
+
+    try:
+        first_num, last_num = to_day_num(start_date), to_day_num(end_date)
+        cursor.row_factory = task_row_factory
+        cursor.execute(_TASK_COLUMNS + 'FROM tasks t INDEXED BY idx_tasks_reminders' + _CATEGORY_JOIN + '''
+            WHERE t.user_id = ? AND t.remind_before IS NOT NULL AND NOT t.done
+              AND t.day_num BETWEEN ? AND ?
+        ''', (user_id, first_num, last_num))
+        tasks = cursor.fetchall()
+
+        for day_occurrences in _load_occurrences(user_id, first_num, last_num).values():
+            tasks.extend(task for task in day_occurrences if task.remind_before is not None and not task.done)
+
+        reminders = [(reminder_time(task), task) for task in tasks]
+        reminders.sort(key=lambda reminder: reminder[0])
+        return reminders
+    except Exception as e:
+        logger.error("Ошибка при получении напоминаний: %s", e)
+        return []
+    finally:
+        cursor.close()
+
+def get_reminders_by_ids(user_id, task_ids):
+    """Напоминания о невыполненных задачах из task_ids (id задач и вхождений).
+
+    Для точечного обновления планировщика после изменения задач: читаются
+    только эти строки. Задачи без напоминания, выполненные и удаленные в
+    результат не попадают. Возвращает список (момент напоминания, Task)
+    или None при ошибке.
+    """
+    ids, occurrence_ids = _split_task_ids(task_ids)
+    cursor = get_connection().cursor()
+
+    try:
+        tasks = []
+        if ids:
+            cursor.row_factory = task_row_factory
+            cursor.execute(TASK_SELECT + '''
+                WHERE t.user_id = ? AND t.id IN (SELECT value FROM json_each(?))
+                  AND t.remind_before IS NOT NULL AND NOT t.done
+            ''', (user_id, _task_ids_param(ids)))
+            tasks = cursor.fetchall()
+        for parsed in occurrence_ids:
+            task = get_occurrence(user_id, occurrence_id(*parsed))
+            if task is not None and task.remind_before is not None and not task.done:
+                tasks.append(task)
+        return [(reminder_time(task), task) for task in tasks]
+    except Exception as e:
+        logger.error("Ошибка при получении напоминаний задач: %s", e)
+        return None
+    finally:
+        cursor.close()
+
+# ========== ФУНКЦИИ ДЛЯ РАБОТЫ С КАТЕГОРИЯМИ ==========
+
+def get_categories(user_id):
+    """Получение всех категорий пользователя"""
+    cursor = get_connection().cursor()
+    
+    try:
+        cursor.execute('SELECT id, name, color FROM categories WHERE user_id = ? ORDER BY name', (user_id,))
+        categories = cursor.fetchall()
+        return [{'id': cat[0], 'name': cat[1], 'color': cat[2]} for cat in categories]
+    except Exception as e:
+        logger.error("Ошибка при получении категорий: %s", e)
+        return []
+    finally:
+        cursor.close()
+
+def add_category(name, user_id, color='#007acc'):
+    """Добавление категории"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('INSERT INTO categories (user_id, name, color) VALUES (?, ?, ?)', 
+                      (user_id, name, color))
+        conn.commit()
+        return cursor.lastrowid
+    except sqlite3.IntegrityError:
+        conn.rollback()
+        return None  # Категория с таким именем уже существует
+    except Exception as e:
+        conn.rollback()
+        logger.error("Ошибка при добавлении категории: %s", e)
+        return None
+    finally:
+        cursor.close()
+
+def update_category(category_id, user_id, name, color):
+    """Обновление категории"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            UPDATE categories 
+            SET name = ?, color = ? 
+            WHERE id = ? AND user_id = ?
+        ''', (name, color, category_id, user_id))
+        conn.commit()
+        updated = cursor.rowcount > 0
+        if updated:
+            # Название и цвет категории входят в загруженные задачи
+            _notify_tasks_changed(user_id)
+        return updated
+    except Exception as e:
+        conn.rollback()
+        logger.error("Ошибка при обновлении категории: %s", e)
+        return False
+    finally:
+        cursor.close()
 
 def delete_category(category_id, user_id):
     """Удаление категории"""
-    conn = sqlite3.connect(get_db_path())
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
         # Сначала обнуляем category_id у задач пользователя
-        cursor.execute('UPDATE tasks SET category_id = NULL WHERE category_id = ? AND user_id = ?', 
-                      (category_id, user_id))
+        cursor.execute('''
+            UPDATE tasks SET category_id = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE category_id = ? AND user_id = ?
+            RETURNING task_date
+        ''', (category_id, user_id))
+        dates = sorted({row[0] for row in cursor.fetchall()})
+        # То же у повторяющихся задач
+        cursor.execute('''
+            UPDATE recurrences SET category_id = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE category_id = ? AND user_id = ?
+        ''', (category_id, user_id))
+        recurrences_changed = cursor.rowcount > 0
+        cursor.execute('''
+            UPDATE recurrence_overrides SET category_id = NULL
+            WHERE category_id = ? AND recurrence_id IN (SELECT id FROM recurrences WHERE user_id = ?)
+        ''', (category_id, user_id))
+        recurrences_changed = recurrences_changed or cursor.rowcount > 0
         # Удаляем категорию
         cursor.execute('DELETE FROM categories WHERE id = ? AND user_id = ?', (category_id, user_id))
         conn.commit()
+        if recurrences_changed:
+            _notify_tasks_changed(user_id)
+        elif dates:
+            _notify_tasks_changed(user_id, dates)
         return cursor.rowcount > 0
     except Exception as e:
-        print(f"Ошибка при удалении категории: {e}")
+        conn.rollback()
+        logger.error("Ошибка при удалении категории: %s", e)
         return False
     finally:
-        conn.close()
+        cursor.close()
+
+# ========== ПОИСК ==========
+
+SEARCH_LIMIT = 50
+
+# Поля результата поиска
+SEARCH_FIELDS = ('id', 'title', 'task_date', 'done', 'snippet')
+
+def _search_available(cursor):
+    """Есть ли в базе FTS5-индекс задач"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'")
+    return cursor.fetchone() is not None
+
+def _fts_query(query):
+    """Запрос пользователя -> выражение FTS5.
+
+    Каждое слово ищется как префикс ("молок"*), все слова должны
+    встретиться. Спецсимволы синтаксиса FTS5 отбрасываются.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+def search_tasks(user_id, query, limit=SEARCH_LIMIT):
+    """Поиск задач пользователя по названию и описанию.
+
+    Результаты упорядочены по релевантности (bm25, совпадение в названии
+    весит больше), snippet - фрагмент текста с найденными словами в «».
+    Возвращает список словарей с полями SEARCH_FIELDS.
+    """
+    fts_query = _fts_query(query)
+    if not fts_query:
+        return []
+
+    cursor = get_connection().cursor()
+    try:
+        if _search_available(cursor):
+            cursor.execute('''
+                SELECT t.id, t.title, t.task_date, t.done,
+                       snippet(tasks_fts, -1, '«', '»', '…', 12)
+                FROM tasks_fts
+                JOIN tasks t ON t.id = tasks_fts.rowid
+                WHERE tasks_fts MATCH ? AND t.user_id = ?
+                ORDER BY bm25(tasks_fts, 10.0, 1.0)
+                LIMIT ?
+            ''', (fts_query, user_id, limit))
+        else:
+            pattern = f'%{query.strip()}%'
+            cursor.execute('''
+                SELECT id, title, task_date, done, title
+                FROM tasks
+                WHERE user_id = ? AND (title LIKE ? OR description LIKE ?)
+                ORDER BY task_date DESC
+                LIMIT ?
+            ''', (user_id, pattern, pattern, limit))
+
+        results = []
+        for row in cursor.fetchall():
+            result = dict(zip(SEARCH_FIELDS, row))
+            result['done'] = bool(result['done'])
+            results.append(result)
+        return results
+    except Exception as e:
+        logger.error("Ошибка поиска задач: %s", e)
+        return []
+    finally:
+        cursor.close()
 
 # ========== СТАТИСТИКА И ОТЧЕТЫ ==========
 
+# Кэш статистики: user_id -> (дата, поколение, статистика). Сбрасывается
+# при любой записи в tasks через _notify_tasks_changed, а также со сменой дня.
+_stats_cache = {}
+_stats_generation = 0
+
+# Подписчики на изменения задач: callback(user_id, dates, task_ids)
+_tasks_changed_listeners = []
+
+def add_tasks_changed_listener(callback):
+    """Подписка на закоммиченные изменения задач.
+
+    callback(user_id, dates, task_ids) вызывается в потоке, сделавшем
+    запись; dates - список затронутых дат 'yyyy-MM-dd' или None (все
+    даты), task_ids - id измененных, добавленных и удаленных задач (и
+    вхождений повторяющихся) или None, если менялось неизвестно что
+    (импорт, очистка, изменение правила повторения).
+    """
+    if callback not in _tasks_changed_listeners:
+        _tasks_changed_listeners.append(callback)
+
+def remove_tasks_changed_listener(callback):
+    """Отписка от изменений задач"""
+    if callback in _tasks_changed_listeners:
+        _tasks_changed_listeners.remove(callback)
+
+def _notify_tasks_changed(user_id, dates=None, task_ids=None):
+    """Уведомление о закоммиченном изменении задач пользователя.
+
+    dates - затронутые даты 'yyyy-MM-dd' или None, если неизвестно какие;
+    task_ids - id затронутых задач или None.
+    """
+    global _stats_generation
+    _stats_generation += 1
+    _stats_cache.pop(user_id, None)
+
+    for callback in list(_tasks_changed_listeners):
+        try:
+            callback(user_id, dates, task_ids)
+        except Exception as e:
+            logger.error("Ошибка в обработчике изменения задач: %s", e)
+
+def _copy_stats(stats):
+    """Копия статистики, чтобы вызывающий код не испортил кэш"""
+    return dict(stats, priority_stats=dict(stats['priority_stats']))
+
 def get_task_stats(user_id):
     """Получение статистики по задачам пользователя"""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    today = datetime.now().strftime('%Y-%m-%d')
+    today_num = to_day_num(today)
+    cached = _stats_cache.get(user_id)
+    if cached and cached[0] == today:
+        return _copy_stats(cached[2])
+    
+    generation = _stats_generation
+    cursor = get_connection().cursor()
     
     try:
-        # Общее количество задач
-        cursor.execute('SELECT COUNT(*) FROM tasks WHERE user_id = ?', (user_id,))
-        total_tasks = cursor.fetchone()[0]
-        
-        # Выполненные задачи
-        cursor.execute('SELECT COUNT(*) FROM tasks WHERE user_id = ? AND done = 1', (user_id,))
-        completed_tasks = cursor.fetchone()[0]
-        
-        # Задачи на сегодня
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute('SELECT COUNT(*) FROM tasks WHERE user_id = ? AND task_date = ?', (user_id, today))
-        today_tasks = cursor.fetchone()[0]
-        
-        # Просроченные задачи
-        cursor.execute('SELECT COUNT(*) FROM tasks WHERE user_id = ? AND task_date < ? AND done = 0', 
-                      (user_id, today))
-        overdue_tasks = cursor.fetchone()[0]
+        # Один проход по задачам пользователя: счетчики считаются условными
+        # суммами в разрезе приоритета и складываются здесь
+        cursor.execute('''
+            SELECT priority,
+                   COUNT(*),
+                   SUM(done),
+                   SUM(day_num = ?),
+                   SUM(day_num < ? AND NOT done)
+            FROM tasks
+            WHERE user_id = ?
+            GROUP BY priority
+        ''', (today_num, today_num, user_id))
         
-        # Задачи по приоритетам
-        cursor.execute('SELECT priority, COUNT(*) FROM tasks WHERE user_id = ? GROUP BY priority', (user_id,))
-        priority_stats = cursor.fetchall()
+        total_tasks = completed_tasks = today_tasks = overdue_tasks = 0
+        priority_stats = {}
+        for priority, count, completed, for_today, overdue in cursor.fetchall():
+            total_tasks += count
+            completed_tasks += completed
+            today_tasks += for_today
+            overdue_tasks += overdue
+            priority_stats[priority] = count
         
-        return {
+        stats = {
             'total': total_tasks,
             'completed': completed_tasks,
             'today': today_tasks,
             'overdue': overdue_tasks,
             'completion_rate': (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0,
-            'priority_stats': {priority: count for priority, count in priority_stats}
+            'priority_stats': priority_stats
         }
+        
+        # Если пока шел запрос задачи изменились, результат уже устарел
+        if generation == _stats_generation:
+            _stats_cache[user_id] = (today, generation, stats)
+        return _copy_stats(stats)
     except Exception as e:
-        print(f"Ошибка при получении статистики: {e}")
+        logger.error("Ошибка при получении статистики: %s", e)
         return {'total': 0, 'completed': 0, 'today': 0, 'overdue': 0, 'completion_rate': 0, 'priority_stats': {}}
     finally:
-        conn.close()
+        cursor.close()
 
 # ========== ЭКСПОРТ И ИМПОРТ ==========
 
+# Поля задачи в файле экспорта (название и цвет категории лежат в 'categories')
+EXPORT_TASK_FIELDS = (
+    'id', 'user_id', 'title', 'task_date', 'description', 'priority',
+    'is_mandatory', 'done', 'category_id', 'created_at', 'updated_at',
+    'due_time', 'remind_before'
+)
+
+# Сколько строк читается из курсора за раз при потоковом экспорте
+EXPORT_CHUNK_SIZE = 500
+
+# Сжатие файлов по расширению: .json.gz - gzip, .json.xz - lzma
+_BACKUP_OPENERS = {
+    '.gz': gzip.open,
+    '.xz': lzma.open,
+}
+
+def _backup_opener(file_path):
+    """Функция открытия файла с учетом сжатия по его расширению"""
+    return _BACKUP_OPENERS.get(os.path.splitext(file_path)[1], open)
+
+def _open_backup(file_path):
+    """Открытие JSON (в том числе сжатого) на чтение в текстовом режиме"""
+    return _backup_opener(file_path)(file_path, 'rt', encoding='utf-8')
+
+def _write_tasks_json(file_path, user_id, header=None, where='', params=()):
+    """Потоковая запись задач пользователя в JSON формата версии 2.0.
+
+    Задачи читаются из курсора порциями по EXPORT_CHUNK_SIZE и сразу
+    пишутся в файл, поэтому вся таблица в памяти не собирается. Файл
+    пишется во временный и подменяет старый только после успешной записи.
+    header - дополнительные поля заголовка, where/params - дополнительное
+    условие отбора задач. Возвращает число записанных задач.
+    """
+    categories = get_categories(user_id)
+    cursor = get_connection().cursor()
+    tmp_path = file_path + '.tmp'
+
+    try:
+        cursor.execute(f'''
+            SELECT {', '.join(EXPORT_TASK_FIELDS)}
+            FROM tasks
+            WHERE user_id = ? {where}
+            ORDER BY task_date
+        ''', (user_id, *params))
+
+        export_header = {
+            'export_date': datetime.now().isoformat(),
+            'user_id': user_id,
+            'version': '2.0',
+            'categories': categories,
+        }
+        export_header.update(header or {})
+
+        count = 0
+        # Сжатие выбирается по имени итогового файла, а не временного
+        with _backup_opener(file_path)(tmp_path, 'wt', encoding='utf-8') as f:
+            f.write('{\n')
+            for key, value in export_header.items():
+                f.write(f'  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n')
+
+            f.write('  "tasks": [')
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    task = dict(zip(EXPORT_TASK_FIELDS, row))
+                    task['is_mandatory'] = bool(task['is_mandatory'])
+                    task['done'] = bool(task['done'])
+                    f.write(',\n    ' if count else '\n    ')
+                    f.write(json.dumps(task, ensure_ascii=False))
+                    count += 1
+            f.write('\n  ],\n' if count else '],\n')
+
+            # Количество известно только после прохода по курсору
+            f.write(f'  "tasks_count": {count}\n}}\n')
+
+        os.replace(tmp_path, file_path)
+        return count
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        cursor.close()
+
 def export_tasks_to_json(user_id, filename=None):
     """Экспорт задач пользователя в JSON файл"""
     export_dir = "data/exports"
@@ -814,92 +1864,575 @@ def export_tasks_to_json(user_id, filename=None):
 
     file_path = os.path.join(export_dir, filename)
 
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    try:
+        count = _write_tasks_json(file_path, user_id)
+        logger.info("Задачи пользователя %s (%s) экспортированы в %s", user_id, count, file_path)
+        return True
+    except Exception as e:
+        logger.error("Ошибка при экспорте задач: %s", e)
+        return False
+
+# Сколько задач вставляется одним executemany
+IMPORT_BATCH_SIZE = 1000
 
+def _validate_import_record(record, category_map):
+    """Проверка задачи из файла импорта.
+
+    Возвращает кортеж значений для INSERT без user_id или None, если запись
+    непригодна (нет названия, неверная дата или приоритет).
+    """
+    if not isinstance(record, dict):
+        return None
+    
+    title = record.get('title')
+    if not isinstance(title, str) or not title.strip():
+        return None
+    
+    task_date = record.get('task_date')
     try:
-        cursor.execute('SELECT * FROM tasks WHERE user_id = ? ORDER BY task_date', (user_id,))
-        tasks = cursor.fetchall()
+        datetime.strptime(task_date, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+    
+    priority = record.get('priority', 1)
+    if priority not in (1, 2, 3):
+        return None
+    
+    description = record.get('description') or ''
+    if not isinstance(description, str):
+        return None
+    
+    # Время и напоминание необязательны (в старых файлах их нет)
+    due_time = record.get('due_time')
+    if not (isinstance(due_time, str) and _DUE_TIME_RE.match(due_time)):
+        due_time = None
+    remind_before = record.get('remind_before')
+    if not (isinstance(remind_before, int) and 0 <= remind_before <= MAX_REMIND_BEFORE):
+        remind_before = None
+    
+    return (
+        title.strip(), task_date, description, priority,
+        bool(record.get('is_mandatory', False)), bool(record.get('done', False)),
+        category_map.get(record.get('category_id')), due_time, remind_before
+    )
 
-        categories = get_categories(user_id)
+def _import_category_map(user_id, exported_categories):
+    """Соответствие id категорий из файла категориям пользователя (по названию)"""
+    own_by_name = {category['name']: category['id'] for category in get_categories(user_id)}
+    category_map = {}
+    for category in exported_categories or []:
+        if isinstance(category, dict) and category.get('name') in own_by_name:
+            category_map[category.get('id')] = own_by_name[category['name']]
+    return category_map
 
-        export_data = {
-            'export_date': datetime.now().isoformat(),
-            'user_id': user_id,
-            'version': '2.0',
-            'tasks_count': len(tasks),
-            'categories': categories,
-            'tasks': [{
-                'id': task[0], 'user_id': task[1], 'title': task[2],
-                'task_date': task[3], 'description': task[4], 'priority': task[5],
-                'is_mandatory': bool(task[6]), 'done': bool(task[7]),
-                'created_at': task[8], 'updated_at': task[9]
-            } for task in tasks]
-        }
+@contextmanager
+def _bulk_storage_profile(conn):
+    """Профиль 'bulk-import' на время массовой записи в текущем потоке"""
+    _apply_storage_profile(conn, 'bulk-import')
+    try:
+        yield
+    finally:
+        _apply_storage_profile(conn, _local.profile)
 
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, ensure_ascii=False, indent=2)
+@contextmanager
+def _search_index_deferred(conn):
+    """Отложенное обновление FTS5-индекса при массовой вставке задач.
 
-        print(f"Задачи пользователя {user_id} экспортированы в {file_path}")
-        return True
-    except Exception as e:
-        print(f"Ошибка при экспорте задач: {e}")
-        return False
+    Вызывается внутри transaction(): триггер вставки снимается, а новые
+    задачи добавляются в индекс одним запросом в конце. Построчный триггер
+    на 100 тыс. задач в разы медленнее. Другие соединения не видят базу
+    без триггера, так как все происходит в одной транзакции; при ошибке
+    триггер создается заново, а откат транзакции возвращает и индекс.
+    """
+    if not conn.in_transaction:
+        raise ValueError("_search_index_deferred вызывается только внутри transaction()")
+    cursor = conn.cursor()
+    try:
+        if not _search_available(cursor):
+            yield
+            return
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM tasks')
+        last_id = cursor.fetchone()[0]
+        cursor.execute('DROP TRIGGER IF EXISTS tasks_fts_insert')
+        try:
+            yield
+            cursor.execute('''
+                INSERT INTO tasks_fts (rowid, title, description)
+                SELECT id, title, description FROM tasks WHERE id > ?
+            ''', (last_id,))
+        finally:
+            cursor.execute(SEARCH_INSERT_TRIGGER)
     finally:
-        conn.close()
+        cursor.close()
+
+def _insert_task_rows(conn, rows):
+    """Вставка проверенных задач пачками по IMPORT_BATCH_SIZE"""
+    for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+        conn.executemany('''
+            INSERT INTO tasks (user_id, title, task_date, description, priority, is_mandatory, done, category_id,
+                               due_time, remind_before, day_num)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [row + (to_day_num(row[2]),) for row in rows[start:start + IMPORT_BATCH_SIZE]])
 
 def import_tasks_from_json(user_id, filename):
-    """Импорт задач из JSON файла для пользователя"""
+    """Импорт задач из JSON файла для пользователя.
+
+    Записи проверяются заранее, затем вставляются пачками по
+    IMPORT_BATCH_SIZE через executemany в одной транзакции: при ошибке
+    откатывается весь импорт. Возвращает {'imported': N, 'skipped': M}
+    или None при ошибке.
+    """
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
+        with _open_backup(filename) as f:
             data = json.load(f)
         
-        imported_count = 0
+        category_map = _import_category_map(user_id, data.get('categories'))
+        
+        rows = []
+        skipped_count = 0
         for task_data in data.get('tasks', []):
             # Пропускаем ID при импорте, используем текущего пользователя
-            add_task(
-                title=task_data['title'],
-                task_date=task_data['task_date'],
-                user_id=user_id,
-                description=task_data.get('description', ''),
-                priority=task_data.get('priority', 1),
-                is_mandatory=task_data.get('is_mandatory', False)
-            )
-            imported_count += 1
+            values = _validate_import_record(task_data, category_map)
+            if values is None:
+                skipped_count += 1
+                continue
+            rows.append((user_id,) + values)
         
-        print(f"Импортировано {imported_count} задач для пользователя {user_id}")
-        return True
+        conn = get_connection()
+        with _bulk_storage_profile(conn), transaction(), _search_index_deferred(conn):
+            _insert_task_rows(conn, rows)
+        
+        if rows:
+            _notify_tasks_changed(user_id, sorted({row[2] for row in rows}))
+        
+        logger.info("Импортировано %s задач для пользователя %s (пропущено: %s)",
+                    len(rows), user_id, skipped_count)
+        return {'imported': len(rows), 'skipped': skipped_count}
     except Exception as e:
-        print(f"Ошибка при импорте задач: {e}")
-        return False
+        logger.error("Ошибка при импорте задач: %s", e)
+        return None
 
 def clear_all_tasks(user_id):
     """Очистка всех задач пользователя"""
-    conn = sqlite3.connect(get_db_path())
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
         cursor.execute('DELETE FROM tasks WHERE user_id = ?', (user_id,))
-        conn.commit()
         deleted_count = cursor.rowcount
-        print(f"Удалено {deleted_count} задач пользователя {user_id}")
+        cursor.execute('''
+            DELETE FROM recurrence_overrides
+            WHERE recurrence_id IN (SELECT id FROM recurrences WHERE user_id = ?)
+        ''', (user_id,))
+        cursor.execute('DELETE FROM recurrences WHERE user_id = ?', (user_id,))
+        conn.commit()
+        _notify_tasks_changed(user_id)
+        logger.info("Удалено %s задач пользователя %s", deleted_count, user_id)
         return True
     except Exception as e:
-        print(f"Ошибка при очистке задач: {e}")
+        conn.rollback()
+        logger.error("Ошибка при очистке задач: %s", e)
         return False
     finally:
-        conn.close()
+        cursor.close()
 
 # ========== АВТО-БЭКАП ==========
 
+BACKUP_DIR = 'data/backups'
+
+# Каждый FULL_BACKUP_EVERY-й бэкап делается полным, остальные - инкрементальные
+FULL_BACKUP_EVERY = 7
+
+# Сжатие бэкапов: 'gzip', 'lzma' или None (обычный JSON)
+BACKUP_COMPRESSION = 'gzip'
+_BACKUP_EXTENSIONS = {'gzip': '.json.gz', 'lzma': '.json.xz', None: '.json'}
+
+# Ротация "дед-отец-сын": сколько последних дней, недель и месяцев хранить
+# (от каждого периода остается самый свежий бэкап)
+BACKUP_RETENTION = {'daily': 7, 'weekly': 4, 'monthly': 12}
+
+# Ограничение общего размера бэкапов пользователя в байтах (None - без ограничения)
+BACKUP_MAX_TOTAL_BYTES = 200 * 1024 * 1024
+
+# Бэкапы в старом формате (auto_backup_<user>_<yyyyMMdd>.json, без manifest)
+_LEGACY_BACKUP_RE = re.compile(r'^auto_backup_(\d+)_(\d{8})\.json$')
+
+_backup_lock = threading.RLock()
+
+def _manifest_path(user_id):
+    """Путь к описанию цепочки бэкапов пользователя"""
+    return os.path.join(BACKUP_DIR, f'manifest_{user_id}.json')
+
+def _load_manifest(user_id):
+    """Список бэкапов пользователя от старых к новым"""
+    path = _manifest_path(user_id)
+    if not os.path.exists(path):
+        return {'user_id': user_id, 'backups': []}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _save_manifest(user_id, manifest):
+    """Атомарная запись описания цепочки бэкапов"""
+    path = _manifest_path(user_id)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def create_backup(user_id, full=False):
+    """Бэкап задач пользователя в BACKUP_DIR.
+
+    Полный бэкап содержит все задачи. Инкрементальный - только задачи,
+    созданные или измененные после отметки updated_at предыдущего бэкапа,
+    и список id живых задач, чтобы при восстановлении учесть удаления.
+    Полный бэкап делается, если его еще нет, если после него накопилось
+    FULL_BACKUP_EVERY - 1 инкрементальных или если full=True.
+    Возвращает запись о бэкапе из manifest или None при ошибке.
+    """
+    with _backup_lock:
+        try:
+            os.makedirs(BACKUP_DIR, exist_ok=True)
+            manifest = _load_manifest(user_id)
+            backups = manifest['backups']
+
+            since_full = 0
+            for entry in reversed(backups):
+                if entry['type'] == 'full':
+                    break
+                since_full += 1
+            make_full = full or not backups or since_full >= FULL_BACKUP_EVERY - 1
+
+            cursor = get_connection().cursor()
+            try:
+                # Отметка берется до выгрузки: задачи, измененные во время
+                # бэкапа, попадут в следующий инкрементальный
+                cursor.execute('SELECT MAX(updated_at) FROM tasks WHERE user_id = ?', (user_id,))
+                high_water_mark = cursor.fetchone()[0]
+                if not make_full:
+                    cursor.execute('SELECT id FROM tasks WHERE user_id = ? ORDER BY id', (user_id,))
+                    live_ids = [row[0] for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+
+            backup_type = 'full' if make_full else 'incremental'
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            filename = f'backup_{user_id}_{timestamp}_{backup_type}{_BACKUP_EXTENSIONS[BACKUP_COMPRESSION]}'
+            header = {'backup_type': backup_type, 'high_water_mark': high_water_mark}
+
+            if make_full:
+                count = _write_tasks_json(os.path.join(BACKUP_DIR, filename), user_id, header)
+                base = filename
+                since = None
+            else:
+                previous = backups[-1]
+                since = previous['high_water_mark']
+                header.update({'since': since, 'live_ids': live_ids})
+                # >= а не >: изменения в ту же секунду, что и отметка, повторятся,
+                # но не потеряются - при восстановлении записи с одним id заменяются
+                where, params = ('AND updated_at >= ?', (since,)) if since else ('', ())
+                count = _write_tasks_json(os.path.join(BACKUP_DIR, filename), user_id, header, where, params)
+                base = previous['base']
+
+            entry = {
+                'file': filename,
+                'type': backup_type,
+                'base': base,
+                'created_at': datetime.now().isoformat(),
+                'since': since,
+                'high_water_mark': high_water_mark,
+                'tasks_count': count,
+            }
+            backups.append(entry)
+            _save_manifest(user_id, manifest)
+
+            logger.info("Бэкап пользователя %s (%s, задач: %s): %s", user_id, backup_type, count, filename)
+            prune_backups_async(user_id)
+            return entry
+        except Exception as e:
+            logger.error("Ошибка при создании бэкапа: %s", e)
+            return None
+
+def get_backups(user_id):
+    """Список бэкапов пользователя от старых к новым"""
+    with _backup_lock:
+        try:
+            return _load_manifest(user_id)['backups']
+        except Exception as e:
+            logger.error("Ошибка чтения списка бэкапов: %s", e)
+            return []
+
+def restore_backup_chain(user_id, upto=None):
+    """Восстановление задач пользователя из цепочки бэкапов.
+
+    Берется последний полный бэкап не позже upto (имя файла, по умолчанию
+    самый свежий бэкап), поверх него по порядку применяются инкрементальные.
+    Текущие задачи пользователя заменяются результатом в одной транзакции.
+    Возвращает {'restored': N, 'skipped': M} или None при ошибке.
+    """
+    with _backup_lock:
+        try:
+            backups = _load_manifest(user_id)['backups']
+            if upto is not None:
+                names = [entry['file'] for entry in backups]
+                backups = backups[:names.index(upto) + 1]
+
+            full_index = max((i for i, entry in enumerate(backups) if entry['type'] == 'full'), default=None)
+            if full_index is None:
+                logger.warning("Нет полного бэкапа для пользователя %s", user_id)
+                return None
+
+            tasks = {}
+            categories = []
+            for entry in backups[full_index:]:
+                with _open_backup(os.path.join(BACKUP_DIR, entry['file'])) as f:
+                    data = json.load(f)
+                for task in data.get('tasks', []):
+                    tasks[task['id']] = task
+                if entry['type'] == 'incremental':
+                    live_ids = set(data.get('live_ids', []))
+                    tasks = {task_id: task for task_id, task in tasks.items() if task_id in live_ids}
+                categories = data.get('categories', categories)
+        except Exception as e:
+            logger.error("Ошибка чтения цепочки бэкапов: %s", e)
+            return None
+
+    try:
+        category_map = _import_category_map(user_id, categories)
+        rows = []
+        skipped_count = 0
+        for task in sorted(tasks.values(), key=lambda t: t['id']):
+            values = _validate_import_record(task, category_map)
+            if values is None:
+                skipped_count += 1
+                continue
+            rows.append((user_id,) + values)
+
+        conn = get_connection()
+        with _bulk_storage_profile(conn), transaction():
+            conn.execute('DELETE FROM tasks WHERE user_id = ?', (user_id,))
+            with _search_index_deferred(conn):
+                _insert_task_rows(conn, rows)
+        _notify_tasks_changed(user_id)
+
+        logger.info("Восстановлено %s задач пользователя %s из %s бэкапов",
+                    len(rows), user_id, len(backups) - full_index)
+        return {'restored': len(rows), 'skipped': skipped_count}
+    except Exception as e:
+        logger.error("Ошибка при восстановлении из бэкапа: %s", e)
+        return None
+
+def _select_retained(moments, retention):
+    """Индексы моментов, оставляемых ротацией "дед-отец-сын".
+
+    Из каждого дня, ISO-недели и месяца берется самый свежий момент,
+    затем оставляются последние retention['daily'] дней,
+    retention['weekly'] недель и retention['monthly'] месяцев.
+    """
+    periods = {
+        'daily': lambda m: m.date(),
+        'weekly': lambda m: m.isocalendar()[:2],
+        'monthly': lambda m: (m.year, m.month),
+    }
+    keep = set()
+    order = sorted(range(len(moments)), key=lambda i: moments[i], reverse=True)
+    for name, period in periods.items():
+        seen = set()
+        for i in order:
+            key = period(moments[i])
+            if key in seen:
+                continue
+            if len(seen) >= retention.get(name, 0):
+                break
+            seen.add(key)
+            keep.add(i)
+    return keep
+
+def _file_size(path):
+    """Размер файла или 0, если его нет"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def prune_backups(user_id, retention=None, max_total_bytes=None):
+    """Удаление старых бэкапов пользователя по ротации "дед-отец-сын".
+
+    Ротация применяется к бэкапам из manifest. Инкрементальный бэкап
+    восстанавливается только вместе с предыдущими бэкапами своей цепочки,
+    поэтому вместе с ним остаются его полный бэкап и все промежуточные.
+    Если общий размер превышает max_total_bytes, целиком удаляются самые
+    старые цепочки (последняя цепочка не удаляется никогда). Файлы, не
+    попавшие в manifest, и бэкапы старого формата тоже чистятся.
+    Возвращает число удаленных файлов.
+    """
+    retention = retention or BACKUP_RETENTION
+    if max_total_bytes is None:
+        max_total_bytes = BACKUP_MAX_TOTAL_BYTES
+
+    with _backup_lock:
+        try:
+            manifest = _load_manifest(user_id)
+            backups = manifest['backups']
+
+            keep = set()
+            if backups:
+                moments = [datetime.fromisoformat(entry['created_at']) for entry in backups]
+                for i in _select_retained(moments, retention) | {len(backups) - 1}:
+                    # Цепочка от полного бэкапа до выбранного
+                    while i >= 0 and i not in keep:
+                        keep.add(i)
+                        if backups[i]['type'] == 'full':
+                            break
+                        i -= 1
+
+            kept = [entry for i, entry in enumerate(backups) if i in keep]
+
+            if max_total_bytes:
+                chains = []
+                for entry in kept:
+                    if entry['type'] == 'full' or not chains:
+                        chains.append([])
+                    chains[-1].append(entry)
+                total = sum(_file_size(os.path.join(BACKUP_DIR, entry['file'])) for entry in kept)
+                while len(chains) > 1 and total > max_total_bytes:
+                    total -= sum(_file_size(os.path.join(BACKUP_DIR, entry['file'])) for entry in chains.pop(0))
+                kept = [entry for chain in chains for entry in chain]
+
+            if len(kept) != len(backups):
+                # Сначала manifest, потом файлы: прерванная чистка оставит
+                # лишние файлы, которые удалятся в следующий раз
+                manifest['backups'] = kept
+                _save_manifest(user_id, manifest)
+
+            kept_files = {entry['file'] for entry in kept}
+            prefix = f'backup_{user_id}_'
+            candidates = [name for name in os.listdir(BACKUP_DIR)
+                          if name.startswith(prefix) and name not in kept_files]
+
+            legacy = {}
+            for name in os.listdir(BACKUP_DIR):
+                match = _LEGACY_BACKUP_RE.match(name)
+                if match and int(match.group(1)) == user_id:
+                    legacy[name] = datetime.strptime(match.group(2), '%Y%m%d')
+            names = list(legacy)
+            retained = _select_retained([legacy[name] for name in names], retention)
+            candidates += [name for i, name in enumerate(names) if i not in retained]
+
+            removed = 0
+            for name in candidates:
+                try:
+                    os.remove(os.path.join(BACKUP_DIR, name))
+                    removed += 1
+                except OSError as e:
+                    logger.warning("Не удалось удалить бэкап %s: %s", name, e)
+
+            if removed:
+                logger.info("Удалено старых бэкапов пользователя %s: %s", user_id, removed)
+            return removed
+        except Exception as e:
+            logger.error("Ошибка при очистке бэкапов: %s", e)
+            return 0
+
+def prune_backups_async(user_id):
+    """Очистка старых бэкапов в фоновом потоке"""
+    thread = threading.Thread(target=prune_backups, args=(user_id,),
+                              name=f'prune-backups-{user_id}', daemon=True)
+    thread.start()
+    return thread
+
 def auto_backup(user_id):
     """Автоматическое создание бэкапа для пользователя"""
     try:
         settings = get_user_settings(user_id)
         if settings and settings.get('auto_backup', True):
-            backup_file = f"data/backups/auto_backup_{user_id}_{datetime.now().strftime('%Y%m%d')}.json"
-            return export_tasks_to_json(user_id, backup_file)
+            return create_backup(user_id) is not None
         return True
     except Exception as e:
-        print(f"Ошибка при автоматическом бэкапе: {e}")
-        return False
\ No newline at end of file
+        logger.error("Ошибка при автоматическом бэкапе: %s", e)
+        return False
+
+# ========== СНИМКИ БАЗЫ ==========
+
+# Снимок - копия всего файла базы (все пользователи, категории, шаблоны),
+# сделанная через sqlite3 backup API. Копирование идет порциями по
+# SNAPSHOT_PAGES страниц, между порциями вызывается progress.
+SNAPSHOT_PAGES = 256
+
+def get_snapshots():
+    """Список файлов снимков в BACKUP_DIR от старых к новым"""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    return sorted(name for name in os.listdir(BACKUP_DIR)
+                  if name.startswith('snapshot_') and name.endswith('.db'))
+
+def create_snapshot(file_path=None, pages=SNAPSHOT_PAGES, progress=None):
+    """Снимок базы данных через sqlite3 backup API.
+
+    progress(status, remaining, total) вызывается после каждой порции из
+    pages страниц в потоке, выполняющем копирование. Снимок пишется во
+    временный файл и подменяет file_path только после полного копирования.
+    Возвращает путь к снимку или None при ошибке.
+    """
+    if file_path is None:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        file_path = os.path.join(BACKUP_DIR, f'snapshot_{timestamp}.db')
+    tmp_path = file_path + '.tmp'
+
+    try:
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        target = sqlite3.connect(tmp_path)
+        try:
+            get_connection().backup(target, pages=pages, progress=progress)
+        finally:
+            target.close()
+        os.replace(tmp_path, file_path)
+
+        logger.info("Снимок базы создан: %s", file_path)
+        return file_path
+    except Exception as e:
+        logger.error("Ошибка при создании снимка базы: %s", e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+def restore_snapshot(file_path, pages=SNAPSHOT_PAGES, progress=None):
+    """Восстановление базы данных из снимка.
+
+    Снимок копируется в рабочее соединение через backup API. Запись в
+    базу-приемник идет в одной транзакции, которая фиксируется после
+    последней порции, поэтому при ошибке база остается прежней, а другие
+    соединения видят либо старое, либо новое содержимое целиком.
+    Возвращает True при успехе.
+    """
+    try:
+        source = sqlite3.connect(f'file:{file_path}?mode=ro', uri=True)
+        try:
+            result = source.execute('PRAGMA quick_check').fetchone()[0]
+            if result != 'ok':
+                raise ValueError(f'снимок поврежден: {result}')
+            if source.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks'"
+            ).fetchone() is None:
+                raise ValueError('в снимке нет таблицы задач')
+
+            conn = get_connection()
+            conn.commit()
+            users_before = [row[0] for row in conn.execute('SELECT id FROM users')]
+            source.backup(conn, pages=pages, progress=progress)
+        finally:
+            source.close()
+
+        # Снимок мог быть сделан более старой версией программы
+        init_db()
+
+        users_after = [row[0] for row in get_connection().execute('SELECT id FROM users')]
+        for user_id in set(users_before) | set(users_after):
+            _notify_tasks_changed(user_id)
+
+        logger.info("База восстановлена из снимка: %s", file_path)
+        return True
+    except Exception as e:
+        logger.error("Ошибка при восстановлении из снимка: %s", e)
+        return False
@@ -0,0 +1,82 @@
+"""Логирование приложения.
+
+Записи пишутся в data/logs/planner.log с ротацией по размеру. Обработчик
+на стороне приложения только кладет запись в очередь, а в файл ее пишет
+отдельный поток (QueueListener), поэтому GUI-поток не ждет диска.
+
+Сообщения передаются с аргументами (logger.debug("... %s", value)), а не
+f-строками: если уровень отключен, форматирование не выполняется.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_DIR = 'data/logs'
+LOG_FILE = 'planner.log'
+LOG_FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+
+# Ротация: до 5 файлов по 1 МиБ
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Уровни по модулям. Переменная окружения PLANNER_LOG_LEVEL (например,
+# DEBUG) переопределяет уровень корневого логгера приложения.
+DEFAULT_LEVELS = {
+    'planner': logging.INFO,
+}
+
+_listener = None
+
+
+def setup_logging(log_dir=LOG_DIR, levels=None, console=False):
+    """Настройка логирования (повторные вызовы ничего не делают)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    os.makedirs(log_dir, exist_ok=True)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, LOG_FILE),
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8'
+    )
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [file_handler]
+
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(console_handler)
+
+    levels = dict(DEFAULT_LEVELS, **(levels or {}))
+    env_level = os.environ.get('PLANNER_LOG_LEVEL')
+    if env_level:
+        levels['planner'] = env_level.upper()
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    log_queue = queue.SimpleQueue()
+    app_logger = logging.getLogger('planner')
+    app_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    app_logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Остановка фонового потока с дозаписью оставшихся сообщений"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name):
+    """Логгер модуля приложения (planner.<name>)"""
+    return logging.getLogger(f'planner.{name}')
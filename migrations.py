@@ -0,0 +1,360 @@
+"""Версионные миграции схемы базы данных.
+
+Номер версии схемы хранится в самой базе (PRAGMA user_version). При
+запуске выполняются только недостающие шаги из MIGRATIONS, каждый в
+своей транзакции вместе с записью нового номера: прерванная миграция
+откатывается целиком. На актуальной базе migrate сводится к одному
+чтению user_version.
+
+Выпущенные шаги не меняются: любое изменение схемы - новый шаг в конце
+MIGRATIONS. Шаги написаны так, чтобы их можно было выполнить и на базе,
+созданной до появления миграций (user_version = 0, но таблицы уже есть).
+"""
+import sqlite3
+
+from logger import get_logger
+from passwords import hash_password
+
+logger = get_logger('migrations')
+
+
+def _ensure_column(cursor, table, column, definition):
+    """Добавление колонки в существующую таблицу, если ее еще нет"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in (row[1] for row in cursor.fetchall()):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def _initial_schema(cursor):
+    """1: пользователи, категории, задачи, шаблоны, настройки и администратор"""
+    # 1. Таблица пользователей (первая - без зависимостей)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # 2. Таблица категорий (вторая - зависит только от users)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            color TEXT DEFAULT '#007acc',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(user_id, name)
+        )
+    ''')
+
+    # 3. Таблица задач (третья - зависит от users и categories)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            task_date TEXT NOT NULL,
+            description TEXT,
+            priority INTEGER DEFAULT 1,
+            is_mandatory BOOLEAN DEFAULT FALSE,
+            done BOOLEAN DEFAULT FALSE,
+            category_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (category_id) REFERENCES categories (id)
+        )
+    ''')
+
+    # Базы, созданные старым create_folders.py: таблицы есть, но без
+    # category_id у задач и цвета у категорий
+    _ensure_column(cursor, 'tasks', 'category_id', 'INTEGER')
+    _ensure_column(cursor, 'categories', 'color', "TEXT DEFAULT '#007acc'")
+    _ensure_column(cursor, 'categories', 'created_at', 'TIMESTAMP')
+
+    # 4. Остальные таблицы
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS templates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        data TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, name),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_settings (
+            user_id INTEGER PRIMARY KEY,
+            auto_backup BOOLEAN DEFAULT TRUE,
+            notifications BOOLEAN DEFAULT TRUE,
+            week_start TEXT DEFAULT 'monday',
+            theme TEXT DEFAULT 'light',
+            language TEXT DEFAULT 'ru',
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Создаем индексы для быстрого поиска
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_date ON tasks(user_id, task_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_done ON tasks(user_id, done)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_priority ON tasks(user_id, priority)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_categories_user ON categories(user_id)')
+
+    # Создаем администратора по умолчанию, если пользователей еще нет
+    cursor.execute('SELECT COUNT(*) FROM users')
+    if cursor.fetchone()[0] == 0:
+        admin_password_hash = hash_password("admin")
+        cursor.execute(
+            'INSERT INTO users (username, password_hash) VALUES (?, ?)',
+            ('Admin', admin_password_hash)
+        )
+        admin_id = cursor.lastrowid
+
+        # Создаем настройки для администратора
+        cursor.execute(
+            'INSERT INTO user_settings (user_id) VALUES (?)',
+            (admin_id,)
+        )
+
+        # Создаем стандартные категории для администратора
+        default_categories = [
+            ('Работа', '#ff6b6b'),
+            ('Личное', '#4ecdc4'),
+            ('Здоровье', '#45b7d1'),
+            ('Обучение', '#96ceb4'),
+            ('Семья', '#feca57'),
+            ('Другое', '#a29bfe')
+        ]
+
+        for name, color in default_categories:
+            cursor.execute(
+                'INSERT INTO categories (user_id, name, color) VALUES (?, ?, ?)',
+                (admin_id, name, color)
+            )
+
+
+def _add_storage_profile(cursor):
+    """2: профиль хранения в настройках пользователя"""
+    _ensure_column(cursor, 'user_settings', 'storage_profile', "TEXT DEFAULT 'fast'")
+
+
+def _add_updated_index(cursor):
+    """3: индекс для инкрементальных бэкапов (задачи, измененные после отметки)"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_updated ON tasks(user_id, updated_at)')
+
+
+# Триггер, добавляющий новые задачи в FTS5-индекс. Вынесен отдельно:
+# при массовой вставке db снимает его, а индекс дополняет одним запросом
+SEARCH_INSERT_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts (rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+'''
+
+
+def _add_search_index(cursor):
+    """4: FTS5-индекс tasks_fts по задачам и триггеры, которые его обновляют.
+
+    Индекс хранит только токены (content='tasks'), сам текст берется из
+    tasks. Если SQLite собран без FTS5, поиск работает через LIKE.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'")
+    exists = cursor.fetchone() is not None
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+                title, description,
+                content='tasks', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning("FTS5 недоступен, поиск будет работать через LIKE: %s", e)
+        return
+
+    cursor.execute(SEARCH_INSERT_TRIGGER)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    ''')
+    # Только при изменении текста: переключение done и т.п. индекс не трогает
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    ''')
+
+    # Индекс появился в уже заполненной базе - строим его по существующим задачам
+    if not exists:
+        cursor.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+
+# Номер юлианского дня по дате 'yyyy-MM-dd' (как QDate.toJulianDay):
+# julianday() отсчитывает от полудня, поэтому + 0.5
+DAY_NUM_EXPR = "CAST(julianday({}) + 0.5 AS INTEGER)"
+
+
+def _add_day_num(cursor):
+    """5: целочисленный номер дня (day_num) для выборок по диапазонам дат.
+
+    Программа пишет day_num сама вместе с task_date; триггеры только
+    исправляют его, если task_date изменили в обход db.py.
+    """
+    _ensure_column(cursor, 'tasks', 'day_num', 'INTEGER')
+    cursor.execute(f"UPDATE tasks SET day_num = {DAY_NUM_EXPR.format('task_date')}")
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tasks_day_num_insert AFTER INSERT ON tasks
+        WHEN new.day_num IS NOT {DAY_NUM_EXPR.format('new.task_date')} BEGIN
+            UPDATE tasks SET day_num = {DAY_NUM_EXPR.format('new.task_date')} WHERE id = new.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS tasks_day_num_update AFTER UPDATE OF task_date, day_num ON tasks
+        WHEN new.day_num IS NOT {DAY_NUM_EXPR.format('new.task_date')} BEGIN
+            UPDATE tasks SET day_num = {DAY_NUM_EXPR.format('new.task_date')} WHERE id = new.id;
+        END
+    ''')
+
+    # Выборки по датам переходят на (user_id, day_num), текстовый индекс больше не нужен
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_day ON tasks(user_id, day_num)')
+    cursor.execute('DROP INDEX IF EXISTS idx_tasks_user_date')
+
+
+def _add_recurrences(cursor):
+    """6: повторяющиеся задачи - правила и редкие изменения отдельных дней.
+
+    Правило хранится одной строкой и разворачивается в дни только при
+    чтении (recurrence.py). В recurrence_overrides попадают лишь дни, которые
+    пользователь изменил: выполнение, правка полей или удаление (skipped).
+    NULL в колонке override означает "как в правиле".
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recurrences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            priority INTEGER DEFAULT 1,
+            is_mandatory BOOLEAN DEFAULT FALSE,
+            category_id INTEGER,
+            freq TEXT NOT NULL,
+            interval INTEGER NOT NULL DEFAULT 1,
+            weekdays INTEGER NOT NULL DEFAULT 0,
+            start_day INTEGER NOT NULL,
+            until_day INTEGER,
+            count INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (category_id) REFERENCES categories (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_recurrences_user ON recurrences(user_id, start_day)')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recurrence_overrides (
+            recurrence_id INTEGER NOT NULL,
+            day_num INTEGER NOT NULL,
+            skipped BOOLEAN NOT NULL DEFAULT FALSE,
+            done BOOLEAN,
+            title TEXT,
+            description TEXT,
+            priority INTEGER,
+            is_mandatory BOOLEAN,
+            category_id INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (recurrence_id, day_num),
+            FOREIGN KEY (recurrence_id) REFERENCES recurrences (id)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _add_reminders(cursor):
+    """7: время задачи (due_time 'HH:MM') и напоминание за remind_before минут.
+
+    Частичный индекс содержит только невыполненные задачи с напоминанием:
+    планировщик читает ближайшие дни, не трогая остальные задачи.
+    """
+    for table in ('tasks', 'recurrences', 'recurrence_overrides'):
+        _ensure_column(cursor, table, 'due_time', 'TEXT')
+        _ensure_column(cursor, table, 'remind_before', 'INTEGER')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tasks_reminders ON tasks(user_id, day_num)
+        WHERE remind_before IS NOT NULL AND NOT done
+    ''')
+
+
+
+def _add_prefetch_depth(cursor):
+    """8: на сколько месяцев и недель вокруг открытых подгружать задачи заранее"""
+    _ensure_column(cursor, 'user_settings', 'prefetch_depth', 'INTEGER DEFAULT 2')
+
+
+# (номер версии, описание, шаг)
+MIGRATIONS = (
+    (1, 'начальная схема', _initial_schema),
+    (2, 'профиль хранения в настройках', _add_storage_profile),
+    (3, 'индекс задач по updated_at', _add_updated_index),
+    (4, 'полнотекстовый поиск FTS5', _add_search_index),
+    (5, 'номер дня day_num', _add_day_num),
+    (6, 'повторяющиеся задачи', _add_recurrences),
+    (7, 'время задачи и напоминания', _add_reminders),
+    (8, 'глубина предзагрузки в настройках', _add_prefetch_depth),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Текущая версия схемы базы"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Применение недостающих миграций. Возвращает версию схемы после обновления"""
+    version = get_schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        if version > SCHEMA_VERSION:
+            logger.warning("Версия схемы базы %s новее поддерживаемой %s", version, SCHEMA_VERSION)
+        return version
+
+    if conn.in_transaction:
+        conn.commit()
+
+    for number, description, step in MIGRATIONS:
+        if number <= version:
+            continue
+
+        # IMMEDIATE: второй экземпляр программы ждет, а не мигрирует параллельно
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if get_schema_version(conn) >= number:
+                # Пока ждали блокировку, шаг выполнил другой экземпляр
+                conn.rollback()
+                continue
+            cursor = conn.cursor()
+            try:
+                step(cursor)
+                cursor.execute(f'PRAGMA user_version = {number}')
+            finally:
+                cursor.close()
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        logger.info("Миграция схемы %s: %s", number, description)
+
+    return get_schema_version(conn)
@@ -0,0 +1,11 @@
+"""Хэширование паролей пользователей.
+
+Отдельный модуль, чтобы и db.py, и migrations.py (администратор по
+умолчанию) импортировали его без циклического импорта.
+"""
+import hashlib
+
+
+def hash_password(password: str) -> str:
+    salt = "planner_salt_v1"
+    return hashlib.sha256((password + salt).encode()).hexdigest()
@@ -0,0 +1,157 @@
+"""Правила повторения задач и их ленивое разворачивание.
+
+Повторяющаяся задача хранится одной строкой-правилом, а конкретные дни
+(вхождения) вычисляются только для запрошенного периода: первое
+вхождение в периоде находится арифметикой от даты начала, поэтому неделя
+разворачивается за несколько шагов, сколько бы лет ни шло правило.
+
+Модуль не обращается к базе и работает с datetime.date.
+"""
+import calendar
+from datetime import date, timedelta
+
+DAILY = 'daily'
+WEEKLY = 'weekly'
+MONTHLY = 'monthly'
+FREQUENCIES = (DAILY, WEEKLY, MONTHLY)
+
+WEEKDAY_NAMES = ('Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс')
+
+# Ограничение на count: правило "N раз" разворачивается один раз при сохранении
+MAX_COUNT = 10000
+
+
+def weekdays_mask(weekdays):
+    """Битовая маска дней недели (0 - понедельник) для колонки weekdays"""
+    mask = 0
+    for weekday in weekdays:
+        if not 0 <= weekday <= 6:
+            raise ValueError(f"Некорректный день недели: {weekday}")
+        mask |= 1 << weekday
+    return mask
+
+
+def mask_weekdays(mask):
+    """Дни недели (0 - понедельник) из битовой маски"""
+    return tuple(weekday for weekday in range(7) if mask & (1 << weekday))
+
+
+class Rule:
+    """Правило повторения.
+
+    freq - DAILY, WEEKLY или MONTHLY; interval - каждые N дней/недель/месяцев;
+    weekdays - маска дней недели для WEEKLY (0 - день недели начала);
+    until - последняя возможная дата (включительно) или None.
+    Ежемесячное правило повторяется в день месяца даты начала, а в коротких
+    месяцах - в последний день месяца.
+    """
+    __slots__ = ('freq', 'start', 'interval', 'weekdays', 'until')
+
+    def __init__(self, freq, start, interval=1, weekdays=0, until=None):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Неизвестная периодичность: {freq}")
+        if interval < 1:
+            raise ValueError("Интервал повторения должен быть положительным")
+        self.freq = freq
+        self.start = start
+        self.interval = interval
+        if freq == WEEKLY and not weekdays:
+            weekdays = 1 << start.weekday()
+        self.weekdays = weekdays if freq == WEEKLY else 0
+        self.until = until
+
+    def __repr__(self):
+        return f"Rule({self.freq!r}, {self.start!r}, interval={self.interval}, until={self.until!r})"
+
+
+def occurrences(rule, first, last):
+    """Даты вхождений правила в периоде first..last (включительно), по возрастанию"""
+    lo = max(first, rule.start)
+    hi = last if rule.until is None else min(last, rule.until)
+    if lo > hi:
+        return
+    if rule.freq == DAILY:
+        yield from _daily(rule, lo, hi)
+    elif rule.freq == WEEKLY:
+        yield from _weekly(rule, lo, hi)
+    else:
+        yield from _monthly(rule, lo, hi)
+
+
+def _daily(rule, lo, hi):
+    # Первое вхождение не раньше lo: округление смещения вверх до кратного interval
+    offset = -(-(lo - rule.start).days // rule.interval) * rule.interval
+    step = timedelta(days=rule.interval)
+    day = rule.start + timedelta(days=offset)
+    while day <= hi:
+        yield day
+        day += step
+
+
+def _weekly(rule, lo, hi):
+    # Недели считаются от понедельника недели начала правила
+    first_monday = rule.start - timedelta(days=rule.start.weekday())
+    weeks = (lo - first_monday).days // 7
+    weeks += -weeks % rule.interval
+    weekdays = mask_weekdays(rule.weekdays)
+    monday = first_monday + timedelta(weeks=weeks)
+    step = timedelta(weeks=rule.interval)
+    while monday <= hi:
+        for weekday in weekdays:
+            day = monday + timedelta(days=weekday)
+            if day > hi:
+                return
+            if day >= lo:
+                yield day
+        monday += step
+
+
+def _month_day(start, months):
+    """Дата через months месяцев после start (день месяца ограничен длиной месяца)"""
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    return date(year, month + 1, min(start.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def _monthly(rule, lo, hi):
+    months = (lo.year - rule.start.year) * 12 + lo.month - rule.start.month
+    months += -months % rule.interval
+    while True:
+        day = _month_day(rule.start, months)
+        if day > hi:
+            return
+        if day >= lo:
+            yield day
+        months += rule.interval
+
+
+def occurs_on(rule, day):
+    """Есть ли у правила вхождение в день day"""
+    return next(occurrences(rule, day, day), None) is not None
+
+
+def last_occurrence(rule, count):
+    """Дата count-го вхождения правила (для ограничения "N раз") или None"""
+    if not 1 <= count <= MAX_COUNT:
+        raise ValueError(f"Число повторений должно быть от 1 до {MAX_COUNT}")
+    last = None
+    for number, day in enumerate(occurrences(rule, rule.start, date.max - timedelta(days=366)), 1):
+        last = day
+        if number == count:
+            return day
+    return last
+
+
+def describe(rule):
+    """Краткое описание правила для интерфейса"""
+    if rule.freq == DAILY:
+        text = "Каждый день" if rule.interval == 1 else f"Каждые {rule.interval} дн."
+    elif rule.freq == WEEKLY:
+        text = "Каждую неделю" if rule.interval == 1 else f"Каждые {rule.interval} нед."
+        text += ": " + ", ".join(WEEKDAY_NAMES[weekday] for weekday in mask_weekdays(rule.weekdays))
+    else:
+        text = "Каждый месяц" if rule.interval == 1 else f"Каждые {rule.interval} мес."
+        text += f", {rule.start.day} числа"
+    if rule.until is not None:
+        text += f" до {rule.until.strftime('%d.%m.%Y')}"
+    return text
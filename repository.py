@@ -0,0 +1,173 @@
+"""Кэш задач поверх db.py.
+
+Диалоги перечитывают день или неделю после каждого изменения, хотя,
+кроме самой программы, в базу никто не пишет. Здесь результаты
+get_tasks_by_date и get_tasks_by_week хранятся в ограниченном LRU-кэше
+по пользователю, а db.py после каждой закоммиченной записи сообщает,
+какие даты затронуты (add_tasks_changed_listener) - из кэша удаляются
+только они. Повторная отрисовка после изменения читает из памяти
+только незатронутые дни, а измененные - из SQLite.
+
+Функции изменения задач реэкспортируются из db, чтобы диалоги брали
+все из одного места.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import db
+from db import (add_task, update_task, remove_task, toggle_task_status, toggle_mandatory_status,
+                bulk_update_tasks, bulk_move_tasks, bulk_delete_tasks,
+                clear_all_tasks, delete_category, get_task, get_categories, get_task_stats,
+                add_recurrence, end_recurrence, delete_recurrence, get_recurrences, parse_occurrence_id,
+                NO_TIME, NO_REMINDER)
+from logger import get_logger
+
+logger = get_logger('repository')
+
+# Сколько дней и недель держать в кэше (на всех пользователей)
+CACHE_SIZE = 256
+
+
+class TaskCache:
+    """LRU-кэш задач по дням и неделям с инвалидацией по датам.
+
+    Ключи: ('day', user_id, 'yyyy-MM-dd') -> список Task и
+    ('week', user_id, 'yyyy-MM-dd') -> словарь дата -> список Task
+    (неделя из семи дней, начиная с даты ключа).
+    """
+
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Меняется при каждой инвалидации: результат запроса, начатого до
+        # записи в базу, в кэш уже не кладется
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Значение из кэша без учета в счетчиках и без загрузки"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def put(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id, dates=None, task_ids=None):
+        """Удаление записей пользователя, содержащих даты dates (None - все).
+
+        task_ids не нужны: записи кэша - целые дни и недели.
+        """
+        with self._lock:
+            self._generation += 1
+            for key in list(self._entries):
+                kind, key_user, start = key
+                if key_user != user_id:
+                    continue
+                if dates is None or any(self._covers(kind, start, day) for day in dates):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    @staticmethod
+    def _covers(kind, start, day):
+        if kind == 'day':
+            return start == day
+        # Даты в формате yyyy-MM-dd сравниваются как строки
+        return start <= day <= _week_end(start)
+
+
+def _week_end(start):
+    """Последний день недели, начинающейся с даты start ('yyyy-MM-dd')"""
+    return (datetime.strptime(start, '%Y-%m-%d') + timedelta(days=6)).strftime('%Y-%m-%d')
+
+
+_cache = TaskCache()
+db.add_tasks_changed_listener(_cache.invalidate)
+
+
+def get_tasks_by_date(date_obj, user_id):
+    """Задачи на дату (из кэша, если день не менялся) или None при ошибке.
+
+    Ошибка не кэшируется: следующее чтение снова обращается к базе.
+    """
+    day = db._date_str(date_obj)
+    key = ('day', user_id, day)
+    tasks = _cache.get(key)
+    if tasks is None:
+        generation = _cache.generation()
+        tasks = db.get_tasks_by_date(day, user_id)
+        if tasks is None:
+            return None
+        _cache.put(key, tasks, generation)
+    return list(tasks)
+
+
+def get_tasks_by_week(start_date, user_id):
+    """Задачи на неделю по дням (из кэша, если неделя не менялась) или None при ошибке.
+
+    Ошибка не кэшируется: следующее чтение снова обращается к базе.
+    """
+    start = db._date_str(start_date)
+    key = ('week', user_id, start)
+    tasks_by_day = _cache.get(key)
+    if tasks_by_day is None:
+        generation = _cache.generation()
+        tasks_by_day = db.get_tasks_by_week(start_date, user_id)
+        if tasks_by_day is None:
+            return None
+        _cache.put(key, tasks_by_day, generation)
+    return {day: list(tasks) for day, tasks in tasks_by_day.items()}
+
+
+def cached_tasks_by_week(start_date, user_id):
+    """Неделя из кэша (например, предзагруженная) или None, если ее там нет"""
+    tasks_by_day = _cache.peek(('week', user_id, db._date_str(start_date)))
+    if tasks_by_day is None:
+        return None
+    return {day: list(tasks) for day, tasks in tasks_by_day.items()}
+
+
+def is_week_cached(start_date, user_id):
+    return _cache.peek(('week', user_id, db._date_str(start_date))) is not None
+
+
+def invalidate(user_id=None):
+    """Сброс кэша пользователя (или всего кэша) после записи в обход db.py"""
+    if user_id is None:
+        _cache.clear()
+    else:
+        _cache.invalidate(user_id)
+
+
+def cache_stats():
+    """Счетчики попаданий и промахов кэша"""
+    return {'hits': _cache.hits, 'misses': _cache.misses, 'size': len(_cache._entries)}
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Чистая база во временной папке (data/ рабочей копии не затрагивается)"""
+    monkeypatch.chdir(tmp_path)
+    db.init_db()
+    yield db
+    db.close_connection()
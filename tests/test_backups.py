@@ -0,0 +1,135 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import db
+
+USER_ID = 1
+
+
+@pytest.fixture
+def backups(database, monkeypatch):
+    """Бэкапы без фоновой чистки: ротация проверяется явными вызовами prune_backups"""
+    monkeypatch.setattr(db, 'prune_backups_async', lambda user_id: None)
+    return database
+
+
+def _state(user_id):
+    """Задачи пользователя без id и служебных отметок"""
+    rows = db.get_connection().execute('''
+        SELECT title, task_date, description, priority, is_mandatory, done, category_id
+        FROM tasks WHERE user_id = ? ORDER BY task_date, title
+    ''', (user_id,)).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def test_incremental_chain_restores_current_state(backups):
+    kept = db.add_task("остается", "2026-01-05", USER_ID)
+    edited = db.add_task("будет изменена", "2026-01-06", USER_ID)
+    deleted = db.add_task("будет удалена", "2026-01-07", USER_ID)
+    assert db.create_backup(USER_ID)['type'] == 'full'
+
+    db.update_task(USER_ID, edited, title="изменена", priority=3)
+    db.toggle_task_status(kept, USER_ID)
+    db.remove_task(USER_ID, deleted)
+    db.add_task("новая", "2026-01-08", USER_ID)
+    incremental = db.create_backup(USER_ID)
+    assert incremental['type'] == 'incremental'
+
+    db.remove_task(USER_ID, edited)
+    db.add_task("после второго", "2026-01-09", USER_ID)
+    assert db.create_backup(USER_ID)['type'] == 'incremental'
+    expected = _state(USER_ID)
+
+    db.clear_all_tasks(USER_ID)
+    assert db.restore_backup_chain(USER_ID) == {'restored': len(expected), 'skipped': 0}
+    assert _state(USER_ID) == expected
+
+    # Восстановление на середину цепочки
+    assert db.restore_backup_chain(USER_ID, upto=incremental['file'])['restored'] == 3
+    assert [row[0] for row in _state(USER_ID)] == ["остается", "изменена", "новая"]
+    assert _state(USER_ID)[0][5]  # выполнена
+
+
+def test_full_backup_every(backups, monkeypatch):
+    monkeypatch.setattr(db, 'FULL_BACKUP_EVERY', 3)
+    db.add_task("задача", "2026-01-05", USER_ID)
+    types = [db.create_backup(USER_ID)['type'] for _ in range(7)]
+    assert types == ['full', 'incremental', 'incremental', 'full', 'incremental', 'incremental', 'full']
+
+
+def _set_created(user_id, moments):
+    """Даты создания бэкапов в manifest по порядку"""
+    manifest = db._load_manifest(user_id)
+    for entry, moment in zip(manifest['backups'], moments):
+        entry['created_at'] = moment.isoformat()
+    db._save_manifest(user_id, manifest)
+
+
+def _days(*dates):
+    return [datetime.strptime(day, '%Y-%m-%d') for day in dates]
+
+
+def _assert_chains_complete(user_id):
+    """Каждый оставшийся инкрементальный бэкап восстанавливаем: его полный
+    бэкап и все промежуточные остались в manifest и на диске
+    """
+    entries = db.get_backups(user_id)
+    for i, entry in enumerate(entries):
+        assert os.path.exists(os.path.join(db.BACKUP_DIR, entry['file']))
+        if entry['type'] == 'incremental':
+            assert i > 0
+            previous = entries[i - 1]
+            assert previous['base'] == entry['base']
+            assert previous['high_water_mark'] == entry['since']
+    assert not entries or entries[0]['type'] == 'full'
+
+
+def test_prune_keeps_full_backups_of_retained_incrementals(backups, monkeypatch):
+    monkeypatch.setattr(db, 'FULL_BACKUP_EVERY', 5)
+    db.add_task("задача", "2026-01-05", USER_ID)
+    for _ in range(10):
+        db.create_backup(USER_ID)
+    entries = db.get_backups(USER_ID)
+    assert [entry['type'] for entry in entries] == (['full'] + ['incremental'] * 4) * 2
+
+    # Месячный бэкап декабря - третий в первой цепочке: остаются он, его
+    # полный бэкап и промежуточный, а хвост цепочки (январь) удаляется
+    _set_created(USER_ID, _days('2025-12-10', '2025-12-11', '2025-12-12', '2026-01-02', '2026-01-03',
+                                '2026-01-20', '2026-01-21', '2026-01-22', '2026-01-23', '2026-01-24'))
+    removed = db.prune_backups(USER_ID, retention={'daily': 1, 'weekly': 0, 'monthly': 2}, max_total_bytes=0)
+    assert removed == 2
+    assert [entry['file'] for entry in db.get_backups(USER_ID)] == [entry['file'] for entry in entries[:3] + entries[5:]]
+    _assert_chains_complete(USER_ID)
+
+    # Только последние два дня: первая цепочка уходит целиком
+    removed = db.prune_backups(USER_ID, retention={'daily': 2, 'weekly': 0, 'monthly': 0}, max_total_bytes=0)
+    assert removed == 3
+    assert [entry['file'] for entry in db.get_backups(USER_ID)] == [entry['file'] for entry in entries[5:]]
+    _assert_chains_complete(USER_ID)
+    assert db.restore_backup_chain(USER_ID)['restored'] == 1
+
+
+def test_prune_size_cap_drops_whole_old_chains(backups, monkeypatch):
+    monkeypatch.setattr(db, 'FULL_BACKUP_EVERY', 3)
+    db.add_task("задача", "2026-01-05", USER_ID)
+    for _ in range(8):
+        db.create_backup(USER_ID)
+    _set_created(USER_ID, _days(*(f'2026-01-{day:02d}' for day in range(1, 9))))
+
+    db.prune_backups(USER_ID, retention={'daily': 30, 'weekly': 0, 'monthly': 0}, max_total_bytes=1)
+    kept = db.get_backups(USER_ID)
+    # Последняя цепочка (полный + инкрементальный) не удаляется никогда
+    assert [entry['type'] for entry in kept] == ['full', 'incremental']
+    _assert_chains_complete(USER_ID)
+    files = sorted(name for name in os.listdir(db.BACKUP_DIR) if name.startswith(f'backup_{USER_ID}_'))
+    assert files == sorted(entry['file'] for entry in kept)
+
+
+def test_backup_manifest_is_json(backups):
+    db.add_task("задача", "2026-01-05", USER_ID)
+    entry = db.create_backup(USER_ID)
+    with open(db._manifest_path(USER_ID), encoding='utf-8') as f:
+        assert json.load(f)['backups'] == [entry]
@@ -0,0 +1,124 @@
+import json
+
+import db
+
+USER_ID = 1
+
+
+def _search_titles(user_id, query):
+    return {task['title'] for task in db.search_tasks(user_id, query)}
+
+
+def test_failed_import_keeps_search_trigger(database, monkeypatch, tmp_path):
+    db.add_task("alpha", "2026-01-05", USER_ID)
+    filename = tmp_path / "import.json"
+    filename.write_text(json.dumps({'tasks': [{'title': "beta", 'task_date': "2026-01-06"}]}), encoding='utf-8')
+
+    insert_rows = db._insert_task_rows
+
+    def failing_insert(conn, rows):
+        insert_rows(conn, rows)
+        raise RuntimeError("сбой посреди импорта")
+
+    monkeypatch.setattr(db, '_insert_task_rows', failing_insert)
+    assert db.import_tasks_from_json(USER_ID, str(filename)) is None
+
+    trigger = db.get_connection().execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'tasks_fts_insert'"
+    ).fetchone()
+    assert trigger is not None
+    assert _search_titles(USER_ID, "beta") == set()
+
+    db.add_task("gamma", "2026-01-07", USER_ID)
+    assert _search_titles(USER_ID, "gamma") == {"gamma"}
+    assert _search_titles(USER_ID, "alpha") == {"alpha"}
+
+
+def test_import_indexes_new_tasks(database, tmp_path):
+    filename = tmp_path / "import.json"
+    filename.write_text(json.dumps({'tasks': [{'title': "delta", 'task_date': "2026-01-06"}]}), encoding='utf-8')
+
+    assert db.import_tasks_from_json(USER_ID, str(filename)) == {'imported': 1, 'skipped': 0}
+    assert _search_titles(USER_ID, "delta") == {"delta"}
+    db.add_task("epsilon", "2026-01-07", USER_ID)
+    assert _search_titles(USER_ID, "epsilon") == {"epsilon"}
+
+
+def test_settings_saved_for_logged_in_user(database):
+    user_id = db.create_user("second", "secret")
+    assert user_id != USER_ID
+    assert db.authenticate_user("second", "secret") == user_id
+
+    assert db.update_user_settings(user_id, storage_profile='durable', theme='dark', prefetch_depth=1)
+    db.close_connection()
+
+    settings = db.get_user_settings(user_id)
+    assert settings['storage_profile'] == 'durable'
+    assert settings['theme'] == 'dark'
+    assert settings['prefetch_depth'] == 1
+    assert db.get_user_settings(USER_ID)['theme'] != 'dark'
+
+
+def test_day_counts_priority_of_open_tasks(database):
+    high = db.add_task("high", "2026-01-05", USER_ID, priority=3)
+    db.add_task("low", "2026-01-05", USER_ID, priority=1)
+    db.add_task("done only", "2026-01-06", USER_ID, priority=3)
+    db.toggle_task_status(high, USER_ID)
+    db.toggle_task_status(db.get_tasks_by_date("2026-01-06", USER_ID)[0].id, USER_ID)
+
+    counts = db.get_task_counts_by_range(USER_ID, "2026-01-01", "2026-01-31")
+    assert counts["2026-01-05"]['max_priority'] == 1
+    assert counts["2026-01-06"] == {'total': 1, 'done': 1, 'mandatory': 0, 'max_priority': 0}
+
+
+def test_bulk_update_clears_occurrence_category(database):
+    category_id = db.get_categories(USER_ID)[0]['id']
+    task_id = db.add_task("task", "2026-01-05", USER_ID, category_id=category_id)
+    recurrence_id = db.add_recurrence(USER_ID, "daily", "2026-01-05", 'daily', category_id=category_id)
+    occurrence = db.occurrence_id(recurrence_id, "2026-01-05")
+
+    assert db.bulk_update_tasks(USER_ID, [occurrence, task_id], category_id=None) == 2
+
+    tasks = db.get_tasks_by_date("2026-01-05", USER_ID)
+    assert [(task.category_id, task.category_name) for task in tasks] == [(None, None), (None, None)]
+    # Остальные дни правила сохраняют категорию
+    assert db.get_occurrence(USER_ID, db.occurrence_id(recurrence_id, "2026-01-06")).category_id == category_id
+
+
+def test_tasks_changed_reports_task_ids(database):
+    changes = []
+    listener = lambda user_id, dates, task_ids: changes.append((user_id, dates, task_ids))
+    db.add_tasks_changed_listener(listener)
+    try:
+        task_id = db.add_task("task", "2026-01-05", USER_ID)
+        db.toggle_task_status(task_id, USER_ID)
+        db.remove_task(USER_ID, task_id)
+        recurrence_id = db.add_recurrence(USER_ID, "daily", "2026-01-05", 'daily')
+        occurrence = db.occurrence_id(recurrence_id, "2026-01-06")
+        db.update_task(USER_ID, occurrence, title="changed")
+    finally:
+        db.remove_tasks_changed_listener(listener)
+
+    assert changes == [
+        (USER_ID, ["2026-01-05"], [task_id]),
+        (USER_ID, ["2026-01-05"], [task_id]),
+        (USER_ID, ["2026-01-05"], [task_id]),
+        (USER_ID, None, None),
+        (USER_ID, ["2026-01-06"], [occurrence]),
+    ]
+
+
+def test_reminders_by_ids(database):
+    with_reminder = db.add_task("remind", "2026-01-05", USER_ID, due_time="10:00", remind_before=30)
+    without = db.add_task("plain", "2026-01-05", USER_ID)
+    done = db.add_task("done", "2026-01-05", USER_ID, remind_before=10)
+    db.toggle_task_status(done, USER_ID)
+    recurrence_id = db.add_recurrence(USER_ID, "daily", "2026-01-05", 'daily', due_time="08:00", remind_before=5)
+    occurrence = db.occurrence_id(recurrence_id, "2026-01-06")
+
+    reminders = db.get_reminders_by_ids(USER_ID, [with_reminder, without, done, occurrence, 9999])
+    assert [(when.isoformat(), task.id) for when, task in reminders] == [
+        ("2026-01-05T09:30:00", with_reminder),
+        ("2026-01-06T07:55:00", occurrence),
+    ]
+    assert db.get_reminders_by_ids(USER_ID, []) == []
@@ -0,0 +1,144 @@
+import sqlite3
+
+import db
+import migrations
+
+# Схема, которую создавал init_db до появления миграций (user_version = 0)
+BASELINE_SCHEMA = '''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        color TEXT DEFAULT '#007acc',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, name)
+    );
+    CREATE TABLE tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        task_date TEXT NOT NULL,
+        description TEXT,
+        priority INTEGER DEFAULT 1,
+        is_mandatory BOOLEAN DEFAULT FALSE,
+        done BOOLEAN DEFAULT FALSE,
+        category_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE templates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        data TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, name)
+    );
+    CREATE TABLE user_settings (
+        user_id INTEGER PRIMARY KEY,
+        auto_backup BOOLEAN DEFAULT TRUE,
+        notifications BOOLEAN DEFAULT TRUE,
+        week_start TEXT DEFAULT 'monday',
+        theme TEXT DEFAULT 'light',
+        language TEXT DEFAULT 'ru'
+    );
+    INSERT INTO users (username, password_hash) VALUES ('Admin', 'hash');
+    INSERT INTO user_settings (user_id, theme) VALUES (1, 'dark');
+    INSERT INTO categories (user_id, name, color) VALUES (1, 'Работа', '#ff6b6b');
+    INSERT INTO tasks (user_id, title, task_date, description, priority, category_id)
+    VALUES (1, 'Отчет', '2026-01-05', 'квартальный', 3, 1),
+           (1, 'Звонок', '2026-01-06', NULL, 1, NULL);
+'''
+
+# Схема старого create_folders.py: без users, без category_id у задач и цвета у категорий
+LEGACY_SCHEMA = '''
+    CREATE TABLE tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        task_date TEXT,
+        description TEXT,
+        priority INTEGER DEFAULT 1,
+        is_mandatory INTEGER DEFAULT 0,
+        done INTEGER DEFAULT 0,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL
+    );
+    INSERT INTO tasks (user_id, title, task_date) VALUES (1, 'Старая задача', '2026-01-05');
+    INSERT INTO categories (user_id, name) VALUES (1, 'Дом');
+'''
+
+
+def _old_database(tmp_path, monkeypatch, schema):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    conn = sqlite3.connect(db.get_db_path())
+    conn.executescript(schema)
+    conn.close()
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_upgrade_baseline_database(tmp_path, monkeypatch):
+    _old_database(tmp_path, monkeypatch, BASELINE_SCHEMA)
+    db.init_db()
+    try:
+        conn = db.get_connection()
+        assert migrations.get_schema_version(conn) == migrations.SCHEMA_VERSION == len(migrations.MIGRATIONS)
+        assert {'day_num', 'due_time', 'remind_before'} <= _columns(conn, 'tasks')
+        assert {'storage_profile', 'prefetch_depth'} <= _columns(conn, 'user_settings')
+        assert {'tasks_fts', 'recurrences', 'recurrence_overrides'} <= _tables(conn)
+
+        # Данные пережили миграцию и видны через новые запросы
+        assert db.get_user_settings(1)['theme'] == 'dark'
+        tasks = db.get_tasks_by_date('2026-01-05', 1)
+        assert [(task.title, task.priority, task.category_name) for task in tasks] == [('Отчет', 3, 'Работа')]
+        assert conn.execute('SELECT day_num FROM tasks WHERE id = 2').fetchone()[0] == db.to_day_num('2026-01-06')
+        assert [task['title'] for task in db.search_tasks(1, 'квартальный')] == ['Отчет']
+        # Администратор уже был - второй не создается
+        assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 1
+    finally:
+        db.close_connection()
+
+
+def test_upgrade_legacy_database(tmp_path, monkeypatch):
+    _old_database(tmp_path, monkeypatch, LEGACY_SCHEMA)
+    db.init_db()
+    try:
+        conn = db.get_connection()
+        assert migrations.get_schema_version(conn) == migrations.SCHEMA_VERSION
+        assert 'category_id' in _columns(conn, 'tasks')
+        assert {'color', 'created_at'} <= _columns(conn, 'categories')
+        assert conn.execute("SELECT username FROM users").fetchall() == [('Admin',)]
+        assert db.authenticate_user('Admin', 'admin') == 1
+        assert [task.title for task in db.get_tasks_by_date('2026-01-05', 1)] == ['Старая задача']
+    finally:
+        db.close_connection()
+
+
+def test_migrate_is_idempotent(database):
+    conn = database.get_connection()
+    database.add_task("задача", "2026-01-05", 1)
+    assert migrations.migrate(conn) == migrations.SCHEMA_VERSION
+
+    # Шаги повторяемы: база с актуальной схемой, но без номера версии
+    conn.execute('PRAGMA user_version = 0')
+    assert migrations.migrate(conn) == migrations.SCHEMA_VERSION
+    assert [task.title for task in database.get_tasks_by_date('2026-01-05', 1)] == ["задача"]
@@ -0,0 +1,150 @@
+from datetime import date
+
+import pytest
+
+import db
+from recurrence import Rule, occurrences, occurs_on, last_occurrence, weekdays_mask, DAILY, WEEKLY, MONTHLY
+
+USER_ID = 1
+
+
+def _days(rule, first, last):
+    return [day.isoformat() for day in occurrences(rule, first, last)]
+
+
+# ---------- recurrence.py ----------
+
+def test_daily_interval_from_middle_of_period():
+    rule = Rule(DAILY, date(2026, 1, 1), interval=3)
+    # Первое вхождение в периоде находится от даты начала, а не от начала периода
+    assert _days(rule, date(2026, 1, 5), date(2026, 1, 12)) == ['2026-01-07', '2026-01-10']
+    assert _days(rule, date(2025, 12, 1), date(2026, 1, 4)) == ['2026-01-01', '2026-01-04']
+
+
+def test_weekly_weekday_set_and_interval():
+    # Каждые 2 недели по понедельникам и пятницам, начиная со среды 2026-01-07
+    rule = Rule(WEEKLY, date(2026, 1, 7), interval=2, weekdays=weekdays_mask([0, 4]))
+    assert _days(rule, date(2026, 1, 1), date(2026, 2, 1)) == ['2026-01-09', '2026-01-19', '2026-01-23']
+
+
+def test_weekly_defaults_to_start_weekday():
+    rule = Rule(WEEKLY, date(2026, 1, 7))
+    assert _days(rule, date(2026, 1, 1), date(2026, 1, 31)) == ['2026-01-07', '2026-01-14', '2026-01-21',
+                                                                 '2026-01-28']
+
+
+def test_monthly_clamps_to_month_end():
+    rule = Rule(MONTHLY, date(2026, 1, 31))
+    assert _days(rule, date(2026, 1, 1), date(2026, 5, 31)) == ['2026-01-31', '2026-02-28', '2026-03-31',
+                                                                 '2026-04-30', '2026-05-31']
+    leap = Rule(MONTHLY, date(2028, 1, 31))
+    assert _days(leap, date(2028, 2, 1), date(2028, 2, 29)) == ['2028-02-29']
+
+
+def test_monthly_interval_across_year():
+    rule = Rule(MONTHLY, date(2025, 11, 15), interval=3)
+    assert _days(rule, date(2026, 1, 1), date(2026, 12, 31)) == ['2026-02-15', '2026-05-15', '2026-08-15',
+                                                                  '2026-11-15']
+
+
+def test_until_limits_occurrences():
+    rule = Rule(DAILY, date(2026, 1, 1), until=date(2026, 1, 3))
+    assert _days(rule, date(2025, 12, 30), date(2026, 1, 10)) == ['2026-01-01', '2026-01-02', '2026-01-03']
+    assert not occurs_on(rule, date(2026, 1, 4))
+    assert occurs_on(rule, date(2026, 1, 2))
+
+
+def test_last_occurrence_counts_from_start():
+    assert last_occurrence(Rule(DAILY, date(2026, 1, 1), interval=2), 3) == date(2026, 1, 5)
+    assert last_occurrence(Rule(MONTHLY, date(2026, 1, 31)), 2) == date(2026, 2, 28)
+    weekly = Rule(WEEKLY, date(2026, 1, 5), weekdays=weekdays_mask([0, 2]))
+    assert last_occurrence(weekly, 4) == date(2026, 1, 14)
+    # Правило кончается раньше count: последнее вхождение до until
+    assert last_occurrence(Rule(DAILY, date(2026, 1, 1), until=date(2026, 1, 2)), 5) == date(2026, 1, 2)
+
+
+def test_invalid_rules():
+    with pytest.raises(ValueError):
+        Rule('yearly', date(2026, 1, 1))
+    with pytest.raises(ValueError):
+        Rule(DAILY, date(2026, 1, 1), interval=0)
+    with pytest.raises(ValueError):
+        weekdays_mask([7])
+    with pytest.raises(ValueError):
+        last_occurrence(Rule(DAILY, date(2026, 1, 1)), 0)
+
+
+# ---------- Вхождения в db.py ----------
+
+def _week_titles(user_id, start):
+    return {day: [task.title for task in tasks] for day, tasks in db.get_tasks_by_week(start, user_id).items()}
+
+
+def test_count_and_until_in_db(database):
+    db.add_recurrence(USER_ID, "трижды", "2026-01-05", DAILY, count=3)
+    db.add_recurrence(USER_ID, "до среды", "2026-01-05", DAILY, until="2026-01-07")
+    assert _week_titles(USER_ID, date(2026, 1, 5)) == {
+        '2026-01-05': ["трижды", "до среды"],
+        '2026-01-06': ["трижды", "до среды"],
+        '2026-01-07': ["трижды", "до среды"],
+    }
+
+
+def test_occurrence_id_round_trip():
+    assert db.occurrence_id(12, date(2026, 1, 5)) == 'r12:2026-01-05'
+    assert db.parse_occurrence_id('r12:2026-01-05') == (12, '2026-01-05')
+    assert db.parse_occurrence_id(12) is None
+    assert db.parse_occurrence_id('12') is None
+
+
+def test_occurrence_overrides(database):
+    recurrence_id = db.add_recurrence(USER_ID, "зарядка", "2026-01-05", DAILY, priority=1)
+    monday = db.occurrence_id(recurrence_id, "2026-01-05")
+    tuesday = db.occurrence_id(recurrence_id, "2026-01-06")
+
+    done = db.toggle_task_status(monday, USER_ID)
+    assert done.id == monday and done.done
+    mandatory = db.toggle_mandatory_status(monday, USER_ID)
+    assert mandatory.done and mandatory.is_mandatory
+
+    updated = db.update_task(USER_ID, tuesday, title="пробежка", priority=3)
+    assert (updated.title, updated.priority) == ("пробежка", 3)
+
+    assert db.remove_task(USER_ID, db.occurrence_id(recurrence_id, "2026-01-07"))
+
+    tasks = {task.id: task for tasks in db.get_tasks_by_week(date(2026, 1, 5), USER_ID).values() for task in tasks}
+    assert tasks[monday].done and tasks[monday].is_mandatory
+    assert tasks[tuesday].title == "пробежка" and not tasks[tuesday].done
+    assert db.occurrence_id(recurrence_id, "2026-01-07") not in tasks
+    # Остальные дни - как в правиле
+    thursday = tasks[db.occurrence_id(recurrence_id, "2026-01-08")]
+    assert (thursday.title, thursday.priority, thursday.done) == ("зарядка", 1, False)
+
+    # Изменение одного дня не трогает правило
+    assert db.get_occurrence(USER_ID, db.occurrence_id(recurrence_id, "2026-01-12")).title == "зарядка"
+
+
+def test_moving_occurrence_detaches_it(database):
+    recurrence_id = db.add_recurrence(USER_ID, "полив", "2026-01-05", WEEKLY)
+    moved = db.update_task(USER_ID, db.occurrence_id(recurrence_id, "2026-01-12"), task_date="2026-01-13")
+    assert isinstance(moved.id, int) and moved.task_date == "2026-01-13"
+    assert db.get_occurrence(USER_ID, db.occurrence_id(recurrence_id, "2026-01-12")) is None
+    assert db.get_occurrence(USER_ID, db.occurrence_id(recurrence_id, "2026-01-19")) is not None
+
+
+def test_end_recurrence(database):
+    recurrence_id = db.add_recurrence(USER_ID, "ежедневно", "2026-01-05", DAILY)
+    assert db.end_recurrence(USER_ID, recurrence_id, "2026-01-08")
+    assert list(_week_titles(USER_ID, date(2026, 1, 5))) == ['2026-01-05', '2026-01-06', '2026-01-07']
+    # Повторное прекращение позже - ничего не меняет
+    assert not db.end_recurrence(USER_ID, recurrence_id, "2026-01-10")
+    assert db.get_occurrence(USER_ID, db.occurrence_id(recurrence_id, "2026-01-08")) is None
+
+
+def test_occurrences_of_other_user_are_not_changed(database):
+    recurrence_id = db.add_recurrence(USER_ID, "чужое", "2026-01-05", DAILY)
+    other = db.create_user("other", "secret")
+    assert db.toggle_task_status(db.occurrence_id(recurrence_id, "2026-01-05"), other) is None
+    assert not db.remove_task(other, db.occurrence_id(recurrence_id, "2026-01-05"))
+    assert not db.end_recurrence(other, recurrence_id, "2026-01-06")
+    assert len(db.get_tasks_by_week(date(2026, 1, 5), USER_ID)) == 7
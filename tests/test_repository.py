@@ -0,0 +1,24 @@
+from datetime import date
+
+import db
+import repository
+
+USER_ID = 1
+MONDAY = date(2026, 1, 5)
+
+
+def test_failed_read_is_not_cached(database, monkeypatch):
+    db.add_task("task", "2026-01-05", USER_ID)
+    load_occurrences = db._load_occurrences
+
+    def locked(*args, **kwargs):
+        raise db.sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(db, '_load_occurrences', locked)
+    assert repository.get_tasks_by_date("2026-01-05", USER_ID) is None
+    assert repository.get_tasks_by_week(MONDAY, USER_ID) is None
+    assert not repository.is_week_cached(MONDAY, USER_ID)
+
+    monkeypatch.setattr(db, '_load_occurrences', load_occurrences)
+    assert [task.title for task in repository.get_tasks_by_date("2026-01-05", USER_ID)] == ["task"]
+    assert list(repository.get_tasks_by_week(MONDAY, USER_ID)) == ["2026-01-05"]